@@ -0,0 +1,194 @@
+"""
+The measured hot paths. Each case is a setup function that builds its
+fixtures (untimed, and imports everything the call needs) and returns the
+zero-argument call to measure.
+"""
+import asyncio
+import base64
+import io
+import json
+import random
+import shutil
+from dataclasses import dataclass
+from typing import Callable, List
+
+import cv2
+
+import pages
+from common.config import settings
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    repeats: int = 5 # Timed repeats; the best one is reported
+    number: int = 1  # Calls per timed repeat, for sub-millisecond paths
+    slow: bool = False # Only with --slow
+
+
+CASES: List[Case] = []
+
+
+class Skip(Exception):
+    """Raised by a setup when the case cannot run here (e.g. poppler is not installed)."""
+
+
+def case(name: str, repeats: int = 5, number: int = 1, slow: bool = False):
+    def register(setup):
+        CASES.append(Case(name, setup, repeats, number, slow))
+        return setup
+    return register
+
+
+def png(image) -> bytes:
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+class StubClient:
+    """Stands in for FireworksClient: canned response, no network."""
+
+    def __init__(self, response: str):
+        self.response = response
+
+    async def analyze_image_with_usage(self, prompt, base64_image, priority=None, model=None, timeout=None):
+        return self.response, {"prompt_tokens": 1000, "completion_tokens": 50}
+
+
+# --- Preprocessing: denoise / deskew ---
+
+def _denoise(dpi: int):
+    from preprocessing_service.processors import ImageProcessor
+    image = pages.scan(pages.text_page(dpi))
+    return lambda: ImageProcessor.denoise_image(image)
+
+case("denoise/a4-150-scan", repeats=1)(lambda: _denoise(150))
+case("denoise/a4-300-scan", repeats=1, slow=True)(lambda: _denoise(300))
+
+
+def _deskew(dpi: int, columns: int):
+    from preprocessing_service.processors import ImageProcessor
+    image = pages.scan(pages.text_page(dpi, columns), skew=3.0)
+    return lambda: ImageProcessor.deskew_image(image)
+
+case("deskew/a4-150-skewed", repeats=3)(lambda: _deskew(150, 1))
+case("deskew/a4-300-skewed", repeats=3)(lambda: _deskew(300, 1))
+case("deskew/a4-300-2col-skewed", repeats=3)(lambda: _deskew(300, 2))
+
+
+# --- Preprocessing: PDF rasterization ---
+
+def _rasterize(dpi: int):
+    if shutil.which("pdftoppm") is None:
+        raise Skip("poppler (pdftoppm) not installed")
+    import pdf2image  # noqa: F401
+    from preprocessing_service.rendering import RenderPolicy, render_pdf
+    document = pages.pdf([pages.text_page(150, columns=1 + i % 2, seed=i) for i in range(3)], 150)
+    policy = RenderPolicy(min_dpi=dpi, max_dpi=dpi)
+    return lambda: render_pdf(document, policy, workers=settings.RENDER_WORKERS, grayscale=settings.RENDER_GRAYSCALE)
+
+case("rasterize/a4-150-x3", repeats=3)(lambda: _rasterize(150))
+case("rasterize/a4-300-x3", repeats=3)(lambda: _rasterize(300))
+
+
+# --- Image encode/decode: PNG and base64 between the services ---
+
+@case("encode/png-cv2-a4-300-scan", repeats=3)
+def _png_cv2():
+    # normalize_image's processed page
+    image = pages.scan(pages.text_page(300))
+    return lambda: cv2.imencode(".png", image)
+
+@case("encode/png-pil-a4-300", repeats=3)
+def _png_pil():
+    # convert_pdf's rendered page
+    from PIL import Image
+    image = Image.fromarray(cv2.cvtColor(pages.text_page(300), cv2.COLOR_BGR2RGB))
+
+    def encode():
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG")
+        return buffered.getvalue()
+    return encode
+
+@case("decode/png-cv2-a4-300-scan", repeats=5)
+def _png_decode():
+    import numpy as np
+    data = png(pages.scan(pages.text_page(300)))
+    return lambda: cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+@case("encode/base64-a4-300-scan", repeats=5, number=5)
+def _b64_encode():
+    # Page images in service responses and Page.base64_image
+    data = png(pages.scan(pages.text_page(300)))
+    return lambda: base64.b64encode(data).decode("utf-8")
+
+@case("decode/base64-a4-300-scan", repeats=5, number=5)
+def _b64_decode():
+    text = base64.b64encode(png(pages.scan(pages.text_page(300)))).decode("utf-8")
+    return lambda: base64.b64decode(text)
+
+
+# --- Visual analysis: response parsing ---
+
+def _parse(protocol: str, regions: int):
+    from visual_service.protocols import get_protocol
+    response = pages.vlm_response(regions, protocol)
+    width, height = pages.a4_size(300)
+    return lambda: get_protocol(protocol).parse(response, width, height)
+
+case("parse/json-v1-200-regions", number=10)(lambda: _parse("json-v1", 200))
+case("parse/compact-v1-200-regions", number=10)(lambda: _parse("compact-v1", 200))
+
+@case("parse/analyze-page-a4-150-200-regions", number=5)
+def _analyze_page():
+    # /detect/layout minus HTTP: image header, base64 for the VLM request, stubbed VLM call, parsing
+    from visual_service import analysis
+    from visual_service.protocols import get_protocol
+    data = png(pages.scan(pages.text_page(150)))
+    analysis.image_size(data)
+    analysis._client = StubClient(pages.vlm_response(200))
+    protocol = get_protocol("json-v1")
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(analysis.analyze_page(data, protocol))
+
+
+# --- Orchestrator: block order and the response ---
+
+def _blocks(regions: int) -> List[dict]:
+    """The orchestrator's per-block dicts for a dense two-column page, in a shuffled order."""
+    from visual_service.protocols import get_protocol
+    width, height = pages.a4_size(300)
+    detections = get_protocol("json-v1").parse(pages.vlm_response(regions), width, height)
+    blocks = [{"type": d["label"], "content": d["attributes"]["text"], "bbox": d["bbox"], "confidence": 1.0,
+               "vlm_description": "", "html": ""} for d in detections]
+    random.Random(0).shuffle(blocks)
+    return blocks
+
+@case("sort/blocks-400-2col", number=50)
+def _sort_blocks():
+    from orchestrator.layout import sort_blocks
+    blocks = _blocks(400)
+    return lambda: sort_blocks(list(blocks))
+
+@case("serialize/response-10-pages", repeats=3)
+def _serialize():
+    # What FastAPI does with the /analyze response_model: dump in JSON mode, then json.dumps (JSONResponse)
+    from common.schemas import AnalysisResponse, DocumentContent, Page, Dimension
+    from orchestrator.store import assign_text_anchors, PAGE_BREAK
+    image = "data:image/png;base64," + base64.b64encode(png(pages.scan(pages.text_page(150)))).decode("utf-8")
+    width, height = pages.a4_size(150)
+    blocks = _blocks(80)
+    page_list = [
+        Page(page_number=n, dimension=Dimension(width=width, height=height), base64_image=image,
+             blocks=[{"block_type": b["type"], "text": b["content"], "bounding_box": b["bbox"]} for b in blocks])
+        for n in range(1, 11)
+    ]
+    visual_elements = [{"type": b["type"], "confidence": 1.0, "bounding_box": b["bbox"],
+                        "attributes": {"text": b["content"], "page_number": n}}
+                       for n in range(1, 11) for b in blocks]
+    text = PAGE_BREAK.join("\n\n".join(b["content"] for b in blocks) for _ in page_list)
+    response = AnalysisResponse(job_id="benchmark", status="completed", timestamp="0",
+                                document=DocumentContent(text=text, pages=page_list, visual_elements=visual_elements))
+    assign_text_anchors(response)
+    return lambda: json.dumps(response.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,128 @@
+"""
+Synthetic fixtures for the benchmark suite: A4 pages at a given DPI (heading,
+one or more text columns, a ruled table), scan degradation (skew, blur,
+noise, specks), multi-page PDFs and dense VLM responses for a page.
+All of them are deterministic for a given seed.
+"""
+import io
+import json
+import random
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+A4_INCHES = (8.27, 11.69)
+WORDS = ("the invoice total amount payable within thirty days of delivery please quote our reference "
+         "when paying goods remain our property until paid in full bank transfer only quantity unit "
+         "price description shipping handling applicable law jurisdiction signed by").split()
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def a4_size(dpi: int) -> Tuple[int, int]:
+    """(width, height) in pixels of an A4 page at dpi."""
+    return round(A4_INCHES[0] * dpi), round(A4_INCHES[1] * dpi)
+
+
+def _lines(rng: random.Random, width: int, font_scale: float, thickness: int, count: int) -> List[str]:
+    """count lines of random words, each at most width pixels wide."""
+    space = cv2.getTextSize(" ", FONT, font_scale, thickness)[0][0]
+    sizes = {w: cv2.getTextSize(w, FONT, font_scale, thickness)[0][0] for w in WORDS}
+    lines = []
+    for _ in range(count):
+        words, x = [], 0
+        while True:
+            word = rng.choice(WORDS)
+            x += sizes[word] + space
+            if x > width:
+                break
+            words.append(word)
+        text = " ".join(words)
+        lines.append(text[:1].upper() + text[1:])
+    return lines
+
+
+def text_page(dpi: int = 150, columns: int = 1, seed: int = 0) -> np.ndarray:
+    """Clean BGR page: heading, paragraphs in columns (~11 pt text) and a ruled 4x8 table across the page."""
+    rng = random.Random(seed)
+    width, height = a4_size(dpi)
+    scale = dpi / 300
+    page = np.full((height, width, 3), 255, np.uint8)
+    margin, gutter = int(0.7 * dpi), int(0.3 * dpi)
+    thickness = max(1, round(3 * scale))
+    font_scale, line_height = 1.25 * scale, int(58 * scale)
+
+    cv2.putText(page, f"Invoice {rng.randrange(10**6)}", (margin, margin + int(60 * scale)), cv2.FONT_HERSHEY_DUPLEX,
+                3.0 * scale, (0, 0, 0), max(1, round(5 * scale)), cv2.LINE_AA)
+    top = margin + int(200 * scale)
+    table_top, table_bottom = int(0.62 * height), int(0.78 * height)
+
+    column_width = (width - 2 * margin - (columns - 1) * gutter) // columns
+    for c in range(columns):
+        x = margin + c * (column_width + gutter)
+        y = top
+        while y < height - margin:
+            for line in _lines(rng, column_width, font_scale, thickness, rng.randint(3, 7)):
+                if table_top - line_height < y < table_bottom + line_height:
+                    y = table_bottom + 2 * line_height # Text resumes below the table
+                if y >= height - margin:
+                    break
+                cv2.putText(page, line, (x, y), FONT, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+                y += line_height
+            y += line_height # Paragraph gap
+
+    x1, x2 = margin, width - margin
+    for ty in np.linspace(table_top, table_bottom, 9).astype(int):
+        cv2.line(page, (x1, ty), (x2, ty), (0, 0, 0), thickness)
+    for tx in np.linspace(x1, x2, 5).astype(int):
+        cv2.line(page, (tx, table_top), (tx, table_bottom), (0, 0, 0), thickness)
+    return page
+
+
+def scan(page: np.ndarray, skew: float = 0.0, noise: float = 12.0, seed: int = 0) -> np.ndarray:
+    """The page as a scanner would return it: rotated by skew degrees, slightly blurred, grain and specks."""
+    gen = np.random.default_rng(seed)
+    height, width = page.shape[:2]
+    out = page
+    if skew:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        out = cv2.warpAffine(out, matrix, (width, height), flags=cv2.INTER_LINEAR, borderValue=(255, 255, 255))
+    out = cv2.GaussianBlur(out, (3, 3), 0)
+    grain = gen.normal(0, noise, out.shape[:2])[:, :, None]
+    out = np.clip(out.astype(np.float32) + grain, 0, 255).astype(np.uint8)
+    specks = gen.random(out.shape[:2]) < 0.0005
+    out[specks] = 0
+    return out
+
+
+def pdf(pages: List[np.ndarray], dpi: int) -> bytes:
+    """Image-only PDF of the pages, with page size so that they rasterize back 1:1 at dpi."""
+    from PIL import Image
+
+    images = [Image.fromarray(cv2.cvtColor(p, cv2.COLOR_BGR2RGB)) for p in pages]
+    buffered = io.BytesIO()
+    images[0].save(buffered, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return buffered.getvalue()
+
+
+def vlm_response(regions: int, protocol: str = "json-v1", columns: int = 2, seed: int = 0) -> str:
+    """A dense layout response: a title, then text regions (and every 25th a table) over the columns."""
+    rng = random.Random(seed)
+    rows = -(-regions // columns)
+    step = 900 / rows
+    out = [("title", [60, 20, 700, 50], "Invoice " + str(rng.randrange(10**6)))]
+    for i in range(regions - 1):
+        col, row = i % columns, i // columns
+        x1 = 60 + col * (880 // columns)
+        y1 = 60 + row * step
+        box = [x1, round(y1), x1 + 880 // columns - 20, round(y1 + step * 0.8)]
+        kind = "table" if i % 25 == 24 else "text"
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        if kind == "table":
+            text = "\n".join(" | ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(6))
+        out.append((kind, box, text))
+    if protocol == "compact-v1":
+        codes = {"title": "T", "text": "X", "table": "B"}
+        escaped = [(codes[k], ",".join(map(str, b)), t.replace("\n", "\\n")) for k, b, t in out]
+        return "\n".join(f"{code}|{box}|{text}" for code, box, text in escaped)
+    return json.dumps([{"type": k, "bbox": b, "text": t} for k, b, t in out])
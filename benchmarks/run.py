@@ -0,0 +1,172 @@
+"""
+Micro-benchmarks for the CPU hot paths, with regression gates.
+
+Runs every case in benchmarks/cases.py on synthetic A4 pages (150/300 DPI,
+noisy and skewed scans, two-column layouts) and records, per case, the best
+wall time of a call over its repeats and the peak memory it allocates
+(tracemalloc: Python objects and numpy arrays, not OpenCV's internal buffers).
+The results are compared against benchmarks/baseline.json. A case regresses
+when it is slower than its baseline by more than the time threshold, or
+allocates more by more than the memory threshold. Any regression makes the
+exit status 1. Peak memory is reproducible run to run, so its gate is tight;
+timings on a shared machine move by a few tens of percent, so the time gate
+is meant to catch step changes (an extra pass, a lost fast path), not drift.
+
+Timings only compare on the machine that recorded the baseline: re-record it
+(--update) on the machine that runs the gate, and whenever a change is
+expected to move the numbers. Cases marked slow (denoising at 300 DPI, ~25 s)
+run with --slow. Cases whose tools are missing (e.g. poppler) are skipped.
+
+Usage:
+    python benchmarks/run.py
+    python benchmarks/run.py --cases deskew parse/ --repeats 10
+    python benchmarks/run.py --update
+    python benchmarks/run.py --time-threshold 0.5 --output results.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.getcwd())
+
+from common.config import settings
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TIME_THRESHOLD = 0.5    # Fraction slower than the baseline that fails the gate
+MEMORY_THRESHOLD = 0.10 # Fraction more peak memory than the baseline that fails the gate
+MIN_TIME_MS = 0.2       # Smaller differences are timer noise, whatever the ratio
+MIN_MEMORY_KB = 64
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def measure(case, repeats: int) -> dict:
+    """{"time_ms", "peak_kb"}: the first call runs under tracemalloc (and warms up), the timed calls after it."""
+    fn = case.setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(case.number):
+                fn()
+            timings.append((time.perf_counter() - start) / case.number)
+    finally:
+        gc.enable()
+    # Best of the repeats, as timeit does: slower runs measure other load on the machine, not the code
+    return {"time_ms": round(min(timings) * 1000, 3), "peak_kb": round(peak / 1024)}
+
+
+def compare(result: dict, base: dict, time_threshold: float, memory_threshold: float) -> list:
+    """Regressions of one case against its baseline entry, as messages."""
+    regressions = []
+    slower = result["time_ms"] - base["time_ms"]
+    if slower > MIN_TIME_MS and slower > base["time_ms"] * time_threshold:
+        regressions.append(f"time {base['time_ms']:.2f} -> {result['time_ms']:.2f} ms")
+    grown = result["peak_kb"] - base["peak_kb"]
+    if grown > MIN_MEMORY_KB and grown > base["peak_kb"] * memory_threshold:
+        regressions.append(f"peak {base['peak_kb']} -> {result['peak_kb']} KB")
+    return regressions
+
+
+def change(new: float, old: float) -> str:
+    return f"{(new - old) / old:+.0%}" if old else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", help="Only cases whose name contains one of these")
+    parser.add_argument("--slow", action="store_true", help="Include slow cases")
+    parser.add_argument("--repeats", type=int, help="Timed repeats per case (default: per case)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update", action="store_true", help="Write the results into the baseline instead of gating")
+    parser.add_argument("--time-threshold", type=float, help=f"Default: the baseline's, else {TIME_THRESHOLD}")
+    parser.add_argument("--memory-threshold", type=float, help=f"Default: the baseline's, else {MEMORY_THRESHOLD}")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # The cases log through the services' loggers; their output is not what is measured
+    settings.LOG_LEVEL = "WARNING"
+    settings.LOG_ASYNC = False
+    from common.logger import configure_logger
+    configure_logger("benchmarks")
+    from cases import CASES, Skip
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    thresholds = baseline.get("thresholds", {})
+    time_threshold = args.time_threshold if args.time_threshold is not None else thresholds.get("time", TIME_THRESHOLD)
+    memory_threshold = (args.memory_threshold if args.memory_threshold is not None
+                        else thresholds.get("memory", MEMORY_THRESHOLD))
+    base_cases = baseline.get("cases", {})
+    if baseline and baseline.get("machine") != machine() and not args.update:
+        print(f"warning: baseline recorded on {baseline.get('machine')}, this is {machine()}; "
+              f"timings may not be comparable")
+
+    selected = [c for c in CASES if (args.slow or not c.slow)
+                and (not args.cases or any(pattern in c.name for pattern in args.cases))]
+    print(f"{'case':<40} {'ms':>10} {'base ms':>10} {'':>6} {'peak KB':>9} {'base KB':>9} {'':>6}  status")
+    results, failures = {}, []
+    for case in selected:
+        try:
+            result = measure(case, args.repeats or case.repeats)
+        except Skip as e:
+            print(f"{case.name:<40} {'':>54}  skipped ({e})")
+            continue
+        results[case.name] = result
+        base = base_cases.get(case.name)
+        if base is None:
+            status = "new"
+        else:
+            regressions = compare(result, base, time_threshold, memory_threshold)
+            status = "REGRESSED: " + ", ".join(regressions) if regressions else "ok"
+            if regressions:
+                failures.append(case.name)
+        base = base or {}
+        base_ms = f"{base['time_ms']:.2f}" if "time_ms" in base else "-"
+        print(f"{case.name:<40} {result['time_ms']:>10.2f} {base_ms:>10} "
+              f"{change(result['time_ms'], base.get('time_ms', 0)):>6} {result['peak_kb']:>9} "
+              f"{base.get('peak_kb', '-'):>9} {change(result['peak_kb'], base.get('peak_kb', 0)):>6}  {status}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": machine(), "cases": results}, f, indent=2)
+
+    if args.update:
+        # Cases not run this time (filtered out, slow, skipped) keep their previous entry
+        updated = {
+            "machine": machine(),
+            "thresholds": {"time": time_threshold, "memory": memory_threshold},
+            "cases": dict(sorted({**base_cases, **results}.items())),
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(updated, f, indent=2)
+            f.write("\n")
+        print(f"baseline updated: {len(results)} cases -> {args.baseline}")
+        return
+
+    if not base_cases:
+        print(f"no baseline at {args.baseline}: record one with --update")
+    if failures:
+        print(f"{len(failures)} regression(s) beyond +{time_threshold:.0%} time / +{memory_threshold:.0%} memory: "
+              f"{', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from enum import Enum
+from typing import Dict
 import os
 
 class Environment(str, Enum):
@@ -16,11 +17,29 @@ class Settings(BaseSettings):
     # Infrastructure
     ENV: Environment = Environment.DEV
     LOG_LEVEL: LogLevel = LogLevel.INFO
+    LOG_ASYNC: bool = True # Render and write log records on a background thread (queue) instead of the caller
+    LOG_QUEUE_SIZE: int = 10000 # Records waiting for the writer; beyond this they are dropped (and counted)
+    LOG_SAMPLE_RATES: Dict[str, float] = {} # INFO/DEBUG event prefix -> fraction kept, e.g. {"Page ": 0.1}
+    LOG_RATE_LIMIT: float = 20.0 # Records/s per distinct event (numbers ignored) below ERROR; 0 = unlimited
+    LOG_MAX_FIELD_CHARS: int = 2000 # Longer string fields (raw responses, tracebacks) are truncated
+    STARTUP_WARMUP: bool = True # Load heavy modules/models in the background after start; /ready flips when done
+    WARMUP_VLM: bool = False # Also run one real VLM inference during warm-up (uses quota)
     
     # Preprocessing Service
     PREPROCESSING_HOST: str = "127.0.0.1"
     PREPROCESSING_PORT: int = 8001
     ENABLE_DESKEW: bool = True
+    ENABLE_ORIENTATION: bool = True # Rotate sideways/upside-down scans upright (0/90/180/270) before visual analysis
+    ORIENTATION_MIN_CONFIDENCE: float = 0.25 # Below this the page is left as it is
+    ENABLE_PDF_TEXT_LAYER: bool = True # Born-digital PDF pages use the embedded text layer instead of the VLM
+    ENABLE_NORMALIZATION: bool = True # Denoise/deskew images and scanned PDF pages before visual analysis (else header probe only)
+    # PDF rasterization policy
+    RENDER_TARGET_MPIX: float = 4.0 # Pixel budget per page (A4/Letter -> ~200 DPI)
+    RENDER_MIN_DPI: int = 72
+    RENDER_MAX_DPI: int = 300
+    RENDER_MIN_TEXT_PX: float = 12.0 # Raise DPI so the page's small text is at least this tall
+    RENDER_WORKERS: int = 4 # Parallel pdftoppm processes per document
+    RENDER_GRAYSCALE: bool = False
     
     # Visual Service
     VISUAL_HOST: str = "127.0.0.1"
@@ -28,9 +47,69 @@ class Settings(BaseSettings):
     # Cloud Provider (Unified)
     FIREWORKS_API_KEY: str = ""
     FIREWORKS_MODEL: str = "accounts/fireworks/models/qwen3-vl-30b-a3b-instruct"
+    FIREWORKS_MAX_RETRIES: int = 3
+    # Client-side rate limiting (0 = unlimited), one budget per model called. Set to the per-model quota.
+    FIREWORKS_RPM: int = 0
+    FIREWORKS_TPM: int = 0
+    FIREWORKS_BURST_SECONDS: float = 10.0 # Bucket capacity, in seconds of quota
+    FIREWORKS_IMAGE_TOKENS: int = 1500 # Estimated prompt tokens per page image
+    FIREWORKS_LIMITER_DB: str = "" # SQLite file to share limiter state across worker processes
+    VLM_OUTPUT_PROTOCOL: str = "json-v1" # Prompt/parser pair: json-v1 or compact-v1
+    # Page complexity class -> model, e.g. '{"simple": "accounts/fireworks/models/qwen2p5-vl-7b-instruct"}'.
+    # Unlisted classes use FIREWORKS_MODEL, which is also the fallback when a routed model's output fails to parse.
+    VLM_ROUTES: Dict[str, str] = {}
 
     # Orchestrator
+    # services: preprocessing/visual analysis are separate services over HTTP (below);
+    # embedded: the orchestrator calls them as libraries, CPU work on a local process pool
+    DEPLOYMENT_MODE: str = "services"
+    EMBEDDED_CPU_WORKERS: int = 4 # Worker processes for preprocessing in embedded mode
     ORCHESTRATOR_TIMEOUT: int = 30
+    JOB_DEADLINE: float = 300.0 # Default end-to-end budget per /analyze job (s), overridable per request; 0 = none
+    DISCONNECT_POLL_INTERVAL: float = 1.0 # How often a running job checks whether its client went away
+    # Comma-separated replica lists ("host:port" or URLs). Empty = the single *_HOST/*_PORT above.
+    PREPROCESSING_ENDPOINTS: str = ""
+    VISUAL_ENDPOINTS: str = ""
+    # Admission control (0 = unlimited). Over-budget jobs queue, then get 503 + Retry-After.
+    ADMISSION_MEMORY_BUDGET_MB: int = 2048
+    ADMISSION_QUEUE_TIMEOUT: float = 30.0
+    ADMISSION_MAX_QUEUE: int = 100
+    ADMISSION_RETRY_AFTER: int = 10
+    HEALTH_CHECK_INTERVAL: float = 5.0
+    HEALTH_CHECK_TIMEOUT: float = 2.0
+    REPLICA_EJECT_AFTER: int = 3 # Consecutive failures before a replica is ejected
+    REPLICA_READMIT_AFTER: int = 2 # Consecutive successful probes before it is re-admitted
+
+    # Per-page resilience (visual analysis calls)
+    PAGE_TIMEOUT: float = 120.0
+    PAGE_MAX_RETRIES: int = 2
+    PAGE_RETRY_BACKOFF: float = 0.5 # Base delay (s), doubled per attempt with full jitter
+    PAGE_RETRY_BACKOFF_MAX: float = 8.0
+    HEDGE_ENABLED: bool = True
+    HEDGE_QUANTILE: float = 0.95 # Fire a duplicate request once a page exceeds this latency quantile
+    HEDGE_MIN_DELAY: float = 5.0
+    HEDGE_MIN_SAMPLES: int = 20
+
+    # Finished jobs (pages, blocks, full-text index). Empty = results are not persisted.
+    RESULT_STORE_PATH: str = "/tmp/doc_analysis_results/results.db"
+    RESULT_CACHE_TTL: float = 86400.0 # Serve completed results for identical uploads + config (s); 0 = off
+    RESULT_RETENTION: float = 30 * 86400.0 # Stored jobs are deleted after this many seconds; 0 = kept forever
+    RESULT_IMAGE_RETENTION: float = 86400.0 # Page images (the bulk of a stored job) are dropped sooner; 0 = kept
+    RESULT_PRUNE_INTERVAL: float = 3600.0 # Seconds between retention passes
+
+    # Per-job page pipeline: preprocess (denoise/deskew of scanned PDF pages) -> visual analysis
+    PIPELINE_PREPROCESS_WORKERS: int = 4
+    PIPELINE_VISUAL_WORKERS: int = 16
+    PIPELINE_QUEUE_SIZE: int = 8 # Preprocessed pages waiting for a visual worker
+    # Preprocessing service: threads for its CPU-bound work (OpenCV, rendering) off the event loop
+    PREPROCESS_WORKERS: int = 4
+
+    # Table cell structure from ruling lines / layout on CPU (preprocessing service), no extra VLM call
+    ENABLE_TABLE_STRUCTURE: bool = True
+
+    # Local entity extraction over the document text (dates, amounts, IBANs, invoice numbers, emails)
+    ENABLE_ENTITY_EXTRACTION: bool = True
+    ENTITY_DICTIONARIES: str = "" # JSON file {"type": ["term", ...] or {"term": "canonical"}}; empty = regex families only
     
     class Config:
         env_file = ".env"
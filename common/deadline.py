@@ -0,0 +1,57 @@
+import time
+from typing import Dict, Optional
+
+# Remaining time budget (milliseconds) for the job a request belongs to.
+# Relative rather than absolute so services do not depend on synchronized clocks.
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, message: str = "Job deadline exceeded"):
+        super().__init__(message)
+
+
+class Deadline:
+    """
+    Point in time (monotonic clock) by which a job must be done.
+    A deadline created with timeout=None never expires.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """Deadline from an X-Deadline-Ms header value; missing or invalid values mean no deadline."""
+        try:
+            return cls(max(0.0, float(value)) / 1000)
+        except (TypeError, ValueError):
+            return cls(None)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """A call timeout: cap, shortened to the time left."""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(cap, remaining)
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded()
+
+    def headers(self) -> Dict[str, str]:
+        """Headers that propagate the deadline to a downstream service."""
+        remaining = self.remaining()
+        if remaining is None:
+            return {}
+        return {DEADLINE_HEADER: str(int(remaining * 1000))}
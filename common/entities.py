@@ -0,0 +1,307 @@
+import bisect
+import json
+import re
+from collections import deque
+from datetime import date
+from itertools import accumulate
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from common.schemas import DocumentContent, Entity, TextAnchor
+
+# Entity types produced by the built-in regex families
+DATE = "date"
+AMOUNT = "amount"
+IBAN = "iban"
+INVOICE_NUMBER = "invoice_number"
+EMAIL = "email"
+
+_MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_MONTH = r"(?i:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_CURRENCY = r"(?:[$€£¥]|(?:USD|EUR|GBP|CHF|JPY)\b)"
+_NUMBER = r"\d{1,3}(?:[.,' ]\d{3})*(?:[.,]\d{1,2})?(?!\d)|\d+(?:[.,]\d{1,2})?(?!\d)"
+_CURRENCY_CODES = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY"}
+TWO_DIGIT_YEAR_PIVOT = 50 # Two-digit years below this are 20xx, the others 19xx
+
+# All families in one alternation: a single finditer pass over the text.
+# Every entity starts at a word start (or currency symbol); the leading lookbehind
+# rejects the other positions with one check instead of trying every branch there.
+# Order matters where matches could overlap (an IBAN's digits are not an amount).
+FAMILIES = re.compile(
+    r"(?<![\w.+-])(?:"
+    r"(?P<email>\b[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b)"
+    r"|(?P<iban>\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?\b)"
+    r"|(?P<date>\b(?:\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}[./-]\d{1,2}[./-](?:\d{4}|\d{2})"
+    r"|\d{1,2}\.? " + _MONTH + r"\.? (?:\d{4}|\d{2})"
+    r"|" + _MONTH + r"\.? \d{1,2}(?:st|nd|rd|th)?,? \d{4})\b)"
+    r"|(?P<amount>" + _CURRENCY + r" ?(?:" + _NUMBER + r")|(?:" + _NUMBER + r") ?" + _CURRENCY + r")"
+    r"|(?i:\b(?:invoice|inv|rechnung|facture)\s*(?:no\.?|number|nr\.?|num\.?|#)?\s*[:#]?\s*)"
+    r"(?P<invoice_number>(?=[A-Z0-9/-]*\d)[A-Z0-9][A-Z0-9/-]{2,}))"
+)
+
+# Every family needs a digit or an '@': lines without one cannot hold an entity
+_TRIGGER = re.compile(r"[\d@]")
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_NUMERIC_DATE = re.compile(r"\d{1,2}[./-]\d{1,2}[./-]\d{2,4}")
+_DATE_SEPARATOR = re.compile(r"[./-]")
+_DATE_PARTS = re.compile(r"[A-Za-z]+|\d+")
+_NOT_NUMBER = re.compile(r"[^\d.,]")
+_DECIMALS = re.compile(r"[.,](\d{1,2})$")
+_GROUPING = re.compile(r"[.,]")
+
+_WORD = re.compile(r"\w+")
+_WORD_SPLIT = re.compile(r"(\w+)")
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a set of keys: finds every occurrence of every
+    key in one pass over the input, independent of the number of keys.
+    Keys and input are sequences of hashable symbols: characters of a string,
+    or (as EntityExtractor uses it) the words of a text.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[Hashable, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]] # Key ids ending at each state (incl. via fail links)
+        self.keys: List[Sequence[Hashable]] = []
+        self._built = False
+
+    def add(self, key: Sequence[Hashable]) -> int:
+        """Adds a key and returns its id."""
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self.keys.append(key)
+        self._out[state].append(len(self.keys) - 1)
+        self._built = False
+        return len(self.keys) - 1
+
+    def build(self):
+        """Computes failure links (breadth-first)."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter(self, text: Sequence[Hashable]) -> Iterator[Tuple[int, int]]:
+        """Yields (end_index_exclusive, key_id) for every occurrence."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        state = 0
+        for i, ch in enumerate(text):
+            if state == 0:
+                state = root.get(ch, 0)
+                if state == 0:
+                    continue
+            else:
+                nxt = goto[state].get(ch)
+                while nxt is None and state:
+                    state = fail[state]
+                    nxt = goto[state].get(ch)
+                state = nxt or 0
+            if out[state]:
+                for key_id in out[state]:
+                    yield i + 1, key_id
+
+
+def iban_is_valid(iban: str) -> bool:
+    """ISO 13616 mod-97 check."""
+    iban = iban.replace(" ", "").upper()
+    if not 15 <= len(iban) <= 34:
+        return False
+    digits = "".join(str(int(ch, 36)) for ch in iban[4:] + iban[:4])
+    return int(digits) % 97 == 1
+
+
+def normalize_amount(mention: str) -> Optional[str]:
+    """'€1.234,50' -> 'EUR 1234.50'; '$ 1,234' -> 'USD 1234.00'."""
+    code = next((c for c in ("USD", "EUR", "GBP", "CHF", "JPY") if c in mention), None)
+    code = code or next((_CURRENCY_CODES[s] for s in _CURRENCY_CODES if s in mention), None)
+    number = _NOT_NUMBER.sub("", mention)
+    if not number:
+        return None
+    # The last separator followed by 1-2 digits is the decimal mark; the others group thousands
+    match = _DECIMALS.search(number)
+    if match:
+        integer, decimals = number[:match.start()], match.group(1)
+    else:
+        integer, decimals = number, "00"
+    integer = _GROUPING.sub("", integer) or "0"
+    return f"{code} {int(integer)}.{decimals.ljust(2, '0')}" if code else None
+
+
+def _full_year(year: str) -> int:
+    """A year as written; two digits are expanded around TWO_DIGIT_YEAR_PIVOT ('24' -> 2024, '87' -> 1987)."""
+    value = int(year)
+    if len(year) > 2:
+        return value
+    return value + (2000 if value < TWO_DIGIT_YEAR_PIVOT else 1900)
+
+
+def normalize_date(mention: str) -> Optional[str]:
+    """ISO 8601 date for numeric (day-first) and month-name dates, or None if not a valid date."""
+    try:
+        if _ISO_DATE.fullmatch(mention):
+            y, m, d = map(int, mention.split("-"))
+        elif _NUMERIC_DATE.fullmatch(mention):
+            d, m, y = _DATE_SEPARATOR.split(mention)
+            d, m, y = int(d), int(m), _full_year(y)
+        else:
+            words = _DATE_PARTS.findall(mention)
+            month = next(_MONTHS.index(w[:3].lower()) + 1 for w in words if w[:3].lower() in _MONTHS)
+            numbers = [w for w in words if w.isdigit()]
+            d, y, m = int(numbers[0]), _full_year(numbers[-1]), month
+        return date(y, m, d).isoformat()
+    except (ValueError, StopIteration, IndexError):
+        return None
+
+
+def candidate_ranges(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) ranges of text that can contain a pattern entity: the lines
+    with a digit or '@', each with the line before it (a label such as
+    "Invoice No:" above its value). Adjacent ranges are merged.
+    """
+    ranges = []
+    pos = 0
+    while True:
+        trigger = _TRIGGER.search(text, pos)
+        if trigger is None:
+            return ranges
+        line_break = text.rfind("\n", 0, trigger.start())
+        start = text.rfind("\n", 0, max(line_break, 0)) + 1
+        end = text.find("\n", trigger.end())
+        end = len(text) if end < 0 else end
+        if ranges and start <= ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+        pos = end
+
+
+Dictionaries = Dict[str, Union[Iterable[str], Dict[str, str]]]
+
+
+def load_dictionaries(path: str) -> Dictionaries:
+    """JSON file: {"entity_type": ["term", ...]} or {"entity_type": {"term": "canonical value", ...}}."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class EntityExtractor:
+    """
+    Local entity extraction: dictionary terms plus the regex families above,
+    over the document text. Terms are matched case-insensitively on whole
+    words by an Aho-Corasick automaton over words, so the separators between
+    a term's words do not matter ("ACME Corp" also matches "ACME\\nCorp").
+    Entities get TextAnchor offsets into the text and, when blocks carry
+    text anchors, the source block's bounding box and page.
+    """
+
+    def __init__(self, dictionaries: Optional[Dictionaries] = None):
+        self.automaton = AhoCorasick()
+        self._terms: List[Tuple[str, str]] = [] # key id -> (entity type, canonical value)
+        for entity_type, terms in (dictionaries or {}).items():
+            items = terms.items() if isinstance(terms, dict) else ((t, t) for t in terms)
+            for term, canonical in items:
+                words = _WORD.findall(term.lower())
+                if words:
+                    self.automaton.add(words)
+                    self._terms.append((entity_type, canonical))
+        self.automaton.build()
+
+    def _dictionary_matches(self, text: str) -> Iterator[Tuple[str, int, int, str]]:
+        if not self._terms:
+            return
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = text # Lowercasing changed lengths (rare scripts): fall back to case-sensitive
+        # [separator, word, separator, word, ..., separator]: word i spans offsets[2i]..offsets[2i + 1]
+        parts = _WORD_SPLIT.split(lowered)
+        hits = list(self.automaton.iter(parts[1::2]))
+        if not hits:
+            return
+        offsets = list(accumulate(map(len, parts)))
+        # Longest match wins among overlapping ones, leftmost first
+        matches = [(end - len(self.automaton.keys[key_id]), end, key_id) for end, key_id in hits]
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        last_end = 0
+        for first, end, key_id in matches:
+            if first < last_end:
+                continue
+            last_end = end
+            entity_type, canonical = self._terms[key_id]
+            yield entity_type, offsets[2 * first], offsets[2 * end - 1], canonical
+
+    def _regex_matches(self, text: str) -> Iterator[Tuple[str, int, int, Optional[str], float]]:
+        for match in (m for start, end in candidate_ranges(text) for m in FAMILIES.finditer(text, start, end)):
+            kind = match.lastgroup
+            start, end = match.span(kind)
+            mention = match.group(kind)
+            if kind == IBAN:
+                if not iban_is_valid(mention):
+                    continue
+                yield kind, start, end, mention.replace(" ", "").upper(), 0.99
+            elif kind == DATE:
+                normalized = normalize_date(mention)
+                if normalized:
+                    yield kind, start, end, normalized, 0.9
+            elif kind == AMOUNT:
+                yield kind, start, end, normalize_amount(mention), 0.85
+            elif kind == EMAIL:
+                yield kind, start, end, mention.lower(), 0.95
+            else:
+                yield kind, start, end, mention, 0.8
+
+    def extract(self, text: str) -> List[Entity]:
+        """Entities in text order, with text anchors (no bounding boxes)."""
+        found = [(start, end, kind, normalized, confidence)
+                 for kind, start, end, normalized, confidence in self._regex_matches(text)]
+        # Dictionary terms inside a pattern match (the domain of an email, ...) are not entities of their own
+        regex_starts = [f[0] for f in found]
+        for kind, start, end, canonical in self._dictionary_matches(text):
+            i = bisect.bisect_right(regex_starts, start) - 1
+            if (i >= 0 and found[i][1] > start) or (i + 1 < len(regex_starts) and regex_starts[i + 1] < end):
+                continue
+            found.append((start, end, kind, canonical, 1.0))
+        found.sort(key=lambda f: (f[0], f[1]))
+        return [
+            Entity(type=kind, mention_text=text[start:end], normalized_value=normalized, confidence=confidence,
+                   text_anchor=TextAnchor(start_offset=start, end_offset=end))
+            for start, end, kind, normalized, confidence in found
+        ]
+
+    def extract_document(self, document: DocumentContent) -> List[Entity]:
+        """Entities over document.text; each gets the bounding box and page of the block containing it."""
+        entities = self.extract(document.text)
+        spans = sorted(
+            (b.text_anchor.start_offset, b.text_anchor.end_offset, b, page.page_number)
+            for page in document.pages for b in page.blocks if b.text_anchor is not None
+        )
+        starts = [s[0] for s in spans]
+        for entity in entities:
+            i = bisect.bisect_right(starts, entity.text_anchor.start_offset) - 1
+            if i >= 0 and entity.text_anchor.end_offset <= spans[i][1]:
+                entity.bounding_box = spans[i][2].bounding_box
+                entity.page_number = spans[i][3]
+        return entities
@@ -1,31 +1,78 @@
-from openai import AsyncOpenAI
+import asyncio
+import base64
+import random
+from typing import Dict, Optional, Tuple
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
 from common.config import settings
+from common.deadline import Deadline, DeadlineExceeded
 from common.logger import configure_logger
+from common.rate_limiter import RateLimiter, PRIORITY_INTERACTIVE, parse_retry_after
 
 logger = configure_logger("fireworks_client")
 
+MAX_TOKENS = 4096
+
 class FireworksClient:
     def __init__(self):
         if not settings.FIREWORKS_API_KEY:
             logger.warning("FIREWORKS_API_KEY is not set. Cloud features will fail.")
-        
+
+        # SDK retries are disabled: retries go through the rate limiter so 429s
+        # back off globally instead of turning into per-replica retry storms.
         self.client = AsyncOpenAI(
             base_url="https://api.fireworks.ai/inference/v1",
             api_key=settings.FIREWORKS_API_KEY,
             timeout=120.0, # Explicit 2 minute timeout
-            max_retries=5
+            max_retries=0
         )
+        self.timeout = 120.0
         self.model = settings.FIREWORKS_MODEL
+        self.max_retries = settings.FIREWORKS_MAX_RETRIES
+        self.limiters: Dict[str, RateLimiter] = {}
+
+    def limiter(self, model: str) -> RateLimiter:
+        """The rate limiter of a model: each model called (VLM_ROUTES included) spends its own quota."""
+        if model not in self.limiters:
+            self.limiters[model] = RateLimiter(
+                requests_per_minute=settings.FIREWORKS_RPM,
+                tokens_per_minute=settings.FIREWORKS_TPM,
+                burst_seconds=settings.FIREWORKS_BURST_SECONDS,
+                state_path=settings.FIREWORKS_LIMITER_DB,
+                name=model,
+            )
+        return self.limiters[model]
 
     def encode_image(self, image_path: str) -> str:
         """Encodes a local image file to base64 string."""
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
 
-    async def analyze_image(self, image_path: str = None, prompt: str = "", base64_image: str = None) -> str:
+    @staticmethod
+    def estimate_tokens(prompt: str) -> int:
+        """Rough upfront cost of a call: prompt text + image + the full completion budget."""
+        return len(prompt) // 4 + settings.FIREWORKS_IMAGE_TOKENS + MAX_TOKENS
+
+    async def analyze_image(self, image_path: str = None, prompt: str = "", base64_image: str = None,
+                            priority: int = PRIORITY_INTERACTIVE, model: Optional[str] = None,
+                            timeout: Optional[float] = None) -> str:
         """
         Sends an image to the VLM and returns the test response.
         Accepts either image_path or base64_image.
+        Calls are admitted by the client-side rate limiter in priority order.
+        """
+        content, _ = await self.analyze_image_with_usage(image_path, prompt, base64_image, priority, model, timeout)
+        return content
+
+    async def analyze_image_with_usage(self, image_path: str = None, prompt: str = "", base64_image: str = None,
+                                       priority: int = PRIORITY_INTERACTIVE,
+                                       model: Optional[str] = None,
+                                       timeout: Optional[float] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        Same as analyze_image, but also returns the token usage reported by the
+        provider: {"prompt_tokens", "completion_tokens", "total_tokens"}.
+        model overrides the default FIREWORKS_MODEL for this call.
+        timeout (s) bounds the whole call, rate limiter waits and retries included
+        (raises DeadlineExceeded); each request is also capped at the client's 120s.
         """
         try:
             if base64_image is None:
@@ -34,30 +81,74 @@ class FireworksClient:
                     base64_image = self.encode_image(image_path)
                 else:
                     raise ValueError("Either image_path or base64_image must be provided")
-            
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt,
-                            },
-                        ],
+
+            estimated_tokens = self.estimate_tokens(prompt)
+            deadline = Deadline(timeout)
+            model = model or self.model
+            limiter = self.limiter(model)
+
+            for attempt in range(self.max_retries + 1):
+                deadline.check()
+                try:
+                    await asyncio.wait_for(limiter.acquire(estimated_tokens, priority=priority), deadline.remaining())
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded("Job deadline exceeded while waiting for the rate limiter")
+                try:
+                    response = await self._create(prompt, base64_image, model, deadline.timeout(self.timeout))
+                except (RateLimitError, APIConnectionError, APIStatusError) as e:
+                    status = getattr(e, "status_code", None)
+                    retryable = isinstance(e, (RateLimitError, APIConnectionError)) or (status or 0) >= 500
+                    if not retryable or attempt == self.max_retries:
+                        raise
+
+                    delay = parse_retry_after(getattr(getattr(e, "response", None), "headers", None))
+                    if delay is None:
+                        delay = random.uniform(0, min(30.0, 2 ** attempt))
+                    if deadline.timeout(delay) < delay:
+                        raise # No time left for another attempt
+                    if isinstance(e, RateLimitError):
+                        # Block every caller of this model sharing the limiter, not just this one
+                        await limiter.block_for(delay)
+                        logger.warning(f"Fireworks rate limited (429), backing off {delay:.1f}s")
+                    else:
+                        logger.warning(f"Fireworks call failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                    continue
+
+                usage = {}
+                if response.usage is not None:
+                    usage = {
+                        "prompt_tokens": response.usage.prompt_tokens,
+                        "completion_tokens": response.usage.completion_tokens,
+                        "total_tokens": response.usage.total_tokens,
                     }
-                ],
-                temperature=0.0,
-                max_tokens=4096,
-            )
-            return response.choices[0].message.content
+                    await limiter.settle(estimated_tokens, response.usage.total_tokens)
+                return response.choices[0].message.content, usage
         except Exception as e:
             logger.error(f"Fireworks API call failed: {str(e)}", exc_info=True)
             raise e
+
+    async def _create(self, prompt: str, base64_image: str, model: str, timeout: float):
+        return await self.client.chat.completions.create(
+            model=model,
+            timeout=timeout,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{base64_image}"
+                            },
+                        },
+                        {
+                            "type": "text",
+                            "text": prompt,
+                        },
+                    ],
+                }
+            ],
+            temperature=0.0,
+            max_tokens=MAX_TOKENS,
+        )
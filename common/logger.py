@@ -1,26 +1,220 @@
 import structlog
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
 from common.config import settings
 
+_DIGITS = re.compile(r"\d+")
+_LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "warn": logging.WARNING,
+           "error": logging.ERROR, "exception": logging.ERROR, "critical": logging.CRITICAL, "fatal": logging.CRITICAL}
+
+# Handler/listener installed on the root logger by configure_logger (installed once per process)
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class LogSampler:
+    """
+    structlog processor: drops INFO/DEBUG events by sampling rate (event
+    prefix -> fraction kept) and caps each distinct event at rate_limit
+    records/s (token bucket; WARNING included, ERROR and above never dropped).
+    Events differing only in numbers ("Page 3 ...", "Page 4 ...") count as
+    one. The next record let through reports how many were suppressed.
+    Buckets of idle events (full again, nothing suppressed) are swept once a
+    second, and at most max_buckets are kept (least recently used go first),
+    so events carrying ids do not grow the table without bound.
+    """
+
+    def __init__(self, sample_rates: Dict[str, float], rate_limit: float, max_buckets: int = 10_000):
+        self.sample_rates = sorted(sample_rates.items(), key=lambda item: -len(item[0])) # Longest prefix first
+        self.rate_limit = rate_limit
+        self.max_buckets = max_buckets
+        # key -> [tokens, last refill, suppressed], least recently used first
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._swept = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, method_name, event_dict):
+        level = _LEVELS.get(method_name, logging.INFO)
+        if level >= logging.ERROR:
+            return event_dict
+        event = str(event_dict.get("event", ""))
+
+        if level < logging.WARNING:
+            for prefix, rate in self.sample_rates:
+                if event.startswith(prefix):
+                    if random.random() >= rate:
+                        raise structlog.DropEvent
+                    break
+
+        if self.rate_limit > 0:
+            key = _DIGITS.sub("#", event[:80])
+            now = time.monotonic()
+            with self._lock:
+                if now - self._swept >= 1.0:
+                    self._sweep(now)
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [self.rate_limit, now, 0]
+                    if len(self._buckets) > self.max_buckets:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(key)
+                bucket[0] = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    bucket[2] += 1
+                    raise structlog.DropEvent
+                bucket[0] -= 1
+                suppressed, bucket[2] = bucket[2], 0
+            if suppressed:
+                event_dict["suppressed"] = suppressed
+        return event_dict
+
+    def _sweep(self, now: float):
+        """
+        Drops the buckets idle for a second (refilled: a new one would be the same)
+        that have no suppressed count left to report. Holds the lock.
+        """
+        self._swept = now
+        for key, (_, updated, suppressed) in list(self._buckets.items()):
+            if now - updated < 1.0:
+                break # Used within the last second, as is every bucket after it
+            if not suppressed:
+                del self._buckets[key]
+
+
+def truncate_fields(max_chars: int):
+    """
+    structlog processor: shortens long string values (raw model output,
+    base64, tracebacks) to their head and tail, and hides bytes.
+    """
+    head = max_chars // 2
+    tail = max_chars - head
+
+    def processor(logger, method_name, event_dict):
+        for key, value in event_dict.items():
+            if isinstance(value, str) and len(value) > max_chars:
+                event_dict[key] = f"{value[:head]}...[{len(value) - max_chars} chars]...{value[-tail:]}"
+            elif isinstance(value, (bytes, bytearray)):
+                event_dict[key] = f"<{len(value)} bytes>"
+        return event_dict
+    return processor
+
+
+def capture_exc_info(logger, method_name, event_dict):
+    """exc_info=True means "the exception being handled": resolve it now, the record is rendered on another thread."""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the background writer without formatting them: the
+    default prepare() renders the message on the calling thread, which is
+    exactly the work this handler moves off the hot path. A full queue drops
+    the record instead of blocking; the count is reported by the writer.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _report_dropped(logger, method_name, event_dict):
+    """Writer-side processor: adds the number of records dropped on a full queue since the last report."""
+    if isinstance(_handler, AsyncQueueHandler) and _handler.dropped:
+        event_dict["dropped_logs"], _handler.dropped = _handler.dropped, 0
+    return event_dict
+
+
+def _install_handler():
+    """Root handler rendering with structlog's ProcessorFormatter, behind a queue and a writer thread if LOG_ASYNC."""
+    global _handler, _listener
+    if _handler is not None:
+        return
+
+    renderer = structlog.dev.ConsoleRenderer() if settings.ENV == "dev" else structlog.processors.JSONRenderer()
+    formatter = structlog.stdlib.ProcessorFormatter(
+        # Records from plain logging (uvicorn, httpx, getLogger(...)) get the same fields
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+        processors=[
+            _report_dropped,
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            *([] if settings.ENV == "dev" else [structlog.processors.format_exc_info]),
+            truncate_fields(settings.LOG_MAX_FIELD_CHARS),
+            renderer,
+        ],
+    )
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    if settings.LOG_ASYNC:
+        _handler = AsyncQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(_handler.queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(flush_logs)
+    else:
+        _handler = stream
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(getattr(logging, settings.LOG_LEVEL))
+
+
+def flush_logs():
+    """Stops the background writer once everything queued is written (at exit; later records are written inline)."""
+    global _handler, _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    _handler = listener.handlers[0]
+    root.addHandler(_handler)
+
+
 def configure_logger(service_name: str):
     """
     Configures structured logging for a service.
+    Callers only build the event dict (after level filtering, sampling and
+    rate limiting); rendering and stdout I/O happen on a background writer
+    thread (LOG_ASYNC).
     """
-    
-    # Set standard logging level
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, settings.LOG_LEVEL),
-    )
+    _install_handler()
 
     processors = [
+        # Cheapest checks first: disabled levels and sampled-out events cost almost nothing
+        structlog.stdlib.filter_by_level,
+        LogSampler(settings.LOG_SAMPLE_RATES, settings.LOG_RATE_LIMIT),
         structlog.contextvars.merge_contextvars,
         structlog.processors.add_log_level,
         structlog.processors.StackInfoRenderer(),
         structlog.processors.TimeStamper(fmt="iso"),
-        structlog.dev.ConsoleRenderer() if settings.ENV == "dev" else structlog.processors.JSONRenderer()
+        capture_exc_info,
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
     ]
 
     structlog.configure(
@@ -0,0 +1,242 @@
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+
+
+def parse_priority(value: Optional[str]) -> int:
+    """Maps an 'X-Priority' style header value to a priority level (default interactive)."""
+    return PRIORITIES.get((value or "").strip().lower(), PRIORITY_INTERACTIVE)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    Extracts the server-requested delay (seconds) from 'retry-after-ms' or
+    'retry-after' (delta-seconds or HTTP date). Returns None if absent/invalid.
+    """
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+@dataclass
+class BucketState:
+    requests: float
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0
+
+
+class _LocalStore:
+    """Bucket state held in this process only."""
+
+    def __init__(self, initial: BucketState):
+        self._state = initial
+        self._lock = threading.Lock()
+
+    def update(self, fn):
+        with self._lock:
+            return fn(self._state)
+
+
+class _SQLiteStore:
+    """
+    Bucket state shared by every process pointing at the same SQLite file.
+    BEGIN IMMEDIATE serializes read-modify-write cycles across processes.
+    """
+
+    def __init__(self, path: str, name: str, initial: BucketState):
+        self.path = path
+        self.name = name
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, requests REAL, tokens REAL, updated REAL, blocked_until REAL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, ?)",
+                (name, initial.requests, initial.tokens, initial.updated, initial.blocked_until),
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+
+    def update(self, fn):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT requests, tokens, updated, blocked_until FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            state = BucketState(*row)
+            result = fn(state)
+            conn.execute(
+                "UPDATE buckets SET requests = ?, tokens = ?, updated = ?, blocked_until = ? WHERE name = ?",
+                (state.requests, state.tokens, state.updated, state.blocked_until, self.name),
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """
+    Client-side limiter with two token buckets (requests/min and tokens/min).
+
+    Waiters are served in priority order within a process. Bucket state (and any
+    Retry-After block) can be shared across worker processes via a SQLite file.
+    A rate of 0 disables that bucket; with both disabled, calls only wait out
+    the Retry-After blocks set through this limiter object.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        burst_seconds: float = 10.0,
+        state_path: str = "",
+        name: str = "default",
+    ):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        # Bucket capacity: allow bursts of at most burst_seconds worth of quota
+        self.request_capacity = max(1.0, self.rpm * burst_seconds / 60)
+        self.token_capacity = max(1.0, self.tpm * burst_seconds / 60)
+
+        initial = BucketState(self.request_capacity, self.token_capacity, time.time())
+        self._shared = bool(state_path)
+        self._store = _SQLiteStore(state_path, name, initial) if state_path else _LocalStore(initial)
+        self._blocked_until = 0.0 # Local copy of the last block_for, for the disabled fast path
+
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    def _refill(self, state: BucketState, now: float):
+        elapsed = max(0.0, now - state.updated)
+        if self.rpm:
+            state.requests = min(self.request_capacity, state.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            state.tokens = min(self.token_capacity, state.tokens + elapsed * self.tpm / 60)
+        state.updated = now
+
+    def try_acquire(self, tokens: float) -> float:
+        """Takes one request and `tokens` if available. Returns 0, or the seconds to wait."""
+        tokens = min(tokens, self.token_capacity)
+
+        def take(state: BucketState) -> float:
+            now = time.time()
+            if now < state.blocked_until:
+                return state.blocked_until - now
+            self._refill(state, now)
+            wait = 0.0
+            if self.rpm and state.requests < 1:
+                wait = max(wait, (1 - state.requests) * 60 / self.rpm)
+            if self.tpm and state.tokens < tokens:
+                wait = max(wait, (tokens - state.tokens) * 60 / self.tpm)
+            if wait == 0:
+                if self.rpm:
+                    state.requests -= 1
+                if self.tpm:
+                    state.tokens -= tokens
+            return wait
+
+        return self._store.update(take)
+
+    async def acquire(self, tokens: float = 0, priority: int = PRIORITY_INTERACTIVE):
+        """Waits until the call is admitted. Higher-priority waiters go first."""
+        if not self.enabled:
+            # No buckets to take from: skip the queue and the state store
+            delay = self._blocked_until - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+
+        entry = (priority, next(self._seq))
+        async with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    if self._waiters[0] != entry:
+                        await self._cond.wait()
+                        continue
+                    wait = await self._run(self.try_acquire, tokens)
+                    if wait <= 0:
+                        return
+                    try:
+                        # Head may change while sleeping if a higher-priority call arrives
+                        await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    async def _run(self, fn, *args):
+        """Runs a store operation: in a thread for the SQLite store (blocking I/O, busy waits), inline for the local one."""
+        if self._shared:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def settle(self, estimated_tokens: float, actual_tokens: float):
+        """Corrects the token bucket once the real usage of a call is known."""
+        if not self.tpm:
+            return
+
+        def adjust(state: BucketState):
+            self._refill(state, time.time())
+            state.tokens = min(self.token_capacity, state.tokens + estimated_tokens - actual_tokens)
+
+        await self._run(self._store.update, adjust)
+
+    async def block_for(self, seconds: float):
+        """Honors a provider Retry-After: no call is admitted (in any sharing process) for `seconds`."""
+
+        self._blocked_until = max(self._blocked_until, time.time() + seconds)
+
+        def block(state: BucketState):
+            state.blocked_until = max(state.blocked_until, time.time() + seconds)
+
+        await self._run(self._store.update, block)
@@ -0,0 +1,68 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, Optional
+
+from common.logger import configure_logger
+
+logger = configure_logger("readiness")
+
+
+class Readiness:
+    """
+    Tracks whether a service has finished warming up.
+
+    /health (liveness) only says the process is serving; /ready flips once every
+    warm-up step (heavy imports, model loading, a first inference) has run.
+    """
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.started = time.monotonic()
+        self.ready = False
+        self.error: Optional[str] = None
+        self.ready_after_s: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_after_s = round(time.monotonic() - self.started, 3)
+
+    async def warm_up(self, steps: Dict[str, Callable[[], Any]]):
+        """
+        Runs the warm-up steps in order, then marks the service ready. Blocking
+        steps run in a worker thread; coroutine functions run on the service's
+        event loop (e.g. a first call through a shared async client, whose
+        connection pool belongs to that loop).
+        """
+        try:
+            for name, step in steps.items():
+                t0 = time.perf_counter()
+                if inspect.iscoroutinefunction(step):
+                    await step()
+                else:
+                    await asyncio.to_thread(step)
+                self.steps[name] = round((time.perf_counter() - t0) * 1000, 1)
+            self.mark_ready()
+            logger.info(f"{self.service_name} ready after {self.ready_after_s}s", steps_ms=self.steps)
+        except Exception as e:
+            # Stay not-ready: the orchestrator/k8s should not route traffic here
+            self.error = repr(e)
+            logger.error(f"{self.service_name} warm-up failed: {e}", exc_info=True)
+
+    def start(self, steps: Dict[str, Callable[[], Any]], enabled: bool = True):
+        """Schedules warm-up in the background (service startup must not block on it)."""
+        if not enabled:
+            # Heavy modules load lazily on the first request instead
+            self.mark_ready()
+            return None
+        return asyncio.create_task(self.warm_up(steps))
+
+    def status(self) -> dict:
+        return {
+            "service": self.service_name,
+            "ready": self.ready,
+            "ready_after_s": self.ready_after_s,
+            "warmup_ms": self.steps,
+            "error": self.error,
+        }
@@ -23,6 +23,7 @@ class Entity(BaseModel):
     confidence: float
     text_anchor: Optional[TextAnchor] = None
     bounding_box: Optional[BoundingBox] = None
+    page_number: Optional[int] = None
     properties: List['Entity'] = []
 
 class VisualElement(BaseModel):
@@ -41,6 +42,7 @@ class TableRow(BaseModel):
     cells: List[TableCell]
 
 class Table(BaseModel):
+    page_number: Optional[int] = None
     confidence: float
     header_rows: List[TableRow] = []
     body_rows: List[TableRow] = []
@@ -50,13 +52,19 @@ class Block(BaseModel):
     block_type: str # paragraph, title, etc
     text: str
     bounding_box: Optional[BoundingBox] = None
+    text_anchor: Optional[TextAnchor] = None # Offsets of this block's text in DocumentContent.text
 
 class Page(BaseModel):
     page_number: int
     dimension: Dimension
-    orientation: int = 0
+    orientation: int = 0 # Clockwise rotation (0/90/180/270) applied to make the page upright
     blocks: List[Block] = []
     base64_image: Optional[str] = None # Added for PDF rendering on Frontend
+    page_type: Optional[str] = None # PDFs: text_native, scanned or mixed
+    status: str = "ok" # ok, retried, failed, timed_out
+    attempts: int = 1 # VLM calls made for this page (0 = served from the PDF text layer)
+    error: Optional[str] = None
+    routing: Dict[str, Any] = {} # VLM routing: page complexity, model used, whether it fell back to the large model
 
 class DocumentContent(BaseModel):
     text: str # Full raw text
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from common.deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded
+
+
+def test_no_deadline_never_expires():
+    deadline = Deadline(None)
+    assert deadline.remaining() is None and not deadline.expired
+    assert deadline.timeout() is None
+    assert deadline.timeout(30) == 30
+    assert deadline.headers() == {}
+    deadline.check()
+
+
+def test_timeout_is_clamped_to_the_time_left():
+    deadline = Deadline(2.0)
+    assert deadline.timeout(30) == pytest.approx(2.0, abs=0.05)
+    assert deadline.timeout(0.5) == 0.5
+    assert deadline.timeout() == pytest.approx(2.0, abs=0.05)
+    # Never negative once it has passed
+    assert Deadline(-1).remaining() == 0.0
+    assert Deadline(-1).timeout(30) == 0.0
+
+
+def test_header_round_trip():
+    deadline = Deadline(5.0)
+    headers = deadline.headers()
+    assert set(headers) == {DEADLINE_HEADER}
+    downstream = Deadline.from_header(headers[DEADLINE_HEADER])
+    assert downstream.remaining() == pytest.approx(5.0, abs=0.05)
+    assert downstream.remaining() <= deadline.remaining() # Truncated to ms, never extended
+
+    assert Deadline.from_header("0").expired
+    assert Deadline.from_header("-50").expired
+    for missing in (None, "", "soon"):
+        assert Deadline.from_header(missing).remaining() is None
+
+
+def test_check_raises_once_expired():
+    deadline = Deadline(0.02)
+    deadline.check()
+    time.sleep(0.03)
+    assert deadline.expired
+    with pytest.raises(DeadlineExceeded, match="Job deadline exceeded"):
+        deadline.check()
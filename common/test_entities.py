@@ -0,0 +1,126 @@
+import pytest
+
+from common.entities import (AhoCorasick, EntityExtractor, candidate_ranges, iban_is_valid, normalize_amount,
+                             normalize_date)
+from common.schemas import DocumentContent
+
+TEXT = (
+    "ACME Corp\n"
+    "Invoice No: INV-2024/001\n"
+    "Date: 12.03.2024, due 12 April 24\n"
+    "Total: €1.234,50 (USD 99)\n"
+    "Pay to GB82 WEST 1234 5698 7654 32 or DE89370400440532013000\n"
+    "Questions: Billing@ACME.example.com\n"
+    "Thank you"
+)
+
+
+def entities(extractor, text):
+    return [(e.type, e.mention_text, e.normalized_value) for e in extractor.extract(text)]
+
+
+def test_regex_families():
+    found = entities(EntityExtractor(), TEXT)
+    assert found == [
+        ("invoice_number", "INV-2024/001", "INV-2024/001"),
+        ("date", "12.03.2024", "2024-03-12"),
+        ("date", "12 April 24", "2024-04-12"),
+        ("amount", "€1.234,50", "EUR 1234.50"),
+        ("amount", "USD 99", "USD 99.00"),
+        ("iban", "GB82 WEST 1234 5698 7654 32", "GB82WEST12345698765432"),
+        ("iban", "DE89370400440532013000", "DE89370400440532013000"),
+        ("email", "Billing@ACME.example.com", "billing@acme.example.com"),
+    ]
+
+
+def test_entity_offsets_point_into_the_text():
+    for entity in EntityExtractor({"organization": ["ACME Corp"]}).extract(TEXT):
+        anchor = entity.text_anchor
+        assert TEXT[anchor.start_offset:anchor.end_offset] == entity.mention_text
+
+
+def test_candidate_ranges_keep_the_label_line():
+    text = "Header\nInvoice number\nAB-1234\nfooter\nfree text\nmore text"
+    [(start, end)] = candidate_ranges(text)
+    assert text[start:end] == "Invoice number\nAB-1234"
+    assert candidate_ranges("no digits here") == []
+    assert entities(EntityExtractor(), text) == [("invoice_number", "AB-1234", "AB-1234")]
+
+
+def test_aho_corasick_finds_overlapping_keys():
+    automaton = AhoCorasick()
+    ids = {key: automaton.add(key) for key in ("he", "she", "his", "hers")}
+    hits = sorted((end - len(automaton.keys[key_id]), end, automaton.keys[key_id])
+                  for end, key_id in automaton.iter("ushers"))
+    assert hits == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+    assert len(ids) == 4
+    assert list(automaton.iter("xyz")) == []
+
+
+def test_dictionary_terms_match_whole_words_longest_first():
+    extractor = EntityExtractor({
+        "organization": {"acme": "ACME", "acme corp": "ACME Corporation"},
+        "product": ["widget"],
+    })
+    text = "Order from Acme\nCorp: 3 widgets, 1 widget. Contact sales@acme.com"
+    found = [(e.type, e.mention_text, e.normalized_value, e.text_anchor.start_offset) for e in extractor.extract(text)]
+    assert found == [
+        ("organization", "Acme\nCorp", "ACME Corporation", 11),
+        ("product", "widget", "widget", 35),
+        # "acme" inside the email is part of the email, not an organization
+        ("email", "sales@acme.com", "sales@acme.com", 51),
+    ]
+
+
+def test_iban_checksum():
+    assert iban_is_valid("GB82 WEST 1234 5698 7654 32")
+    assert iban_is_valid("de89370400440532013000")
+    assert not iban_is_valid("GB82 WEST 1234 5698 7654 33")
+    assert not iban_is_valid("GB82 WEST")
+    assert entities(EntityExtractor(), "IBAN GB82 WEST 1234 5698 7654 33") == []
+
+
+@pytest.mark.parametrize("mention, expected", [
+    ("€1.234,50", "EUR 1234.50"),
+    ("$ 1,234", "USD 1234.00"),
+    ("1 234.5 EUR", "EUR 1234.50"),
+    ("CHF 12'000", "CHF 12000.00"),
+    ("£0,99", "GBP 0.99"),
+    ("1234", None),
+])
+def test_normalize_amount(mention, expected):
+    assert normalize_amount(mention) == expected
+
+
+@pytest.mark.parametrize("mention, expected", [
+    ("2024-03-12", "2024-03-12"),
+    ("12/03/2024", "2024-03-12"),
+    ("1-2-24", "2024-02-01"),
+    ("01.02.49", "2049-02-01"),
+    ("01.02.50", "1950-02-01"),
+    ("31.12.87", "1987-12-31"),
+    ("12 March 24", "2024-03-12"),
+    ("3 Sept. 99", "1999-09-03"),
+    ("12. März 2024", None), # Month names are English only
+    ("March 3rd, 2024", "2024-03-03"),
+    ("Dec 25 2023", "2023-12-25"),
+    ("31.02.2024", None),
+    ("2024-13-01", None),
+])
+def test_normalize_date(mention, expected):
+    assert normalize_date(mention) == expected
+
+
+def test_extract_document_attaches_page_and_box():
+    document = DocumentContent.model_validate({
+        "text": "Invoice No: A-100\n\nTotal €20",
+        "pages": [{"page_number": 1, "dimension": {"width": 100, "height": 100}, "blocks": [
+            {"block_type": "text", "text": "Invoice No: A-100", "text_anchor": {"start_offset": 0, "end_offset": 17},
+             "bounding_box": {"x1": 1, "y1": 2, "x2": 3, "y2": 4}},
+            {"block_type": "text", "text": "Total €20", "text_anchor": {"start_offset": 19, "end_offset": 28},
+             "bounding_box": {"x1": 5, "y1": 6, "x2": 7, "y2": 8}},
+        ]}],
+    })
+    found = EntityExtractor().extract_document(document)
+    assert [(e.mention_text, e.page_number, e.bounding_box.x1) for e in found] == [("A-100", 1, 1), ("€20", 1, 5)]
+    assert EntityExtractor().extract_document(DocumentContent(text="no entities")) == []
@@ -0,0 +1,98 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import structlog
+
+from common import logger as logger_module
+from common.logger import LogSampler, truncate_fields
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logger_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def passes(sampler, event, method="info"):
+    try:
+        return sampler(None, method, {"event": event})
+    except structlog.DropEvent:
+        return None
+
+
+def test_sampling_by_longest_prefix(monkeypatch):
+    sampler = LogSampler({"Page ": 0.0, "Page 1 done": 1.0}, rate_limit=0)
+    assert passes(sampler, "Page 3 analyzed") is None
+    assert passes(sampler, "Page 1 done") is not None # More specific prefix wins
+    assert passes(sampler, "Job started") is not None
+    # Only INFO/DEBUG are sampled
+    assert passes(sampler, "Page 3 retried", "warning") is not None
+
+    monkeypatch.setattr(logger_module.random, "random", lambda: 0.3)
+    sampler = LogSampler({"Page ": 0.5}, rate_limit=0)
+    assert passes(sampler, "Page 3 analyzed") is not None
+
+
+def test_rate_limit_per_event_reports_suppressed(clock):
+    sampler = LogSampler({}, rate_limit=2)
+    # Events differing only in numbers share a bucket
+    assert [passes(sampler, f"Page {n} analyzed") is not None for n in range(5)] == [True, True, False, False, False]
+    assert passes(sampler, "Job started") is not None # Another event has its own bucket
+    assert passes(sampler, "Page 9 failed", "error") is not None # ERROR is never dropped
+    assert passes(sampler, "Page 9 slow", "warning") is not None
+
+    clock[0] += 0.5 # One token back
+    assert passes(sampler, "Page 6 analyzed")["suppressed"] == 3
+    assert passes(sampler, "Page 7 analyzed") is None
+
+
+def test_idle_buckets_are_evicted(clock):
+    sampler = LogSampler({}, rate_limit=5)
+    for _ in range(1000):
+        passes(sampler, f"Job {uuid.uuid4().hex} finished") # Ids with letters are not collapsed
+    for _ in range(10):
+        passes(sampler, "Busy event")
+    assert len(sampler._buckets) == 1001
+
+    clock[0] += 1.0
+    passes(sampler, "Busy event")
+    # The busy bucket still has suppressed records to report, so it stays
+    assert list(sampler._buckets) == ["Busy event"]
+    assert passes(sampler, "Busy event") is not None
+
+
+def test_bucket_count_is_capped(clock):
+    sampler = LogSampler({}, rate_limit=5, max_buckets=100)
+    for _ in range(1000):
+        passes(sampler, f"Job {uuid.uuid4().hex} finished")
+    assert len(sampler._buckets) == 100
+
+
+def test_truncate_fields():
+    processor = truncate_fields(10)
+    event = processor(None, "info", {"event": "short", "response": "a" * 5 + "x" * 100 + "b" * 5,
+                                     "image": b"\x89PNG" * 100, "count": 12345678901234})
+    assert event["event"] == "short"
+    assert event["response"] == "aaaaa...[100 chars]...bbbbb"
+    assert event["image"] == "<400 bytes>"
+    assert event["count"] == 12345678901234
+
+
+def test_sampler_in_the_processor_chain(capsys, clock):
+    structlog.configure(
+        processors=[LogSampler({}, rate_limit=1), structlog.processors.KeyValueRenderer(key_order=["event"])],
+        logger_factory=structlog.PrintLoggerFactory(),
+        cache_logger_on_first_use=False,
+    )
+    try:
+        log = structlog.get_logger()
+        for n in range(3):
+            log.info(f"Page {n} analyzed")
+        clock[0] += 1
+        log.info("Page 9 analyzed")
+    finally:
+        structlog.reset_defaults()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ["event='Page 0 analyzed'", "event='Page 9 analyzed' suppressed=2"]
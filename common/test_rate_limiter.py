@@ -0,0 +1,147 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from common import fireworks_client
+from common.rate_limiter import (RateLimiter, PRIORITY_BATCH, PRIORITY_INTERACTIVE, parse_priority,
+                                 parse_retry_after)
+
+
+def test_request_bucket_bursts_then_waits():
+    # 60 rpm with a 2 s burst: two requests at once, then one per second
+    limiter = RateLimiter(requests_per_minute=60, burst_seconds=2)
+    assert limiter.try_acquire(0) == 0
+    assert limiter.try_acquire(0) == 0
+    assert limiter.try_acquire(0) == pytest.approx(1.0, abs=0.05)
+
+
+def test_token_bucket_waits_for_refill_and_settles():
+    # 6000 tpm with a 1 s burst: 100 tokens, refilled at 100 per second
+    limiter = RateLimiter(tokens_per_minute=6000, burst_seconds=1)
+    assert limiter.try_acquire(80) == 0
+    assert limiter.try_acquire(60) == pytest.approx(0.4, abs=0.05)
+    # The call used 30 tokens instead of the 80 estimated: the other 50 come back
+    asyncio.run(limiter.settle(80, 30))
+    assert limiter.try_acquire(60) == 0
+
+
+def test_block_for_holds_every_call():
+    limiter = RateLimiter(requests_per_minute=600)
+    asyncio.run(limiter.block_for(5))
+    assert limiter.try_acquire(0) == pytest.approx(5, abs=0.05)
+
+
+def test_waiters_are_served_in_priority_order():
+    # One request per 0.05 s, none left: the queued calls are admitted one by one
+    limiter = RateLimiter(requests_per_minute=1200, burst_seconds=0)
+    assert limiter.try_acquire(0) == 0
+    order = []
+
+    async def call(name, priority):
+        await limiter.acquire(priority=priority)
+        order.append(name)
+
+    async def run():
+        batch = [asyncio.create_task(call(f"batch-{i}", PRIORITY_BATCH)) for i in range(2)]
+        await asyncio.sleep(0.01) # The batch calls are queued first
+        interactive = asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.gather(*batch, interactive)
+
+    asyncio.run(run())
+    assert order == ["interactive", "batch-0", "batch-1"]
+
+
+def test_disabled_limiter_skips_the_queue(monkeypatch):
+    async def no_thread(*args, **kwargs):
+        raise AssertionError("a disabled limiter should not touch its store")
+
+    monkeypatch.setattr(asyncio, "to_thread", no_thread)
+    limiter = RateLimiter()
+    assert not limiter.enabled
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire(10**6) for _ in range(100)))
+        elapsed = time.monotonic() - started
+        await limiter.block_for(0.1)
+        await limiter.acquire()
+        return elapsed, time.monotonic() - started - elapsed
+
+    elapsed, blocked = asyncio.run(run())
+    assert elapsed < 0.05
+    assert blocked >= 0.09
+
+
+def test_sqlite_state_is_shared_by_name(tmp_path):
+    path = str(tmp_path / "limiter.db")
+    first = RateLimiter(requests_per_minute=60, burst_seconds=1, state_path=path, name="model-a")
+    second = RateLimiter(requests_per_minute=60, burst_seconds=1, state_path=path, name="model-a")
+    other = RateLimiter(requests_per_minute=60, burst_seconds=1, state_path=path, name="model-b")
+
+    assert first.try_acquire(0) == 0
+    assert second.try_acquire(0) > 0 # The one request of the burst was taken through `first`
+    assert other.try_acquire(0) == 0
+
+    asyncio.run(other.block_for(5))
+    assert first.try_acquire(0) < 5
+    assert RateLimiter(requests_per_minute=60, state_path=path, name="model-b").try_acquire(0) > 4
+
+
+def test_contended_shared_store_does_not_stall_the_loop(tmp_path):
+    path = str(tmp_path / "limiter.db")
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000, state_path=path, name="model-a")
+    # Another process holds the write lock: every store update waits on SQLite's busy timeout
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        asyncio.get_running_loop().call_later(0.3, holder.execute, "COMMIT")
+        await asyncio.gather(limiter.settle(100, 50), limiter.block_for(0.1), limiter.acquire(10))
+        ticker.cancel()
+        return ticks
+
+    started = time.monotonic()
+    ticks = asyncio.run(run())
+    holder.close()
+    assert time.monotonic() - started >= 0.3 # The updates did wait for the lock...
+    assert ticks >= 10 # ...without blocking the event loop meanwhile
+
+
+def test_fireworks_client_has_a_limiter_per_model(monkeypatch):
+    monkeypatch.setattr(fireworks_client.settings, "FIREWORKS_API_KEY", "test")
+    monkeypatch.setattr(fireworks_client.settings, "FIREWORKS_RPM", 60)
+    monkeypatch.setattr(fireworks_client.settings, "FIREWORKS_LIMITER_DB", "")
+    client = fireworks_client.FireworksClient()
+    called = []
+
+    async def create(prompt, base64_image, model, timeout):
+        called.append(model)
+        raise ValueError("stop")
+
+    client._create = create
+    with pytest.raises(ValueError):
+        asyncio.run(client.analyze_image_with_usage(prompt="p", base64_image="x", model="routed"))
+    assert called == ["routed"]
+    assert set(client.limiters) == {"routed"}
+    assert client.limiter("routed") is client.limiters["routed"]
+    assert client.limiter(client.model) is not client.limiter("routed")
+
+
+def test_parse_headers():
+    assert parse_priority(" Batch ") == PRIORITY_BATCH
+    assert parse_priority(None) == PRIORITY_INTERACTIVE
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert parse_retry_after({"retry-after": "soon"}) is None
+    assert parse_retry_after(None) is None
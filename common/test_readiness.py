@@ -0,0 +1,29 @@
+import asyncio
+import threading
+
+from common.readiness import Readiness
+
+
+def test_steps_run_in_order_blocking_ones_off_the_loop():
+    ran = []
+
+    def blocking():
+        ran.append(("blocking", threading.current_thread() is threading.main_thread()))
+
+    async def on_loop():
+        ran.append(("on_loop", threading.current_thread() is threading.main_thread()))
+
+    readiness = Readiness("test")
+    asyncio.run(readiness.warm_up({"blocking": blocking, "on_loop": on_loop}))
+    assert ran == [("blocking", False), ("on_loop", True)]
+    assert readiness.ready and set(readiness.status()["warmup_ms"]) == {"blocking", "on_loop"}
+
+
+def test_failed_step_stays_not_ready():
+    async def fail():
+        raise RuntimeError("no quota")
+
+    readiness = Readiness("test")
+    asyncio.run(readiness.warm_up({"vlm_inference": fail}))
+    assert not readiness.ready
+    assert "no quota" in readiness.status()["error"]
@@ -16,6 +16,7 @@ export interface Block {
     block_type: string;
     text: string;
     bounding_box: BoundingBox;
+    text_anchor?: { start_offset: number; end_offset: number } | null;
 }
 
 export interface VisualElement {
@@ -26,6 +27,7 @@ export interface VisualElement {
 }
 
 export interface Table {
+    page_number?: number | null;
     confidence: number;
     bounding_box: BoundingBox;
     header_rows: unknown[];
@@ -39,14 +41,31 @@ export interface Page {
         height: number;
         unit: string;
     };
+    orientation?: 0 | 90 | 180 | 270;
     blocks: Block[];
     base64_image?: string;
+    page_type?: 'text_native' | 'scanned' | 'mixed' | null;
+    status?: 'ok' | 'retried' | 'failed' | 'timed_out';
+    attempts?: number;
+    error?: string | null;
+    routing?: { complexity?: string | null; model?: string; fallback?: boolean };
+}
+
+export interface Entity {
+    type: string;
+    mention_text: string;
+    normalized_value?: string | null;
+    confidence: number;
+    text_anchor?: { start_offset: number; end_offset: number } | null;
+    bounding_box?: BoundingBox | null;
+    page_number?: number | null;
+    properties?: Entity[];
 }
 
 export interface DocumentContent {
     text: string;
     pages: Page[];
-    entities: unknown[];
+    entities: Entity[];
     visual_elements: VisualElement[];
     tables: Table[];
 }
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import re
+import struct
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+# Memory model for one job held in the orchestrator (bytes). Conservative on purpose:
+# - the upload itself, plus a copy while it is posted to preprocessing
+# - per page: the PNG (decoded from base64), its base64 copy in the preprocessing
+#   response, the base64 data URL in the Page, and the serialized response
+UPLOAD_COPIES = 2
+PNG_BYTES_PER_PIXEL = 0.5 # Typical for document scans/renders (mostly white)
+PAGE_COPIES = 1 + 3 * 4 / 3 # raw PNG + three base64 copies
+FALLBACK_BYTES_PER_PAGE = 100_000 # PDFs whose page tree is not readable (compressed object streams)
+HEAD_BYTES = 64 * 1024 # Enough of an image to reach its dimensions
+TAIL_BYTES = 64 # Longer than a '/Type /Page' marker, for markers split across chunks
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Orchestrator memory budget exhausted")
+        self.retry_after = retry_after
+
+
+def image_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from a PNG or JPEG header without decoding, or None."""
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return struct.unpack(">II", head[16:24])
+    if head[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(head):
+            if head[i] != 0xFF:
+                i += 1
+                continue
+            marker = head[i + 1]
+            # SOF0..SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", head[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack(">H", head[i + 2:i + 4])[0]
+    return None
+
+
+def count_pdf_pages(data: bytes) -> Optional[int]:
+    """Page objects in the PDF, or None if the page tree is hidden in compressed streams."""
+    count = len(_PDF_PAGE.findall(data))
+    return count or None
+
+
+class CostEstimator:
+    """
+    estimate_job_cost over a stream: feed() the upload chunk by chunk (e.g. while
+    it is written to disk), then estimate(). Keeps only the image header and a
+    short tail of the previous chunk, so a page marker split across chunks still counts.
+    """
+
+    def __init__(self, content_type: str, page_pixels: float):
+        self.pdf = content_type == "application/pdf"
+        self.page_pixels = page_pixels
+        self.size = 0
+        self.head = b""
+        self.pages = 0
+        self._tail = b""
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        if len(self.head) < HEAD_BYTES:
+            self.head += chunk[:HEAD_BYTES - len(self.head)]
+        if self.pdf:
+            data = self._tail + chunk
+            # Markers starting in the last TAIL_BYTES are counted with the next chunk, once what follows them is known
+            cut = max(0, len(data) - TAIL_BYTES)
+            self.pages += sum(1 for m in _PDF_PAGE.finditer(data) if m.start() < cut)
+            self._tail = data[cut:]
+
+    def estimate(self) -> Tuple[int, int]:
+        """(estimated peak orchestrator memory in bytes, page count) for everything fed so far."""
+        if self.pdf:
+            pages = (self.pages + len(_PDF_PAGE.findall(self._tail))) or max(1, self.size // FALLBACK_BYTES_PER_PAGE)
+            pixels = self.page_pixels
+        else:
+            pages = 1
+            dims = image_dimensions(self.head)
+            pixels = dims[0] * dims[1] if dims else self.size * 10
+        cost = self.size * UPLOAD_COPIES + pages * pixels * PNG_BYTES_PER_PIXEL * PAGE_COPIES
+        return int(cost), pages
+
+
+def estimate_job_cost(data: bytes, content_type: str, page_pixels: float) -> Tuple[int, int]:
+    """
+    Estimated peak orchestrator memory (bytes) for a job and its page count.
+    page_pixels is the expected render size of a PDF page (RENDER_TARGET_MPIX).
+    """
+    estimator = CostEstimator(content_type, page_pixels)
+    estimator.feed(data)
+    return estimator.estimate()
+
+
+class AdmissionController:
+    """
+    Admits jobs against a memory budget. Jobs wait in FIFO order for budget to
+    free up, and are rejected (-> 503 + Retry-After) after queue_timeout.
+    A job larger than the whole budget is admitted only when nothing else runs.
+    budget_bytes <= 0 disables admission control.
+    """
+
+    def __init__(self, budget_bytes: int, queue_timeout: float = 30.0, retry_after: int = 10, max_queue: int = 100):
+        self.budget = budget_bytes
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.max_queue = max_queue
+        self.used = 0
+        self.running = 0
+        self.rejected = 0
+        self._queue = deque()
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _fits(self, cost: int) -> bool:
+        return self.running == 0 or self.used + cost <= self.budget
+
+    @asynccontextmanager
+    async def admit(self, cost: int):
+        if self.budget <= 0:
+            yield
+            return
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+
+        cost = min(cost, self.budget)
+        async with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected(self.retry_after)
+            ticket = next(self._seq)
+            self._queue.append(ticket)
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self._queue[0] == ticket and self._fits(cost)),
+                    timeout=self.queue_timeout,
+                )
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise AdmissionRejected(self.retry_after)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            self.used += cost
+            self.running += 1
+
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.used -= cost
+                self.running -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "budget_mb": round(self.budget / 2**20, 1),
+            "used_mb": round(self.used / 2**20, 1),
+            "utilization": round(self.used / self.budget, 3) if self.budget > 0 else None,
+            "running_jobs": self.running,
+            "queued_jobs": len(self._queue),
+            "rejected_jobs": self.rejected,
+        }
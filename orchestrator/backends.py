@@ -0,0 +1,218 @@
+import asyncio
+import base64
+import functools
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Set, Tuple
+
+import httpx
+
+from common.config import settings
+from common.deadline import Deadline, DeadlineExceeded
+from common.logger import configure_logger
+from common.readiness import Readiness
+from orchestrator.balancer import ReplicaPool, parse_endpoints
+
+logger = configure_logger("orchestrator")
+
+# Where a job's preprocessing and visual analysis run (DEPLOYMENT_MODE)
+SERVICES = "services"
+EMBEDDED = "embedded"
+
+
+class ServicesBackend:
+    """
+    Microservice topology: the preprocessing and visual services over HTTP,
+    load balanced across their replicas. Images cross the wire as multipart
+    uploads and base64 in JSON; every method returns them as bytes.
+    """
+
+    mode = SERVICES
+
+    def __init__(self):
+        self.preprocessing_pool = ReplicaPool(
+            "preprocessing",
+            parse_endpoints(settings.PREPROCESSING_ENDPOINTS, settings.PREPROCESSING_HOST, settings.PREPROCESSING_PORT),
+            eject_after=settings.REPLICA_EJECT_AFTER,
+            readmit_after=settings.REPLICA_READMIT_AFTER,
+        )
+        self.visual_pool = ReplicaPool(
+            "visual",
+            parse_endpoints(settings.VISUAL_ENDPOINTS, settings.VISUAL_HOST, settings.VISUAL_PORT),
+            eject_after=settings.REPLICA_EJECT_AFTER,
+            readmit_after=settings.REPLICA_READMIT_AFTER,
+        )
+        self._probe_task = None
+
+    async def health_probe_loop(self):
+        """Background task: probes every replica's /ready and ejects/re-admits them."""
+        async with httpx.AsyncClient() as client:
+            while True:
+                for pool in (self.preprocessing_pool, self.visual_pool):
+                    try:
+                        for replica in await pool.probe(client, timeout=settings.HEALTH_CHECK_TIMEOUT):
+                            state = "re-admitted" if replica.healthy else "ejected"
+                            logger.warning(f"{pool.name} replica {replica.url} {state}")
+                    except Exception as e:
+                        # Keep probing: a dead loop would never re-admit an ejected replica
+                        logger.error(f"Health probe of {pool.name} replicas failed: {e}", exc_info=True)
+                await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL)
+
+    def start(self):
+        self._probe_task = asyncio.create_task(self.health_probe_loop())
+
+    def close(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+
+    def readiness(self) -> Tuple[bool, dict]:
+        """At least one healthy replica of every downstream service."""
+        pools = {pool.name: any(r.healthy for r in pool.replicas) for pool in (self.preprocessing_pool, self.visual_pool)}
+        return all(pools.values()), pools
+
+    def stats(self) -> dict:
+        return {"replicas": {"preprocessing": self.preprocessing_pool.stats(), "visual": self.visual_pool.stats()}}
+
+    async def _preprocess(self, client: httpx.AsyncClient, path: str, files: dict, deadline: Deadline,
+                          data: Optional[dict] = None, timeout: float = 60.0) -> dict:
+        async with self.preprocessing_pool.request() as replica:
+            resp = await client.post(f"{replica.url}{path}", files=files, data=data, headers=deadline.headers(),
+                                     timeout=deadline.timeout(timeout))
+            resp.raise_for_status()
+        return resp.json()
+
+    async def pdf_to_images(self, client: httpx.AsyncClient, contents: bytes, filename: str, text_layer: bool,
+                            deadline: Deadline) -> dict:
+        result = await self._preprocess(client, f"/preprocess/pdf_to_images?text_layer={str(text_layer).lower()}",
+                                        {"file": (filename, contents, "application/pdf")}, deadline)
+        for page in result["pages"]:
+            page["image"] = base64.b64decode(page.pop("base64_image"))
+        return result
+
+    async def normalize(self, client: httpx.AsyncClient, contents: bytes, filename: str, content_type: str,
+                        deadline: Deadline, orientation: bool = True) -> dict:
+        path = f"/preprocess/normalize?return_image=true&orientation={str(orientation).lower()}"
+        result = await self._preprocess(client, path, {"file": (filename, contents, content_type)}, deadline)
+        result["processed_image"] = base64.b64decode(result["processed_image"])
+        return result
+
+    async def probe(self, client: httpx.AsyncClient, contents: bytes, filename: str, content_type: str,
+                    deadline: Deadline) -> dict:
+        return await self._preprocess(client, "/preprocess/probe", {"file": (filename, contents, content_type)}, deadline)
+
+    async def tables(self, client: httpx.AsyncClient, contents: bytes, specs: List[dict], words: Optional[List[dict]],
+                     deadline: Deadline) -> List[dict]:
+        data = {"tables": json.dumps(specs)}
+        if words:
+            data["words"] = json.dumps(words)
+        result = await self._preprocess(client, "/preprocess/tables", {"file": ("page.png", contents, "image/png")},
+                                        deadline, data=data, timeout=30.0)
+        return result["tables"]
+
+    async def detect(self, client: httpx.AsyncClient, contents: bytes, priority: str, complexity: Optional[str],
+                     deadline: Deadline, tried: Set[str]) -> dict:
+        """Single visual analysis call, routed away from replicas already tried for this page (hedges, retries)."""
+        headers = {"X-Priority": priority, **deadline.headers()}
+        if complexity:
+            # Lets the visual service route simple pages to a smaller model
+            headers["X-Page-Complexity"] = complexity
+        async with self.visual_pool.request(exclude=tried) as replica:
+            tried.add(replica.url)
+            resp = await client.post(f"{replica.url}/detect/layout", files={"file": ("page.png", contents, "image/png")},
+                                     headers=headers, timeout=deadline.timeout(settings.PAGE_TIMEOUT))
+            resp.raise_for_status()
+        vis_data = resp.json()
+        if "error" in vis_data:
+            raise ValueError(vis_data["error"])
+        return vis_data
+
+
+class EmbeddedBackend:
+    """
+    Single-process deployment: the preprocessing functions run on a local
+    process pool (EMBEDDED_CPU_WORKERS) and visual analysis is a library call
+    on this event loop. Pages stay in-memory bytes: no HTTP hops, multipart
+    uploads or base64 between the steps. Same results as ServicesBackend.
+    """
+
+    mode = EMBEDDED
+
+    def __init__(self):
+        from preprocessing_service.operations import init_worker
+        # spawn, not fork: forking this process would copy the event loop, the log writer thread and its locks
+        self.executor = ProcessPoolExecutor(max_workers=settings.EMBEDDED_CPU_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=init_worker)
+        self.warmup = Readiness("embedded")
+        self.in_flight = 0
+
+    def warm_up_workers(self):
+        """Starts every worker process and loads OpenCV in it."""
+        from preprocessing_service.operations import warm_up_opencv
+        for future in [self.executor.submit(warm_up_opencv) for _ in range(settings.EMBEDDED_CPU_WORKERS)]:
+            future.result()
+
+    def start(self):
+        from visual_service.analysis import get_client
+        self.warmup.start({"cpu_workers": self.warm_up_workers, "fireworks_client": get_client},
+                          enabled=settings.STARTUP_WARMUP)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def readiness(self) -> Tuple[bool, dict]:
+        return self.warmup.ready, {"embedded": self.warmup.status()}
+
+    def stats(self) -> dict:
+        return {"workers": {"cpu_workers": settings.EMBEDDED_CPU_WORKERS, "in_flight": self.in_flight}}
+
+    async def _run(self, fn, *args, deadline: Deadline, timeout: float = 60.0):
+        """Runs fn on the process pool. On timeout the caller moves on; the worker finishes the call regardless."""
+        deadline.check()
+        self.in_flight += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+            return await asyncio.wait_for(future, timeout=deadline.timeout(timeout))
+        finally:
+            self.in_flight -= 1
+
+    async def pdf_to_images(self, client: httpx.AsyncClient, contents: bytes, filename: str, text_layer: bool,
+                            deadline: Deadline) -> dict:
+        from preprocessing_service.operations import convert_pdf
+        return await self._run(convert_pdf, contents, text_layer, deadline, deadline=deadline)
+
+    async def normalize(self, client: httpx.AsyncClient, contents: bytes, filename: str, content_type: str,
+                        deadline: Deadline, orientation: bool = True) -> dict:
+        from preprocessing_service.operations import normalize_image
+        return await self._run(normalize_image, contents, filename, True, orientation, deadline=deadline)
+
+    async def probe(self, client: httpx.AsyncClient, contents: bytes, filename: str, content_type: str,
+                    deadline: Deadline) -> dict:
+        # Header parse only: not worth a trip to the pool
+        from preprocessing_service.operations import probe_image
+        return {"filename": filename, **probe_image(contents)}
+
+    async def tables(self, client: httpx.AsyncClient, contents: bytes, specs: List[dict], words: Optional[List[dict]],
+                     deadline: Deadline) -> List[dict]:
+        from preprocessing_service.operations import extract_tables
+        result = await self._run(extract_tables, contents, specs, words, deadline=deadline, timeout=30.0)
+        return result["tables"]
+
+    async def detect(self, client: httpx.AsyncClient, contents: bytes, priority: str, complexity: Optional[str],
+                     deadline: Deadline, tried: Set[str]) -> dict:
+        from visual_service.analysis import analyze_page
+        from visual_service.protocols import get_protocol
+        if deadline.expired:
+            raise DeadlineExceeded()
+        return await analyze_page(contents, get_protocol(settings.VLM_OUTPUT_PROTOCOL), priority=priority,
+                                  complexity=complexity, deadline=deadline)
+
+
+def create_backend():
+    """The backend for settings.DEPLOYMENT_MODE."""
+    if settings.DEPLOYMENT_MODE == EMBEDDED:
+        return EmbeddedBackend()
+    if settings.DEPLOYMENT_MODE != SERVICES:
+        raise ValueError(f"Unknown DEPLOYMENT_MODE '{settings.DEPLOYMENT_MODE}'. Available: {[SERVICES, EMBEDDED]}")
+    return ServicesBackend()
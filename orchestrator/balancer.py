@@ -0,0 +1,156 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Iterable, List, Optional
+
+import httpx
+
+from orchestrator.resilience import attempt_timed_out
+
+
+def parse_endpoints(endpoints: str, default_host: str, default_port: int) -> List[str]:
+    """
+    Parses a comma-separated list of 'host:port' or 'http(s)://host:port' entries
+    into base URLs. Falls back to the single default host/port when empty.
+    """
+    urls = []
+    for entry in (endpoints or "").split(","):
+        entry = entry.strip().rstrip("/")
+        if not entry:
+            continue
+        urls.append(entry if "://" in entry else f"http://{entry}")
+    return urls or [f"http://{default_host}:{default_port}"]
+
+
+class Replica:
+    """One service instance and its load/latency/health bookkeeping."""
+
+    def __init__(self, url: str, window: int = 200):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.requests = 0
+        self.failures = 0
+        self.ewma_ms: Optional[float] = None
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def record(self, latency_ms: float, ok: bool, alpha: float = 0.2):
+        self.requests += 1
+        if ok:
+            self.latencies.append(latency_ms)
+            self.ewma_ms = latency_ms if self.ewma_ms is None else (1 - alpha) * self.ewma_ms + alpha * latency_ms
+        else:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def pct(q):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+        }
+
+
+class ReplicaPool:
+    """
+    Client-side load balancer over the replicas of one service.
+
+    Selection is power-of-two-choices on outstanding requests (EWMA latency as
+    tie-breaker). Replicas are ejected after eject_after consecutive failures
+    (real traffic, attempt timeouts included, or /ready probes) and re-admitted after readmit_after
+    successful probes. If every replica is ejected, all are considered again.
+    """
+
+    def __init__(self, name: str, urls: Iterable[str], eject_after: int = 3, readmit_after: int = 2):
+        self.name = name
+        self.replicas = [Replica(url) for url in urls]
+        self.eject_after = eject_after
+        self.readmit_after = readmit_after
+
+    def pick(self, exclude: Iterable[str] = ()) -> Replica:
+        """Power-of-two-choices over healthy replicas, avoiding `exclude` URLs where possible."""
+        exclude = set(exclude)
+        candidates = [r for r in self.replicas if r.healthy] or self.replicas
+        preferred = [r for r in candidates if r.url not in exclude]
+        candidates = preferred or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        a, b = random.sample(candidates, 2)
+        return min(a, b, key=lambda r: (r.outstanding, r.ewma_ms or 0.0))
+
+    def _mark(self, replica: Replica, ok: bool, readmit: bool = True):
+        if ok:
+            replica.consecutive_failures = 0
+            replica.consecutive_successes += 1
+            if readmit and not replica.healthy and replica.consecutive_successes >= self.readmit_after:
+                replica.healthy = True
+        else:
+            replica.consecutive_successes = 0
+            replica.consecutive_failures += 1
+            if replica.healthy and replica.consecutive_failures >= self.eject_after:
+                replica.healthy = False
+
+    @asynccontextmanager
+    async def request(self, exclude: Iterable[str] = ()):
+        """
+        Picks a replica and tracks the call made inside the block:
+            async with pool.request() as replica:
+                await client.post(replica.url + "/path", ...)
+        """
+        replica = self.pick(exclude)
+        replica.outstanding += 1
+        started = time.perf_counter()
+        ok = False
+        cancelled = False
+        try:
+            yield replica
+            ok = True
+        except asyncio.CancelledError:
+            # Losing hedges and abandoned jobs say nothing about replica health; a call cut off
+            # by its attempt timeout counts as a failure, or a hung replica would never be ejected
+            cancelled = not attempt_timed_out()
+            raise
+        except httpx.HTTPStatusError as e:
+            # Client errors are the caller's fault, not the replica's
+            ok = e.response.status_code < 500
+            raise
+        finally:
+            replica.outstanding -= 1
+            if not cancelled:
+                replica.record((time.perf_counter() - started) * 1000, ok)
+                # Real traffic can eject a replica; re-admission is left to the probes
+                self._mark(replica, ok, readmit=False)
+
+    async def probe(self, client: httpx.AsyncClient, timeout: float = 2.0) -> List[Replica]:
+        """
+        Actively checks GET /ready on every replica, so one still warming up is not
+        sent traffic. Returns replicas whose health changed.
+        """
+
+        async def check(replica: Replica):
+            try:
+                resp = await client.get(f"{replica.url}/ready", timeout=timeout)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            was_healthy = replica.healthy
+            self._mark(replica, ok)
+            return replica if was_healthy != replica.healthy else None
+
+        return [r for r in await asyncio.gather(*(check(r) for r in self.replicas)) if r]
+
+    def stats(self) -> List[dict]:
+        return [r.stats() for r in self.replicas]
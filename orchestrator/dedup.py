@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+# Settings that change what the pipeline produces for the same bytes. A result
+# cached under one configuration is never served under another.
+CACHE_KEY_SETTINGS = (
+    "FIREWORKS_MODEL",
+    "VLM_ROUTES",
+    "VLM_OUTPUT_PROTOCOL",
+    "ENABLE_PDF_TEXT_LAYER",
+    "ENABLE_NORMALIZATION",
+    "ENABLE_DESKEW",
+    "ENABLE_ORIENTATION",
+    "ORIENTATION_MIN_CONFIDENCE",
+    "RENDER_TARGET_MPIX",
+    "RENDER_MIN_DPI",
+    "RENDER_MAX_DPI",
+    "RENDER_MIN_TEXT_PX",
+    "RENDER_GRAYSCALE",
+    "ENABLE_TABLE_STRUCTURE",
+    "ENABLE_ENTITY_EXTRACTION",
+    "ENTITY_DICTIONARIES",
+)
+
+
+def content_hasher():
+    """Incremental content_hash: update() it with the document's chunks, then hexdigest()."""
+    return hashlib.sha256()
+
+
+def content_hash(data: bytes) -> str:
+    hasher = content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def cache_key(digest: str, content_type: str, settings) -> str:
+    """Result cache / coalescing key: document hash + content type + pipeline configuration."""
+    config = {name: getattr(settings, name) for name in CACHE_KEY_SETTINGS}
+    fingerprint = json.dumps([content_type, config], sort_keys=True, default=str)
+    return f"{digest}:{hashlib.sha256(fingerprint.encode()).hexdigest()[:16]}"
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+    The first caller starts fn(); later callers with the same key attach to it
+    and get the same result (or exception). The shared work is cancelled only
+    once every attached caller has gone away (e.g. all clients disconnected).
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True when the caller attached to a call already in flight."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded: one caller being cancelled must not cancel the others' work
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "coalesced": self.coalesced}
@@ -0,0 +1,18 @@
+from typing import List
+
+# Blocks whose tops fall in the same band of this many pixels form one row, read left to right
+ROW_BAND_PX = 20
+
+
+def reading_order_key(block: dict):
+    """(row band, left edge) of a block's 'bbox'; blocks without a box come first."""
+    bbox = block["bbox"]
+    if not bbox:
+        return (0, 0)
+    return (round(bbox.get("y1", 0) / ROW_BAND_PX) * ROW_BAND_PX, bbox.get("x1", 0))
+
+
+def sort_blocks(blocks: List[dict]) -> List[dict]:
+    """Sorts a page's blocks in place into reading order: top to bottom, then left to right."""
+    blocks.sort(key=reading_order_key)
+    return blocks
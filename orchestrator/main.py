@@ -1,14 +1,29 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
 import httpx
-import shutil
 import os
 import uuid
 import time
+import base64
+import asyncio
+from collections import Counter
+from typing import Optional
 from common.config import settings
 from common.logger import configure_logger
+from common.deadline import Deadline, DeadlineExceeded
+from common.entities import EntityExtractor, load_dictionaries
 from common.schemas import AnalysisResponse, DocumentContent, Page, Dimension
+from orchestrator.resilience import (LatencyTracker, CallOutcome, ClientDisconnected, call_with_retries,
+                                     unless_disconnected, wait_for_disconnect, PAGE_FAILED, PAGE_TIMED_OUT)
+from orchestrator.backends import SERVICES, create_backend
+from orchestrator.layout import sort_blocks
+from orchestrator.admission import AdmissionController, AdmissionRejected, CostEstimator
+from orchestrator.pipeline import Pipeline, PipelineMonitor, Stage
+from orchestrator.store import ResultStore, assign_text_anchors, PAGE_BREAK
+from orchestrator.retrieval import parse_fields, parse_page_ranges, encode_cursor, decode_cursor
+from orchestrator.dedup import SingleFlight, cache_key, content_hasher
 
 # Configure Logging
 logger = configure_logger("orchestrator")
@@ -27,201 +42,526 @@ app.add_middleware(
 TEMP_DIR = "/tmp/doc_analysis_uploads"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Observed visual analysis latencies, shared across jobs to derive the hedging delay
+page_latency = LatencyTracker(min_samples=settings.HEDGE_MIN_SAMPLES)
+
+# Preprocessing + visual analysis: load-balanced services over HTTP, or in-process (DEPLOYMENT_MODE)
+backend = create_backend()
+
+# Memory-aware admission control: queue or shed jobs instead of running out of memory
+admission = AdmissionController(
+    settings.ADMISSION_MEMORY_BUDGET_MB * 2**20,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+)
+
+# Queue depths and throughput of the per-job page pipelines (preprocess -> visual)
+pipeline_monitor = PipelineMonitor()
+
+# Finished jobs, re-fetchable and searchable without re-running the pipeline
+result_store = ResultStore(settings.RESULT_STORE_PATH) if settings.RESULT_STORE_PATH else None
+
+# Identical uploads: concurrent ones share one job, finished ones come from the result cache
+inflight = SingleFlight()
+cache_stats = Counter()
+
+# Dictionary automaton and regex families are compiled once, not per job
+entity_extractor = None
+if settings.ENABLE_ENTITY_EXTRACTION:
+    entity_extractor = EntityExtractor(load_dictionaries(settings.ENTITY_DICTIONARIES) if settings.ENTITY_DICTIONARIES else None)
+
+prune_task = None
+
+async def prune_results_loop():
+    """Background task: applies RESULT_RETENTION and RESULT_IMAGE_RETENTION to the result store."""
+    while True:
+        try:
+            pruned = await asyncio.to_thread(result_store.prune, settings.RESULT_RETENTION, settings.RESULT_IMAGE_RETENTION)
+            if any(pruned.values()):
+                logger.info(f"Result store pruned: {pruned['jobs']} jobs, {pruned['images']} page images")
+        except Exception as e:
+            logger.error(f"Result store pruning failed: {e}")
+        await asyncio.sleep(settings.RESULT_PRUNE_INTERVAL)
+
+@app.on_event("startup")
+async def startup_event():
+    global prune_task
+    # Replica health probes, or warm-up of the embedded worker processes
+    backend.start()
+    if result_store is not None and (settings.RESULT_RETENTION > 0 or settings.RESULT_IMAGE_RETENTION > 0):
+        prune_task = asyncio.create_task(prune_results_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    backend.close()
+    if prune_task is not None:
+        prune_task.cancel()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "service": "orchestrator", "mode": "cloud_native"}
+    return {"status": "ok", "service": "orchestrator", "mode": "cloud_native" if backend.mode == SERVICES else backend.mode}
 
-async def call_service(client: httpx.AsyncClient, url: str, file_path: str, filename: str, content_type: str):
-    """Helper to call a service with a file upload."""
+@app.get("/ready")
+async def ready_check():
+    """Readiness: at least one healthy replica of every downstream service (embedded: worker warm-up done)."""
+    ready, downstream = backend.readiness()
+    return JSONResponse({"service": "orchestrator", "ready": ready, "downstream": downstream}, status_code=200 if ready else 503)
+
+@app.get("/stats")
+async def stats():
+    """
+    Per-replica load, health and latency stats (embedded: worker pool usage), admission budget usage,
+    page pipeline queues and dedup counters.
+    """
+    return {
+        **backend.stats(),
+        "admission": admission.stats(),
+        "pipeline": pipeline_monitor.stats(),
+        "dedup": {**inflight.stats(), "cache": dict(cache_stats)}
+    }
+
+def require_store() -> ResultStore:
+    if result_store is None:
+        raise HTTPException(status_code=404, detail="Result store is disabled (RESULT_STORE_PATH)")
+    return result_store
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, pages: Optional[str] = None, fields: Optional[str] = None):
+    """
+    A finished job's stored result (AnalysisResponse shape plus total_pages).
+    pages selects page ranges ("1-3,7", "10-"); fields selects parts of the document:
+    text, pages, blocks, images, visual_elements, tables, entities (default: all).
+    E.g. fields=text for text only, fields=blocks for blocks without page images,
+    fields=tables for tables only. Only the selected slice is read and serialized.
+    """
     try:
-        with open(file_path, "rb") as f:
-            file_content = f.read()
-            
-        files = {"file": (filename, file_content, content_type)}
-        resp = await client.post(url, files=files, timeout=60.0) # Increased timeout for VLM
-        resp.raise_for_status()
-        return resp.json()
+        page_ranges = parse_page_ranges(pages)
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await asyncio.to_thread(require_store().get_slice, job_id, page_ranges, selected)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(result)
+
+@app.get("/jobs/{job_id}/blocks")
+async def get_job_blocks(job_id: str, cursor: Optional[str] = None, limit: int = 100,
+                         pages: Optional[str] = None, block_type: Optional[str] = None):
+    """Blocks in reading order, limit at a time. Pass next_cursor back as cursor for the following batch."""
+    store = require_store()
+    try:
+        page_ranges = parse_page_ranges(pages)
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    limit = min(max(limit, 1), 1000)
+    blocks = await asyncio.to_thread(store.list_blocks, job_id, after, limit, page_ranges, block_type)
+    if not blocks and not await asyncio.to_thread(store.exists, job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    next_cursor = encode_cursor(blocks[-1]["page_number"], blocks[-1]["block_index"]) if len(blocks) == limit else None
+    return {"job_id": job_id, "blocks": blocks, "next_cursor": next_cursor}
+
+@app.delete("/cache")
+async def clear_cache():
+    """Drops every result cache entry (stored jobs stay retrievable)."""
+    removed = await asyncio.to_thread(require_store().cache_invalidate)
+    return {"invalidated": removed}
+
+@app.delete("/cache/{digest}")
+async def invalidate_cache(digest: str):
+    """Drops the cached results of one document (by SHA-256 of its bytes), under every pipeline config."""
+    removed = await asyncio.to_thread(require_store().cache_invalidate, digest.lower())
+    return {"content_hash": digest.lower(), "invalidated": removed}
+
+@app.get("/search")
+async def search(q: str, job_id: Optional[str] = None, limit: int = 20):
+    """Full-text search over stored blocks; each hit has its job, page, bounding box and text offsets."""
+    started = time.perf_counter()
+    hits = await asyncio.to_thread(require_store().search, q, job_id, min(max(limit, 1), 200))
+    return {"query": q, "hits": hits, "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+async def call_service(step, *args, deadline: Deadline = Deadline(None)):
+    """Helper to run a document-level backend step. None on failure; raises DeadlineExceeded if the job's deadline passes."""
+    try:
+        deadline.check()
+        return await step(*args, deadline)
     except Exception as e:
-        logger.error(f"Service call to {url} failed: {e}")
+        logger.error(f"Preprocessing step {step.__name__} failed: {e}")
+        if deadline.expired:
+            raise DeadlineExceeded()
         return None
 
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+def spool_upload(upload, file_path: str, content_type: str):
+    """
+    Copies an upload to file_path chunk by chunk, hashing it and estimating its
+    cost on the way: (content hash, estimated cost in bytes, estimated pages). Blocking.
+    """
+    hasher = content_hasher()
+    estimator = CostEstimator(content_type, settings.RENDER_TARGET_MPIX * 1_000_000)
+    with open(file_path, "wb") as buffer:
+        while chunk := upload.read(UPLOAD_CHUNK_BYTES):
+            buffer.write(chunk)
+            hasher.update(chunk)
+            estimator.feed(chunk)
+    return (hasher.hexdigest(), *estimator.estimate())
+
 @app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_document(file: UploadFile = File(...)):
+async def analyze_document(request: Request, http_response: Response, file: UploadFile = File(...),
+                           priority: str = "interactive", deadline: Optional[float] = None, cache: bool = True):
     """
     Main entry point for the Frontend.
     Cloud Native Flow: Preprocess -> Visual Intelligence (Unified Layout+OCR+Ordering)
+    priority ('interactive' or 'batch') orders VLM calls in the visual service rate limiter.
+    deadline (seconds, default JOB_DEADLINE, 0 = none) bounds the whole job. It is passed downstream in
+    X-Deadline-Ms; pages still pending when it passes are cancelled and reported as timed_out.
+    Work is cancelled as soon as the client disconnects.
+    Identical uploads (same content and pipeline config) are deduplicated: concurrent ones attach to
+    the job in flight, and completed results are served from the result cache (RESULT_CACHE_TTL).
+    cache=false skips the cache lookup and always runs a new job, even if an identical one is in flight;
+    the fresh result then replaces the cached one.
+    The X-Cache response header says hit, coalesced or miss.
     """
+    job_deadline = Deadline((deadline if deadline is not None else settings.JOB_DEADLINE) or None)
     job_id = str(uuid.uuid4())
     logger.info(f"Received job {job_id} for file {file.filename}")
     
-    # Save temp file
+    # Save temp file; hash it and estimate the job's peak memory up front, off the event loop.
+    # The job then waits for budget (or sheds load)
     file_path = os.path.join(TEMP_DIR, f"{job_id}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
+    digest, job_cost, est_pages = await asyncio.to_thread(spool_upload, file.file, file_path, file.content_type)
+    key = cache_key(digest, file.content_type, settings)
+    logger.info(f"Job {job_id}: estimated {est_pages} pages, {job_cost / 2**20:.0f} MB", content_hash=digest)
+    
+    started_job = False
+    disconnect = asyncio.create_task(wait_for_disconnect(request.is_disconnected, settings.DISCONNECT_POLL_INTERVAL))
     try:
-        async with httpx.AsyncClient() as client:
+        if cache and result_store is not None and settings.RESULT_CACHE_TTL > 0:
+            cached_job = await asyncio.to_thread(result_store.cache_lookup, key, settings.RESULT_CACHE_TTL)
+            cached = await asyncio.to_thread(result_store.get, cached_job) if cached_job else None
+            if cached is not None:
+                logger.info(f"Job {job_id}: served from cache (job {cached_job})")
+                cache_stats["hit"] += 1
+                http_response.headers["X-Cache"] = "hit"
+                return cached
+
+        def start_job():
+            nonlocal started_job
+            started_job = True
+            return run_job(job_id, file_path, file.filename, file.content_type, job_cost, priority, job_deadline,
+                           key, digest)
+
+        if cache:
+            response, shared = await unless_disconnected(inflight.run(key, start_job), disconnect)
+        else:
+            response, shared = await unless_disconnected(start_job(), disconnect), False
+        if shared:
+            logger.info(f"Job {job_id}: attached to identical job {response.job_id} already in flight")
+        cache_stats["coalesced" if shared else "miss"] += 1
+        http_response.headers["X-Cache"] = "coalesced" if shared else "miss"
+        return response
+            
+    except DeadlineExceeded as e:
+        logger.warning(f"Job {job_id}: deadline exceeded before any page was processed")
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        logger.warning(f"Job {job_id}: client disconnected, cancelling pending pages")
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except AdmissionRejected as e:
+        logger.warning(f"Job {job_id} rejected: memory budget exhausted", admission=admission.stats())
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Workflow failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        disconnect.cancel()
+        # Otherwise run_job owns (and removes) the upload
+        if not started_job and os.path.exists(file_path):
+            os.remove(file_path)
+
+async def run_job(job_id: str, file_path: str, filename: str, content_type: str, job_cost: int,
+                  priority: str, job_deadline: Deadline, key: str, digest: str) -> AnalysisResponse:
+    """
+    Runs the pipeline for one uploaded document, then stores and caches the result.
+    Owns file_path (removed when done): identical requests attached to the job can
+    keep it running after the request that started it has gone.
+    """
+    page_tasks = []
+    try:
+        async with admission.admit(job_cost), httpx.AsyncClient() as client:
             # Step 1: Preprocessing & Page Split
             pages_to_process = []
+            with open(file_path, "rb") as f:
+                contents = f.read()
             
-            if file.content_type == "application/pdf":
+            if content_type == "application/pdf":
                 logger.info(f"Job {job_id}: Detected PDF. converting to images...")
-                pp_url = f"http://{settings.PREPROCESSING_HOST}:{settings.PREPROCESSING_PORT}/preprocess/pdf_to_images"
-                pp_data = await call_service(client, pp_url, file_path, file.filename, file.content_type)
+                pp_data = await call_service(backend.pdf_to_images, client, contents, filename, settings.ENABLE_PDF_TEXT_LAYER,
+                                             deadline=job_deadline)
                 
                 if not pp_data or "pages" not in pp_data:
                      raise HTTPException(status_code=500, detail="PDF conversion failed")
                 
                 # Prepare pages for Visual Service
-                # Visual Service expects 'file' upload. We need to convert base64 back to bytes.
-                import base64
-                import io
-                
                 for p in pp_data["pages"]:
-                    img_bytes = base64.b64decode(p["base64_image"])
                     pages_to_process.append({
                         "page_number": p["page_number"],
-                        "bytes": img_bytes,
-                        "dims": {"width": p["width"], "height": p["height"]}
+                        "bytes": p["image"],
+                        "dims": {"width": p["width"], "height": p["height"]},
+                        "page_type": p.get("page_type"),
+                        "complexity": (p.get("complexity") or {}).get("class"),
+                        # Rendered scans get denoise/deskew in the pipeline; clean renders skip it
+                        "needs_preprocessing": p.get("needs_preprocessing", False),
+                        # Text-native pages come with detections from the PDF text layer
+                        "detections": p.get("detections"),
+                        # Mixed pages come with text-layer words (table cell text)
+                        "words": p.get("words"),
+                        # Scanned pages were rotated upright while rendering
+                        "orientation": (p.get("orientation") or {}).get("angle", 0)
                     })
             else:
                  # Single Image Flow
-                 # Preprocess (Denoise) - Optional but good for consistency
-                 logger.info(f"Job {job_id}: Sending to Preprocessing (Normalize)...")
-                 pp_url = f"http://{settings.PREPROCESSING_HOST}:{settings.PREPROCESSING_PORT}/preprocess/normalize"
-                 pp_data = await call_service(client, pp_url, file_path, file.filename, file.content_type)
+                 if settings.ENABLE_NORMALIZATION:
+                     # Preprocess (Denoise/Deskew) and forward the processed page, not the raw upload
+                     logger.info(f"Job {job_id}: Sending to Preprocessing (Normalize)...")
+                     pp_data = await call_service(backend.normalize, client, contents, filename, content_type,
+                                                  deadline=job_deadline)
+                 else:
+                     # Header-only probe: dimensions without decoding the image
+                     pp_data = await call_service(backend.probe, client, contents, filename, content_type,
+                                                  deadline=job_deadline)
                  
                  if not pp_data: raise HTTPException(status_code=500, detail="Preprocessing failed")
                  
                  dims = pp_data.get("processed_dims", {"width": 0, "height": 0})
                  
-                 # Read original file bytes for Visual Service 
-                 # (Visual Service does its own normalization, so we can send raw file or processed. 
-                 # For now sending raw file as Visual Service handles it well)
-                 with open(file_path, "rb") as f:
-                     raw_bytes = f.read()
+                 page_bytes = pp_data.get("processed_image") or contents
                      
                  pages_to_process.append({
                      "page_number": 1,
-                     "bytes": raw_bytes,
-                     "dims": dims
+                     "bytes": page_bytes,
+                     "dims": dims,
+                     "complexity": (pp_data.get("complexity") or {}).get("class"),
+                     "orientation": (pp_data.get("orientation") or {}).get("angle", 0)
                  })
 
-            # Step 2: Visual Intelligence (Parallel)
+            # Step 2: Per-page preprocessing + Visual Intelligence, pipelined
             logger.info(f"Job {job_id}: Sending {len(pages_to_process)} pages to Visual Intelligence in parallel...")
-            visual_url = f"http://{settings.VISUAL_HOST}:{settings.VISUAL_PORT}/detect/layout"
 
-            async def process_page(page_data):
-                """Helper task for single page processing"""
-                files = {"file": ("page.png", page_data["bytes"], "image/png")}
+            async def preprocess_page(page_data):
+                """Denoise/deskew one rendered PDF page; on failure the page goes on as rendered."""
                 try:
-                    resp = await client.post(visual_url, files=files, timeout=120.0) # 120s per page
-                    resp.raise_for_status()
-                    vis_data = resp.json()
-                    
-                    detections = vis_data.get("detections", [])
-                    
-                    # Transform Blocks
-                    final_blocks = []
-                    for d in detections:
-                        attr = d.get("attributes", {})
-                        final_blocks.append({
-                            "type": d.get("label", "unknown"),
-                            "content": attr.get("text", ""),
-                            "bbox": d.get("bbox", {}),
-                            "confidence": d.get("confidence", 1.0),
-                            "vlm_description": attr.get("vlm_description", ""),
-                            "html": attr.get("html", "")
-                        })
+                    # Orientation was checked (and corrected) while rendering: not a second time here
+                    pp_page = await backend.normalize(client, page_data["bytes"], "page.png", "image/png", job_deadline,
+                                                      orientation=False)
+                except Exception as e:
+                    logger.warning(f"Preprocessing failed for page {page_data['page_number']}, using the rendered page: {repr(e)}")
+                    return page_data
+                return {
+                    **page_data,
+                    "bytes": pp_page["processed_image"],
+                    "dims": pp_page["processed_dims"],
+                    "words": None, # Deskew moved the page content: text-layer positions no longer apply
+                    "complexity": (pp_page.get("complexity") or {}).get("class") or page_data.get("complexity")
+                }
+
+            def skip_preprocessing(page_data):
+                return (not settings.ENABLE_NORMALIZATION or not page_data.get("needs_preprocessing")
+                        or page_data.get("detections") is not None)
+
+            async def fetch_table_structure(page_data, table_blocks):
+                """Cell structure of the page's tables (CPU, preprocessing); None on failure, rows stay empty."""
+                specs = [{"bbox": b.get("bbox") or {}, "text": b.get("content", ""), "html": b.get("html") or ""}
+                         for b in table_blocks]
+                try:
+                    return await backend.tables(client, page_data["bytes"], specs, page_data.get("words"), job_deadline)
+                except Exception as e:
+                    logger.warning(f"Table structure failed for page {page_data['page_number']}: {repr(e)}")
+                    return None
 
-                    # Sort Blocks
-                    def sort_key(b):
-                        bbox = b["bbox"]
-                        if not bbox: return (0, 0)
-                        y_rounded = round(bbox.get("y1", 0) / 20) * 20
-                        return (y_rounded, bbox.get("x1", 0))
-
-                    final_blocks.sort(key=sort_key)
-                    
-                    # Page Text
-                    page_text = "\n\n".join([b.get('content', '') for b in final_blocks])
-                    
-                    # Map BBox Helper
-                    def map_bbox(b_dict):
-                        if not b_dict: return None
-                        return {
-                            "x1": b_dict.get("x1", 0),
-                            "y1": b_dict.get("y1", 0),
-                            "x2": b_dict.get("x2", 0),
-                            "y2": b_dict.get("y2", 0)
-                        }
-
-                    # Pydantic Blocks
-                    pydantic_blocks = [
-                        {
-                            "block_type": b.get("type", "unknown"),
-                            "text": b.get("content", ""),
-                            "bounding_box": map_bbox(b.get("bbox"))
-                        } for b in final_blocks
-                    ]
-                    
-                    # Visual Elements & Tables
-                    page_visual_elements = []
-                    page_tables = []
-                    
-                    for b in final_blocks:
-                        b_type = b.get("type")
-                        qt_block = {
-                                "type": b_type,
-                                "confidence": b.get("confidence", 0.0),
-                                "bounding_box": map_bbox(b.get("bbox")),
-                                "attributes": {
-                                    "text": b.get("content", ""),
-                                    "vlm_description": b.get("vlm_description"),
-                                    "html": b.get("html"),
-                                    "page_number": page_data["page_number"] # Track page
-                                }
-                        }
-                        page_visual_elements.append(qt_block)
-                        
-                        if b_type == "table":
-                            page_tables.append({
-                                "confidence": b.get("confidence", 0.0),
-                                "bounding_box": map_bbox(b.get("bbox")),
-                                "header_rows": [], 
-                                "body_rows": []
-                            })
-                    
-                    # Prepare base64 image
-                    import base64
-                    page_b64 = base64.b64encode(page_data["bytes"]).decode('utf-8')
-                    logger.info(f"Page {page_data['page_number']} base64 length: {len(page_b64)}")
-                    
-                    result_page = Page(
+            def failed_page(page_data, outcome: CallOutcome):
+                """Keeps a page without results in the response so partial results are visible."""
+                page_b64 = base64.b64encode(page_data["bytes"]).decode('utf-8')
+                return {
+                    "page": Page(
                         page_number=page_data["page_number"],
                         dimension=Dimension(width=page_data["dims"]["width"], height=page_data["dims"]["height"]),
-                        blocks=pydantic_blocks,
-                        base64_image=f"data:image/png;base64,{page_b64}"
-                    )
-                    
+                        orientation=page_data.get("orientation", 0),
+                        base64_image=f"data:image/png;base64,{page_b64}",
+                        page_type=page_data.get("page_type"),
+                        status=outcome.status,
+                        attempts=outcome.attempts,
+                        error=outcome.error
+                    ),
+                    "text": "",
+                    "visual_elements": [],
+                    "tables": []
+                }
+
+            async def build_page(page_data, outcome: CallOutcome):
+                """Page, text, visual elements and tables from a successful visual analysis."""
+                # Prepare base64 image
+                page_b64 = base64.b64encode(page_data["bytes"]).decode('utf-8')
+                dimension = Dimension(width=page_data["dims"]["width"], height=page_data["dims"]["height"])
+
+                detections = outcome.result.get("detections", [])
+
+                # Transform Blocks
+                final_blocks = []
+                for d in detections:
+                    attr = d.get("attributes", {})
+                    final_blocks.append({
+                        "type": d.get("label", "unknown"),
+                        "content": attr.get("text", ""),
+                        "bbox": d.get("bbox", {}),
+                        "confidence": d.get("confidence", 1.0),
+                        "vlm_description": attr.get("vlm_description", ""),
+                        "html": attr.get("html", "")
+                    })
+
+                # Sort Blocks
+                sort_blocks(final_blocks)
+
+                # Page Text
+                page_text = "\n\n".join([b.get('content', '') for b in final_blocks])
+
+                # Map BBox Helper
+                def map_bbox(b_dict):
+                    if not b_dict: return None
                     return {
-                        "page": result_page,
-                        "text": page_text,
-                        "visual_elements": page_visual_elements,
-                        "tables": page_tables
+                        "x1": b_dict.get("x1", 0),
+                        "y1": b_dict.get("y1", 0),
+                        "x2": b_dict.get("x2", 0),
+                        "y2": b_dict.get("y2", 0)
+                    }
+
+                # Pydantic Blocks
+                pydantic_blocks = [
+                    {
+                        "block_type": b.get("type", "unknown"),
+                        "text": b.get("content", ""),
+                        "bounding_box": map_bbox(b.get("bbox"))
+                    } for b in final_blocks
+                ]
+
+                # Visual Elements & Tables
+                page_visual_elements = []
+                page_tables = []
+
+                table_blocks = [b for b in final_blocks if b.get("type") == "table"]
+                structures = None
+                if table_blocks and settings.ENABLE_TABLE_STRUCTURE:
+                    structures = await fetch_table_structure(page_data, table_blocks)
+                structures = iter(structures or [])
+
+                for b in final_blocks:
+                    b_type = b.get("type")
+                    qt_block = {
+                            "type": b_type,
+                            "confidence": b.get("confidence", 0.0),
+                            "bounding_box": map_bbox(b.get("bbox")),
+                            "attributes": {
+                                "text": b.get("content", ""),
+                                "vlm_description": b.get("vlm_description"),
+                                "html": b.get("html"),
+                                "page_number": page_data["page_number"] # Track page
+                            }
                     }
+                    page_visual_elements.append(qt_block)
+
+                    if b_type == "table":
+                        structure = next(structures, None) or {}
+                        page_tables.append({
+                            "page_number": page_data["page_number"],
+                            "confidence": b.get("confidence", 0.0),
+                            "bounding_box": map_bbox(b.get("bbox")),
+                            "header_rows": structure.get("header_rows", []),
+                            "body_rows": structure.get("body_rows", [])
+                        })
 
+                logger.debug(f"Page {page_data['page_number']} base64 length: {len(page_b64)}")
+
+                result_page = Page(
+                    page_number=page_data["page_number"],
+                    dimension=dimension,
+                    orientation=page_data.get("orientation", 0),
+                    blocks=pydantic_blocks,
+                    base64_image=f"data:image/png;base64,{page_b64}",
+                    page_type=page_data.get("page_type"),
+                    status=outcome.status,
+                    attempts=outcome.attempts,
+                    routing=outcome.result.get("routing", {})
+                )
+
+                return {
+                    "page": result_page,
+                    "text": page_text,
+                    "visual_elements": page_visual_elements,
+                    "tables": page_tables
+                }
+
+            async def process_page(page_data):
+                """Helper task for single page processing"""
+                p95 = page_latency.quantile(settings.HEDGE_QUANTILE) if settings.HEDGE_ENABLED else None
+                hedge_delay = max(p95, settings.HEDGE_MIN_DELAY) if p95 is not None else None
+
+                def log_attempt_error(attempt, e):
+                    logger.warning(f"Visual analysis attempt {attempt + 1} failed for page {page_data['page_number']}: {repr(e)}")
+
+                if page_data.get("detections") is not None:
+                    # Born-digital fast path: no VLM call
+                    outcome = CallOutcome(result={"detections": page_data["detections"]}, attempts=0)
+                else:
+                    tried = set()
+                    outcome = await call_with_retries(
+                        lambda hint: backend.detect(client, page_data["bytes"], priority, page_data.get("complexity"),
+                                                    job_deadline, tried),
+                        max_retries=settings.PAGE_MAX_RETRIES,
+                        timeout=settings.PAGE_TIMEOUT,
+                        backoff_base=settings.PAGE_RETRY_BACKOFF,
+                        backoff_max=settings.PAGE_RETRY_BACKOFF_MAX,
+                        tracker=page_latency,
+                        hedge_delay=hedge_delay,
+                        on_error=log_attempt_error,
+                        deadline=job_deadline,
+                    )
+                if outcome.hedged:
+                    logger.info(f"Page {page_data['page_number']} served by hedged request")
+
+                if outcome.result is None:
+                    logger.error(f"Visual analysis {outcome.status} for page {page_data['page_number']} after {outcome.attempts} attempts: {outcome.error}")
+                    return failed_page(page_data, outcome)
+
+                try:
+                    return await build_page(page_data, outcome)
                 except Exception as e:
-                    import traceback
-                    logger.error(f"Visual analysis failed for page {page_data['page_number']}: {repr(e)}")
-                    logger.error(traceback.format_exc())
-                    # Return empty/failed page structure to keep indexing or just skip? 
-                    # Returning None allows filtering.
-                    return None
+                    # A malformed detection fails its page, not the job
+                    logger.error(f"Building page {page_data['page_number']} failed: {repr(e)}")
+                    return failed_page(page_data, CallOutcome(status=PAGE_FAILED, attempts=outcome.attempts, error=repr(e)))
 
-            # Execute Parallel
-            import asyncio
-            results = await asyncio.gather(*(process_page(p) for p in pages_to_process))
+            # Execute the pipeline, until the deadline passes
+            pipeline = Pipeline(
+                [
+                    Stage("preprocess", preprocess_page, workers=settings.PIPELINE_PREPROCESS_WORKERS, skip=skip_preprocessing),
+                    Stage("visual", process_page, workers=settings.PIPELINE_VISUAL_WORKERS),
+                ],
+                queue_size=settings.PIPELINE_QUEUE_SIZE,
+                monitor=pipeline_monitor,
+            )
+            page_tasks = [asyncio.create_task(pipeline.run(pages_to_process))]
+            done, _ = await asyncio.wait(page_tasks, timeout=job_deadline.remaining())
+            if not done:
+                page_tasks[0].cancel()
+            elif page_tasks[0].exception() is not None:
+                raise page_tasks[0].exception()
+            results = [
+                res if res is not None else failed_page(page_data, CallOutcome(status=PAGE_TIMED_OUT, error="Job deadline exceeded"))
+                for page_data, res in zip(pages_to_process, pipeline.results)
+            ]
             
             # Aggregate Results
             final_pages = []
@@ -230,33 +570,52 @@ async def analyze_document(file: UploadFile = File(...)):
             full_text_buffer = []
 
             for res in results:
-                if res:
-                    final_pages.append(res["page"])
-                    full_text_buffer.append(res["text"])
-                    all_visual_elements.extend(res["visual_elements"])
-                    all_tables.extend(res["tables"])
+                final_pages.append(res["page"])
+                full_text_buffer.append(res["text"])
+                all_visual_elements.extend(res["visual_elements"])
+                all_tables.extend(res["tables"])
             
             # Sort pages by page number strictly
             final_pages.sort(key=lambda p: p.page_number)
 
+            # Any failed/timed out page downgrades the job to a partial result
+            failed_pages = [p.page_number for p in final_pages if p.status in (PAGE_FAILED, PAGE_TIMED_OUT)]
+            if failed_pages:
+                logger.warning(f"Job {job_id}: {len(failed_pages)}/{len(final_pages)} pages failed: {failed_pages}")
+            job_status = "partial" if failed_pages else "completed"
+
             response = AnalysisResponse(
                 job_id=job_id,
-                status="completed",
+                status=job_status,
                 timestamp=str(time.time()),
                 document=DocumentContent(
-                    text="\n\n--- PAGE BREAK ---\n\n".join(full_text_buffer),
+                    text=PAGE_BREAK.join(full_text_buffer),
                     pages=final_pages,
                     entities=[],
                     visual_elements=all_visual_elements,
                     tables=all_tables
                 )
             )
+            assign_text_anchors(response)
+            if entity_extractor is not None:
+                try:
+                    response.document.entities = await asyncio.to_thread(entity_extractor.extract_document, response.document)
+                except Exception as e:
+                    logger.error(f"Job {job_id}: entity extraction failed: {e}", exc_info=True)
+            if result_store is not None:
+                try:
+                    await asyncio.to_thread(result_store.save, response, filename)
+                    if job_status == "completed":
+                        # Partial results are not cached: the next identical upload retries the failed pages
+                        await asyncio.to_thread(result_store.cache_put, key, digest, job_id)
+                except Exception as e:
+                    # The caller still gets the result; only re-fetch/search/caching is lost
+                    logger.error(f"Job {job_id}: storing result failed: {e}", exc_info=True)
             return response
-            
-    except Exception as e:
-        logger.error(f"Workflow failed: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
     finally:
+        # Nothing downstream keeps running once the job is over
+        for task in page_tasks:
+            task.cancel()
         # Cleanup
         if os.path.exists(file_path):
             os.remove(file_path)
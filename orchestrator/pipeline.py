@@ -0,0 +1,113 @@
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional
+
+_DONE = object() # End-of-stream marker, one per downstream worker
+
+
+@dataclass
+class Stage:
+    """One pipeline stage: `workers` concurrent calls of fn(item) -> item. Items matching skip pass through untouched."""
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    skip: Optional[Callable[[Any], bool]] = None
+
+
+class PipelineMonitor:
+    """Live queue depths of all running pipelines plus cumulative per-stage counters, for GET /stats."""
+
+    def __init__(self):
+        self.running = set()
+        self.processed = Counter()
+        self.skipped = Counter()
+
+    def stats(self) -> dict:
+        queued, active = Counter(), Counter()
+        for pipeline in self.running:
+            for stage, depth in pipeline.depths().items():
+                queued[stage] += depth
+            active.update(pipeline.active)
+        stages = set(queued) | set(self.processed) | set(self.skipped)
+        return {
+            "running_pipelines": len(self.running),
+            "stages": {
+                name: {
+                    "queued": queued[name],
+                    "active": active[name],
+                    "processed": self.processed[name],
+                    "skipped": self.skipped[name],
+                } for name in sorted(stages)
+            }
+        }
+
+
+class Pipeline:
+    """
+    Runs items through stages concurrently: while stage 2 works on page 1,
+    stage 1 can already work on page 2. Stages are connected by bounded queues
+    (queue_size), so a slow stage holds back the ones before it instead of
+    letting finished-but-unconsumed items pile up in memory.
+    results[i] is filled as item i leaves the last stage (None until then).
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8, monitor: Optional[PipelineMonitor] = None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.monitor = monitor or PipelineMonitor()
+        self.queues: List[asyncio.Queue] = []
+        self.active = Counter()
+        self.results: List[Any] = []
+
+    def depths(self) -> dict:
+        return {stage.name: queue.qsize() for stage, queue in zip(self.stages, self.queues)}
+
+    async def _worker(self, index: int):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            entry = await inbox.get()
+            if entry is _DONE:
+                return
+            position, item = entry
+            if stage.skip is not None and stage.skip(item):
+                self.monitor.skipped[stage.name] += 1
+            else:
+                self.active[stage.name] += 1
+                try:
+                    item = await stage.fn(item)
+                finally:
+                    self.active[stage.name] -= 1
+                self.monitor.processed[stage.name] += 1
+            if outbox is None:
+                self.results[position] = item
+            else:
+                await outbox.put((position, item))
+
+    async def _run_stage(self, index: int):
+        await asyncio.gather(*(self._worker(index) for _ in range(self.stages[index].workers)))
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                await self.queues[index + 1].put(_DONE)
+
+    async def run(self, items: List[Any]) -> List[Any]:
+        # The first queue holds the (already in memory) input, the others are bounded
+        self.queues = [asyncio.Queue()] + [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages[1:]]
+        self.results = [None] * len(items)
+        for position, item in enumerate(items):
+            self.queues[0].put_nowait((position, item))
+        for _ in range(self.stages[0].workers):
+            self.queues[0].put_nowait(_DONE)
+
+        self.monitor.running.add(self)
+        tasks = [asyncio.ensure_future(self._run_stage(i)) for i in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # On error or cancellation (deadline, client gone) no stage keeps running
+            for task in tasks:
+                task.cancel()
+            self.monitor.running.discard(self)
+        return self.results
@@ -0,0 +1,216 @@
+import asyncio
+import random
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Optional
+
+import httpx
+
+from common.deadline import Deadline
+
+# Per-page outcome states surfaced on Page.status
+PAGE_OK = "ok"
+PAGE_RETRIED = "retried"
+PAGE_FAILED = "failed"
+PAGE_TIMED_OUT = "timed_out"
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful call latencies (seconds).
+    Used to derive the hedging delay from the observed tail (e.g. p95).
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the q-quantile, or None until enough samples are collected."""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[idx]
+
+
+@dataclass
+class CallOutcome:
+    result: Any = None
+    status: str = PAGE_OK
+    attempts: int = 0
+    hedged: bool = False
+    error: Optional[str] = None
+
+
+class _Attempt:
+    timed_out = False
+
+
+# The attempt of call_with_retries that the current task runs for (hedges included)
+_current_attempt: ContextVar[Optional[_Attempt]] = ContextVar("current_attempt", default=None)
+
+
+def attempt_timed_out() -> bool:
+    """
+    True while an attempt of call_with_retries is being cancelled because it ran
+    out of time. Tells a slow replica apart from a losing hedge or an abandoned job.
+    """
+    attempt = _current_attempt.get()
+    return attempt is not None and attempt.timed_out
+
+
+async def _timed_attempt(call: Callable[[int], Awaitable[Any]], hedge_delay: Optional[float], timeout: float):
+    """hedged_call bounded by timeout (raises asyncio.TimeoutError), flagging the attempt before cancelling it."""
+    attempt = _Attempt()
+    token = _current_attempt.set(attempt)
+    try:
+        task = asyncio.ensure_future(hedged_call(call, hedge_delay)) # Copies the context, so sees the attempt
+    finally:
+        _current_attempt.reset(token)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        attempt.timed_out = True
+        task.cancel()
+        await asyncio.wait({task})
+        raise asyncio.TimeoutError()
+    return task.result()
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter (attempt is 0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Timeouts, transport errors, 5xx and 429 are retryable. Other 4xx are not."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code >= 500 or code in (408, 429)
+    return True
+
+
+async def hedged_call(call: Callable[[int], Awaitable[Any]], hedge_delay: Optional[float]):
+    """
+    Runs call(0). If it has not finished after hedge_delay seconds, fires call(1)
+    and returns whichever succeeds first. The loser is cancelled.
+    Returns (result, hedged).
+    """
+    primary = asyncio.ensure_future(call(0))
+    pending = {primary}
+    try:
+        if hedge_delay is None:
+            return await primary, False
+
+        done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+        if done:
+            return primary.result(), False
+
+        pending.add(asyncio.ensure_future(call(1)))
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_retries(
+    call: Callable[[int], Awaitable[Any]],
+    *,
+    max_retries: int,
+    timeout: float,
+    backoff_base: float,
+    backoff_max: float,
+    tracker: Optional[LatencyTracker] = None,
+    hedge_delay: Optional[float] = None,
+    on_error: Optional[Callable[[int, BaseException], None]] = None,
+    deadline: Optional[Deadline] = None,
+) -> CallOutcome:
+    """
+    Retries call with jittered backoff; each attempt is bounded by timeout and
+    may be hedged. call receives a replica hint (0 = primary, 1 = hedge) so the
+    caller can route the duplicate elsewhere.
+    With a job deadline, attempts are shortened to the time left and no retry
+    starts once it has passed.
+    Never raises (except on cancellation): failures are reported in the outcome status.
+    """
+    outcome = CallOutcome()
+    loop = asyncio.get_running_loop()
+    deadline = deadline or Deadline(None)
+
+    for attempt in range(max_retries + 1):
+        attempt_timeout = deadline.timeout(timeout)
+        if attempt_timeout <= 0:
+            outcome.status = PAGE_TIMED_OUT
+            outcome.error = "Job deadline exceeded"
+            break
+        outcome.attempts = attempt + 1
+        started = loop.time()
+        try:
+            result, hedged = await _timed_attempt(call, hedge_delay, attempt_timeout)
+            if tracker is not None:
+                tracker.record(loop.time() - started)
+            outcome.result = result
+            outcome.hedged = outcome.hedged or hedged
+            outcome.status = PAGE_OK if attempt == 0 else PAGE_RETRIED
+            outcome.error = None
+            return outcome
+        except asyncio.TimeoutError as e:
+            outcome.status = PAGE_TIMED_OUT
+            outcome.error = f"Timed out after {attempt_timeout:g}s"
+            if on_error:
+                on_error(attempt, e)
+        except Exception as e:
+            outcome.status = PAGE_TIMED_OUT if isinstance(e, httpx.TimeoutException) else PAGE_FAILED
+            outcome.error = repr(e)
+            if on_error:
+                on_error(attempt, e)
+            if not is_retryable(e):
+                break
+
+        if attempt < max_retries:
+            delay = backoff_delay(attempt, backoff_base, backoff_max)
+            if deadline.timeout(delay) < delay:
+                break # The retry could not start before the deadline
+            await asyncio.sleep(delay)
+
+    return outcome
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def wait_for_disconnect(is_disconnected: Callable[[], Awaitable[bool]], interval: float):
+    """Returns once is_disconnected() (e.g. Request.is_disconnected) reports the client is gone."""
+    while not await is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def unless_disconnected(aw: Awaitable[Any], disconnect: asyncio.Future) -> Any:
+    """
+    Awaits aw, unless the disconnect watcher (a wait_for_disconnect task) finishes
+    first: then aw is cancelled and ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(aw)
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            raise ClientDisconnected()
+        return task.result()
+    finally:
+        task.cancel()
@@ -0,0 +1,75 @@
+import base64
+from typing import List, Optional, Set, Tuple
+
+# Selectable parts of a stored result (GET /jobs/{id}?fields=...)
+FIELD_TEXT = "text"                        # document.text (only the selected pages' text when pages= is set)
+FIELD_PAGES = "pages"                      # page metadata: number, dimension, status, page_type, ...
+FIELD_BLOCKS = "blocks"                    # page blocks (implies pages)
+FIELD_IMAGES = "images"                    # page base64_image (implies pages)
+FIELD_VISUAL_ELEMENTS = "visual_elements"
+FIELD_TABLES = "tables"
+FIELD_ENTITIES = "entities"
+ALL_FIELDS = {FIELD_TEXT, FIELD_PAGES, FIELD_BLOCKS, FIELD_IMAGES, FIELD_VISUAL_ELEMENTS, FIELD_TABLES, FIELD_ENTITIES}
+
+PageRanges = List[Tuple[int, int]]
+
+
+def parse_fields(value: Optional[str]) -> Set[str]:
+    """'blocks,tables' -> {'pages', 'blocks', 'tables'}. None or empty selects everything."""
+    if not value:
+        return set(ALL_FIELDS)
+    fields = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = fields - ALL_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}. Available: {sorted(ALL_FIELDS)}")
+    if fields & {FIELD_BLOCKS, FIELD_IMAGES}:
+        fields.add(FIELD_PAGES)
+    return fields
+
+
+def parse_page_ranges(value: Optional[str]) -> Optional[PageRanges]:
+    """'1-3,7,10-' -> [(1, 3), (7, 7), (10, inf-ish)]. None or empty selects every page."""
+    if not value:
+        return None
+    ranges = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        try:
+            start = int(first) if first else 1
+            end = (int(last) if last else 2**31 - 1) if sep else start
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range '{part}'")
+        ranges.append((start, end))
+    return ranges or None
+
+
+def page_in_ranges(page_number: int, ranges: Optional[PageRanges]) -> bool:
+    return ranges is None or any(start <= page_number <= end for start, end in ranges)
+
+
+def ranges_sql(ranges: Optional[PageRanges], column: str = "page_number") -> Tuple[str, list]:
+    """SQL condition (and its parameters) selecting the page ranges; always true without ranges."""
+    if not ranges:
+        return "1", []
+    clause = " OR ".join(f"{column} BETWEEN ? AND ?" for _ in ranges)
+    return f"({clause})", [bound for r in ranges for bound in r]
+
+
+def encode_cursor(page_number: int, block_index: int) -> str:
+    """Opaque keyset cursor: the position of the last block returned."""
+    return base64.urlsafe_b64encode(f"{page_number}:{block_index}".encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    if not cursor:
+        return 0, -1
+    try:
+        page_number, block_index = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(page_number), int(block_index)
+    except Exception:
+        raise ValueError("Invalid cursor")
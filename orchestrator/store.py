@@ -0,0 +1,378 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from common.schemas import AnalysisResponse, BoundingBox, TextAnchor
+from orchestrator.retrieval import (PageRanges, page_in_ranges, ranges_sql, FIELD_BLOCKS, FIELD_ENTITIES,
+                                    FIELD_IMAGES, FIELD_PAGES, FIELD_TABLES, FIELD_TEXT, FIELD_VISUAL_ELEMENTS)
+
+PAGE_BREAK = "\n\n--- PAGE BREAK ---\n\n" # Separator between pages in DocumentContent.text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    filename TEXT,
+    created_at REAL NOT NULL,
+    text TEXT NOT NULL,
+    entities TEXT NOT NULL DEFAULT '[]',
+    visual_elements TEXT NOT NULL DEFAULT '[]',
+    tables TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS pages (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    page_number INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    unit TEXT NOT NULL,
+    orientation INTEGER NOT NULL,
+    page_type TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    routing TEXT NOT NULL DEFAULT '{}',
+    base64_image TEXT,
+    PRIMARY KEY (job_id, page_number)
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    page_number INTEGER NOT NULL,
+    block_index INTEGER NOT NULL,
+    block_type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+    start_offset INTEGER,
+    end_offset INTEGER
+);
+CREATE INDEX IF NOT EXISTS blocks_job_page ON blocks (job_id, page_number, block_index);
+CREATE TABLE IF NOT EXISTS result_cache (
+    cache_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS result_cache_hash ON result_cache (content_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS blocks_fts USING fts5(text, content='blocks', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS blocks_fts_insert AFTER INSERT ON blocks BEGIN
+    INSERT INTO blocks_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS blocks_fts_delete AFTER DELETE ON blocks BEGIN
+    INSERT INTO blocks_fts (blocks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def assign_text_anchors(response: AnalysisResponse):
+    """
+    Sets Block.text_anchor to the block's [start, end) character offsets in
+    document.text. Blocks are located in reading order, so repeated text maps
+    to the right occurrence. Blocks whose text is empty or not found keep None.
+    """
+    text = response.document.text
+    cursor = 0
+    for page in response.document.pages:
+        for block in page.blocks:
+            if not block.text:
+                continue
+            start = text.find(block.text, cursor)
+            if start < 0:
+                continue
+            cursor = start + len(block.text)
+            block.text_anchor = TextAnchor(start_offset=start, end_offset=cursor)
+
+
+def _fts_query(q: str) -> str:
+    """Every whitespace-separated term as a quoted FTS5 string (all must match; prefix with a trailing *)."""
+    terms = []
+    for term in q.split():
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*") if prefix else term
+        terms.append('"' + term.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class ResultStore:
+    """
+    SQLite store for finished jobs: jobs, pages and blocks, plus an FTS5 index
+    over block text that points back to the block's job, page and bounding box.
+    Calls are blocking; run them off the event loop (asyncio.to_thread).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def save(self, response: AnalysisResponse, filename: Optional[str] = None):
+        """Stores (or replaces) a job. Block text anchors are filled in first if missing."""
+        doc = response.document
+        if any(b.text and b.text_anchor is None for p in doc.pages for b in p.blocks):
+            assign_text_anchors(response)
+
+        def dump(items) -> str:
+            return json.dumps([item.model_dump(mode="json") for item in items])
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (response.job_id,))
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (response.job_id, response.status, response.timestamp, filename, time.time(), doc.text,
+                 dump(doc.entities), dump(doc.visual_elements), dump(doc.tables)),
+            )
+            self._conn.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(response.job_id, p.page_number, p.dimension.width, p.dimension.height, p.dimension.unit,
+                  p.orientation, p.page_type, p.status, p.attempts, p.error, json.dumps(p.routing), p.base64_image)
+                 for p in doc.pages],
+            )
+            rows = []
+            for p in doc.pages:
+                for i, b in enumerate(p.blocks):
+                    box = b.bounding_box
+                    anchor = b.text_anchor
+                    rows.append((response.job_id, p.page_number, i, b.block_type, b.text,
+                                 *((box.x1, box.y1, box.x2, box.y2) if box else (None,) * 4),
+                                 *((anchor.start_offset, anchor.end_offset) if anchor else (None, None))))
+            self._conn.executemany(
+                "INSERT INTO blocks (job_id, page_number, block_index, block_type, text, x1, y1, x2, y2,"
+                " start_offset, end_offset) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get(self, job_id: str) -> Optional[AnalysisResponse]:
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            pages = self._conn.execute(
+                "SELECT * FROM pages WHERE job_id = ? ORDER BY page_number", (job_id,)).fetchall()
+            blocks = self._conn.execute(
+                "SELECT * FROM blocks WHERE job_id = ? ORDER BY page_number, block_index", (job_id,)).fetchall()
+
+        blocks_by_page: Dict[int, List[dict]] = {}
+        for b in blocks:
+            blocks_by_page.setdefault(b["page_number"], []).append(_block(b))
+        return AnalysisResponse.model_validate({
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "timestamp": job["timestamp"],
+            "document": {
+                "text": job["text"],
+                "pages": [{
+                    "page_number": p["page_number"],
+                    "dimension": {"width": p["width"], "height": p["height"], "unit": p["unit"]},
+                    "orientation": p["orientation"],
+                    "blocks": blocks_by_page.get(p["page_number"], []),
+                    "base64_image": p["base64_image"],
+                    "page_type": p["page_type"],
+                    "status": p["status"],
+                    "attempts": p["attempts"],
+                    "error": p["error"],
+                    "routing": json.loads(p["routing"]),
+                } for p in pages],
+                "entities": json.loads(job["entities"]),
+                "visual_elements": json.loads(job["visual_elements"]),
+                "tables": json.loads(job["tables"]),
+            }
+        })
+
+    def get_slice(self, job_id: str, pages: Optional[PageRanges], fields: Set[str]) -> Optional[dict]:
+        """
+        The selected pages and fields of a job, as a JSON-ready dict shaped like
+        AnalysisResponse with the unselected parts left out. Only the needed
+        columns are read (e.g. no page images unless 'images' is selected).
+        """
+        page_filter, page_params = ranges_sql(pages)
+        page_columns = ["page_number", "width", "height", "unit", "orientation", "page_type", "status",
+                        "attempts", "error", "routing"]
+        if FIELD_IMAGES in fields:
+            page_columns.append("base64_image")
+        job_columns = ["job_id", "status", "timestamp"]
+        if FIELD_TEXT in fields and not pages:
+            # With pages= the text is rebuilt from the selected pages' blocks instead
+            job_columns.append("text")
+        job_columns += [f for f in (FIELD_ENTITIES, FIELD_VISUAL_ELEMENTS, FIELD_TABLES) if f in fields]
+
+        with self._lock:
+            job = self._conn.execute(
+                f"SELECT {', '.join(job_columns)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            total_pages = self._conn.execute("SELECT COUNT(*) FROM pages WHERE job_id = ?", (job_id,)).fetchone()[0]
+            page_rows = []
+            if FIELD_PAGES in fields:
+                page_rows = self._conn.execute(
+                    f"SELECT {', '.join(page_columns)} FROM pages WHERE job_id = ? AND {page_filter}"
+                    " ORDER BY page_number", (job_id, *page_params)).fetchall()
+            block_rows = []
+            if FIELD_BLOCKS in fields or (FIELD_TEXT in fields and pages):
+                block_rows = self._conn.execute(
+                    f"SELECT * FROM blocks WHERE job_id = ? AND {page_filter} ORDER BY page_number, block_index",
+                    (job_id, *page_params)).fetchall()
+
+        document = {}
+        if FIELD_TEXT in fields:
+            if pages:
+                # Rebuilt from the selected pages' blocks, the same way the full text is assembled
+                page_texts: Dict[int, List[str]] = {}
+                for b in block_rows:
+                    page_texts.setdefault(b["page_number"], []).append(b["text"])
+                document["text"] = PAGE_BREAK.join("\n\n".join(t) for _, t in sorted(page_texts.items()))
+            else:
+                document["text"] = job["text"]
+        if FIELD_PAGES in fields:
+            blocks_by_page: Dict[int, List[dict]] = {}
+            if FIELD_BLOCKS in fields:
+                for b in block_rows:
+                    blocks_by_page.setdefault(b["page_number"], []).append(_block(b))
+            document["pages"] = []
+            for p in page_rows:
+                page = {
+                    "page_number": p["page_number"],
+                    "dimension": {"width": p["width"], "height": p["height"], "unit": p["unit"]},
+                    "orientation": p["orientation"],
+                    "page_type": p["page_type"],
+                    "status": p["status"],
+                    "attempts": p["attempts"],
+                    "error": p["error"],
+                    "routing": json.loads(p["routing"]),
+                }
+                if FIELD_BLOCKS in fields:
+                    page["blocks"] = blocks_by_page.get(p["page_number"], [])
+                if FIELD_IMAGES in fields:
+                    page["base64_image"] = p["base64_image"]
+                document["pages"].append(page)
+        if FIELD_ENTITIES in fields:
+            document["entities"] = json.loads(job["entities"])
+        if FIELD_VISUAL_ELEMENTS in fields:
+            document["visual_elements"] = [
+                v for v in json.loads(job["visual_elements"])
+                if not pages or page_in_ranges(v.get("attributes", {}).get("page_number") or 0, pages)
+            ]
+        if FIELD_TABLES in fields:
+            document["tables"] = [
+                t for t in json.loads(job["tables"])
+                if not pages or (t.get("page_number") is not None and page_in_ranges(t["page_number"], pages))
+            ]
+
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "timestamp": job["timestamp"],
+            "total_pages": total_pages,
+            "document": document,
+        }
+
+    def list_blocks(self, job_id: str, after: Tuple[int, int] = (0, -1), limit: int = 100,
+                    pages: Optional[PageRanges] = None, block_type: Optional[str] = None) -> List[dict]:
+        """Blocks in reading order strictly after the (page_number, block_index) position (keyset pagination)."""
+        page_filter, page_params = ranges_sql(pages)
+        sql = (f"SELECT * FROM blocks WHERE job_id = ? AND {page_filter}"
+               " AND (page_number > ? OR (page_number = ? AND block_index > ?))")
+        params = [job_id, *page_params, after[0], after[0], after[1]]
+        if block_type:
+            sql += " AND block_type = ?"
+            params.append(block_type)
+        sql += " ORDER BY page_number, block_index LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"page_number": r["page_number"], "block_index": r["block_index"], **_block(r)} for r in rows]
+
+    def exists(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def cache_put(self, key: str, digest: str, job_id: str):
+        """Points a cache key (document hash + pipeline config) at a stored job."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO result_cache VALUES (?, ?, ?, ?)",
+                               (key, digest, job_id, time.time()))
+
+    def cache_lookup(self, key: str, ttl: float) -> Optional[str]:
+        """The job stored for key within the last ttl seconds, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT job_id FROM result_cache WHERE cache_key = ? AND created_at >= ?",
+                                     (key, time.time() - ttl)).fetchone()
+        return row["job_id"] if row else None
+
+    def cache_invalidate(self, digest: Optional[str] = None) -> int:
+        """Drops cache entries for one document (every config), or all of them. Stored jobs are kept."""
+        with self._lock, self._conn:
+            if digest is None:
+                return self._conn.execute("DELETE FROM result_cache").rowcount
+            return self._conn.execute("DELETE FROM result_cache WHERE content_hash = ?", (digest,)).rowcount
+
+    def prune(self, retention: float = 0, image_retention: float = 0) -> Dict[str, int]:
+        """
+        Deletes jobs stored more than retention seconds ago (pages, blocks, index and
+        cache entries go with them) and drops the page images of jobs older than
+        image_retention. 0 disables either. A job losing its images also leaves the
+        result cache, so the cache never serves a result without them.
+        Returns {"jobs": deleted jobs, "images": dropped page images}.
+        """
+        now = time.time()
+        pruned = {"jobs": 0, "images": 0}
+        with self._lock, self._conn:
+            if retention > 0:
+                pruned["jobs"] = self._conn.execute(
+                    "DELETE FROM jobs WHERE created_at < ?", (now - retention,)).rowcount
+            if image_retention > 0:
+                old_jobs = "SELECT job_id FROM jobs WHERE created_at < ?"
+                self._conn.execute(f"DELETE FROM result_cache WHERE job_id IN ({old_jobs})", (now - image_retention,))
+                pruned["images"] = self._conn.execute(
+                    f"UPDATE pages SET base64_image = NULL WHERE base64_image IS NOT NULL AND job_id IN ({old_jobs})",
+                    (now - image_retention,)).rowcount
+        return pruned
+
+    def search(self, q: str, job_id: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Blocks matching every term of q (best bm25 rank first), with their page, bbox and text offsets."""
+        query = _fts_query(q)
+        if not query:
+            return []
+        sql = ("SELECT b.*, snippet(blocks_fts, 0, '[', ']', '…', 12) AS snippet, bm25(blocks_fts) AS rank"
+               " FROM blocks_fts JOIN blocks b ON b.id = blocks_fts.rowid WHERE blocks_fts MATCH ?")
+        params: list = [query]
+        if job_id:
+            sql += " AND b.job_id = ?"
+            params.append(job_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{
+            "job_id": r["job_id"],
+            "page_number": r["page_number"],
+            "block_index": r["block_index"],
+            "snippet": r["snippet"],
+            "score": round(-r["rank"], 4),
+            **_block(r),
+        } for r in rows]
+
+
+def _block(row) -> dict:
+    return {
+        "block_type": row["block_type"],
+        "text": row["text"],
+        "bounding_box": BoundingBox(x1=row["x1"], y1=row["y1"], x2=row["x2"], y2=row["y2"]).model_dump()
+        if row["x1"] is not None else None,
+        "text_anchor": {"start_offset": row["start_offset"], "end_offset": row["end_offset"]}
+        if row["start_offset"] is not None else None,
+    }
@@ -0,0 +1,129 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from orchestrator.admission import (AdmissionController, AdmissionRejected, CostEstimator, FALLBACK_BYTES_PER_PAGE,
+                                    count_pdf_pages, estimate_job_cost, image_dimensions)
+
+PDF = (b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+       b"2 0 obj << /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 >> endobj\n"
+       b"3 0 obj << /Type /Page /Parent 2 0 R >> endobj\n"
+       b"4 0 obj << /Type/Page /Parent 2 0 R >> endobj\n"
+       b"5 0 obj << /Type\n/Page\n/Parent 2 0 R >> endobj\n%%EOF\n")
+
+
+def encoded(fmt: str, size=(320, 200)) -> bytes:
+    buffered = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffered, format=fmt)
+    return buffered.getvalue()
+
+
+def test_image_dimensions_from_headers():
+    assert image_dimensions(encoded("PNG")) == (320, 200)
+    assert image_dimensions(encoded("JPEG", (123, 456))) == (123, 456)
+    assert image_dimensions(b"GIF89a....") is None
+
+
+def test_count_pdf_pages_skips_the_page_tree():
+    assert count_pdf_pages(PDF) == 3
+    assert count_pdf_pages(b"%PDF-1.5 compressed object streams only") is None
+
+
+def test_estimate_job_cost():
+    cost, pages = estimate_job_cost(PDF, "application/pdf", 4_000_000)
+    assert pages == 3
+    assert cost > 3 * 4_000_000 # Dominated by the rendered pages, not the upload
+
+    png = encoded("PNG")
+    cost, pages = estimate_job_cost(png, "image/png", 4_000_000)
+    assert pages == 1
+    assert cost < estimate_job_cost(encoded("PNG", (3200, 2000)), "image/png", 4_000_000)[0]
+
+    # Unreadable page tree: pages from the file size
+    blob = b"%PDF-1.5" + b"\0" * (3 * FALLBACK_BYTES_PER_PAGE)
+    assert estimate_job_cost(blob, "application/pdf", 4_000_000)[1] == 3
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 16, 64, 1 << 20])
+def test_streamed_estimate_matches_whole_upload(chunk):
+    for data, content_type in ((PDF, "application/pdf"), (encoded("PNG"), "image/png")):
+        estimator = CostEstimator(content_type, 4_000_000)
+        for i in range(0, len(data), chunk):
+            estimator.feed(data[i:i + chunk])
+        assert estimator.estimate() == estimate_job_cost(data, content_type, 4_000_000)
+
+
+def test_jobs_within_budget_run_together():
+    admission = AdmissionController(100)
+
+    async def run():
+        async with admission.admit(40), admission.admit(60):
+            return admission.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["running_jobs"], stats["utilization"]) == (2, 1.0)
+    assert (admission.used, admission.running) == (0, 0)
+
+
+def test_jobs_queue_in_order_until_budget_frees_up():
+    admission = AdmissionController(100, queue_timeout=5)
+    order = []
+
+    async def job(name, cost, hold):
+        async with admission.admit(cost):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def run():
+        first = asyncio.create_task(job("first", 80, 0.05))
+        await asyncio.sleep(0.01)
+        # "big" does not fit yet; "small" would, but waits behind it (FIFO, no starvation)
+        big = asyncio.create_task(job("big", 50, 0))
+        await asyncio.sleep(0.01)
+        small = asyncio.create_task(job("small", 10, 0))
+        await asyncio.sleep(0.01)
+        queued = admission.stats()["queued_jobs"]
+        await asyncio.gather(first, big, small)
+        return queued
+
+    assert asyncio.run(run()) == 2
+    assert order == ["first", "big", "small"]
+
+
+def test_rejects_after_queue_timeout_and_when_queue_is_full():
+    async def run(admission, costs):
+        async def job(cost):
+            async with admission.admit(cost):
+                await asyncio.sleep(0.2)
+
+        return await asyncio.gather(*(job(c) for c in costs), return_exceptions=True)
+
+    admission = AdmissionController(100, queue_timeout=0.05, retry_after=7)
+    results = asyncio.run(run(admission, [80, 80]))
+    assert results[0] is None
+    assert isinstance(results[1], AdmissionRejected) and results[1].retry_after == 7
+
+    admission = AdmissionController(100, queue_timeout=5, max_queue=1)
+    results = asyncio.run(run(admission, [80, 80, 80]))
+    assert [type(r) for r in results] == [type(None), type(None), AdmissionRejected]
+    assert admission.rejected == 1
+
+
+def test_oversized_job_runs_alone_and_disabled_budget_admits_all():
+    admission = AdmissionController(100, queue_timeout=0.05)
+
+    async def run():
+        async with admission.admit(10**9):
+            return admission.used
+
+    assert asyncio.run(run()) == 100 # Capped at the budget
+
+    admission = AdmissionController(0)
+
+    async def unlimited():
+        async with admission.admit(10**9), admission.admit(10**9):
+            return admission.running
+
+    assert asyncio.run(unlimited()) == 0
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import cv2
+import httpx
+import numpy as np
+import pytest
+
+from common.config import settings
+from common.deadline import Deadline
+from orchestrator.backends import EmbeddedBackend, ServicesBackend
+from visual_service import analysis
+
+
+def synthetic_page(skew: float = 3.0) -> bytes:
+    """A small skewed scan: lines of text on white with some noise."""
+    page = np.full((800, 600, 3), 255, np.uint8)
+    for i, y in enumerate(range(60, 760, 40)):
+        cv2.putText(page, f"Line {i} of the invoice text 1234", (40, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    rotation = cv2.getRotationMatrix2D((300, 400), skew, 1.0)
+    page = cv2.warpAffine(page, rotation, (600, 800), borderValue=(255, 255, 255))
+    noise = np.random.default_rng(0).normal(0, 8, page.shape)
+    page = np.clip(page + noise, 0, 255).astype(np.uint8)
+    return cv2.imencode(".png", page)[1].tobytes()
+
+
+class StubClient:
+    """Canned VLM answer in place of FireworksClient; records the image it was sent."""
+
+    def __init__(self):
+        self.images = []
+
+    async def analyze_image_with_usage(self, prompt, base64_image, priority=None, model=None, timeout=None):
+        self.images.append(base64_image)
+        response = [{"type": "text", "bbox": [0.1, 0.1, 0.9, 0.2], "text": "Line 0 of the invoice text"}]
+        return json.dumps(response), {"prompt_tokens": 100, "completion_tokens": 20}
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDED_CPU_WORKERS", 1)
+    monkeypatch.setattr(settings, "PREPROCESSING_ENDPOINTS", "")
+    monkeypatch.setattr(settings, "VISUAL_ENDPOINTS", "")
+    monkeypatch.setattr(analysis, "_client", StubClient())
+    embedded = EmbeddedBackend()
+    try:
+        yield ServicesBackend(), embedded
+    finally:
+        embedded.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ServicesTransport(httpx.AsyncBaseTransport):
+    """Routes each service's requests to its app in this process, by port."""
+
+    def __init__(self):
+        from preprocessing_service.main import app as preprocessing_app
+        from visual_service.main import app as visual_app
+        self.apps = {settings.PREPROCESSING_PORT: httpx.ASGITransport(app=preprocessing_app),
+                     settings.VISUAL_PORT: httpx.ASGITransport(app=visual_app)}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.apps[request.url.port].handle_async_request(request)
+
+
+def test_embedded_backend_matches_services_backend(backends):
+    services, embedded = backends
+    page = synthetic_page()
+
+    async def run(backend):
+        async with httpx.AsyncClient(transport=ServicesTransport()) as client:
+            normalized = await backend.normalize(client, page, "page.png", "image/png", Deadline(60))
+            detected = await backend.detect(client, normalized["processed_image"], "normal",
+                                            normalized["complexity"]["class"], Deadline(60), set())
+            return normalized, detected
+
+    normalized_s, detected_s = asyncio.run(run(services))
+    normalized_e, detected_e = asyncio.run(run(embedded))
+
+    assert "deskew" in normalized_s["steps_completed"]
+    # Same page bytes, dimensions and metadata either way
+    assert normalized_e == normalized_s
+    # Same VLM input, detections and routing; only the timings differ
+    images = analysis._client.images
+    assert len(images) == 2 and images[0] == images[1]
+    assert detected_e["detections"] == detected_s["detections"] and detected_e["detections"]
+    assert detected_e["routing"] == detected_s["routing"]
+
+
+def test_health_probe_loop_survives_errors(monkeypatch):
+    monkeypatch.setattr(settings, "HEALTH_CHECK_INTERVAL", 0.01)
+    backend = ServicesBackend()
+    probes = []
+
+    async def broken(client, timeout):
+        probes.append("preprocessing")
+        raise RuntimeError("probe bug")
+
+    async def healthy(client, timeout):
+        probes.append("visual")
+        return []
+
+    monkeypatch.setattr(backend.preprocessing_pool, "probe", broken)
+    monkeypatch.setattr(backend.visual_pool, "probe", healthy)
+
+    async def run():
+        backend.start()
+        await asyncio.sleep(0.1)
+        alive = not backend._probe_task.done()
+        backend.close()
+        return alive
+
+    assert asyncio.run(run())
+    # Every round probed both pools, despite the errors
+    assert probes.count("preprocessing") >= 3 and probes.count("visual") >= 3
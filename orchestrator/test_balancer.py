@@ -0,0 +1,139 @@
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+
+from orchestrator.balancer import ReplicaPool, parse_endpoints
+from orchestrator.resilience import PAGE_TIMED_OUT, call_with_retries, hedged_call
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+def fake_client(handler) -> httpx.AsyncClient:
+    """Client whose replicas are answered by handler(request) -> httpx.Response."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def send(pool: ReplicaPool, client: httpx.AsyncClient, exclude=()) -> str:
+    async with pool.request(exclude=exclude) as replica:
+        resp = await client.post(f"{replica.url}/detect/layout")
+        resp.raise_for_status()
+    return replica.url
+
+
+def test_parse_endpoints():
+    assert parse_endpoints(" a:1, https://b:2/ ,", "localhost", 8002) == ["http://a:1", "https://b:2"]
+    assert parse_endpoints("", "localhost", 8002) == ["http://localhost:8002"]
+
+
+def test_p2c_prefers_the_less_loaded_replica():
+    pool = ReplicaPool("visual", URLS[:2])
+    pool.replicas[0].outstanding = 5
+    assert {pool.pick().url for _ in range(20)} == {"http://b"}
+
+    # Equal load: lower latency wins
+    pool.replicas[0].outstanding = 0
+    pool.replicas[0].ewma_ms, pool.replicas[1].ewma_ms = 50.0, 500.0
+    assert {pool.pick().url for _ in range(20)} == {"http://a"}
+
+
+def test_p2c_spreads_load():
+    pool = ReplicaPool("visual", URLS)
+    picks = Counter(pool.pick().url for _ in range(300))
+    assert set(picks) == set(URLS)
+
+
+def test_exclude_avoids_tried_replicas():
+    pool = ReplicaPool("visual", URLS)
+    assert {pool.pick(exclude=["http://a", "http://b"]).url for _ in range(20)} == {"http://c"}
+    # Every replica tried: any of them rather than none
+    assert pool.pick(exclude=URLS).url in URLS
+
+
+def test_failures_eject_after_threshold_and_probes_readmit():
+    pool = ReplicaPool("visual", URLS[:2], eject_after=3, readmit_after=2)
+    ready = {"http://a": False, "http://b": True}
+
+    def handler(request):
+        base = f"{request.url.scheme}://{request.url.host}"
+        if request.url.path == "/ready":
+            return httpx.Response(200 if ready[base] else 503)
+        return httpx.Response(500 if base == "http://a" else 200, json={})
+
+    async def run():
+        async with fake_client(handler) as client:
+            a = pool.replicas[0]
+            for i in range(3):
+                assert a.healthy
+                with pytest.raises(httpx.HTTPStatusError):
+                    await send(pool, client, exclude=["http://b"])
+            assert not a.healthy and a.failures == 3
+            # Ejected: traffic goes to b only
+            assert {await send(pool, client) for _ in range(10)} == {"http://b"}
+
+            # Probes re-admit after readmit_after consecutive successes; real traffic does not
+            ready["http://a"] = True
+            assert await pool.probe(client) == []
+            assert not a.healthy
+            assert await pool.probe(client) == [a]
+            assert a.healthy
+
+    asyncio.run(run())
+
+
+def test_client_errors_and_lost_hedges_do_not_count():
+    pool = ReplicaPool("visual", URLS[:1], eject_after=1)
+
+    async def run():
+        async with fake_client(lambda request: httpx.Response(422)) as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await send(pool, client)
+        assert pool.replicas[0].healthy
+
+        async def call(hint):
+            async with pool.request():
+                await asyncio.sleep(10 if hint == 0 else 0.01)
+            return hint
+
+        assert await hedged_call(call, hedge_delay=0.02) == (1, True)
+        await asyncio.sleep(0) # Let the cancellation reach the loser
+        return pool.replicas[0]
+
+    replica = asyncio.run(run())
+    assert replica.healthy
+    assert (replica.requests, replica.failures) == (2, 0)
+
+
+def test_attempt_timeouts_eject_a_hung_replica():
+    pool = ReplicaPool("visual", ["http://hung"], eject_after=2)
+
+    async def call(hint):
+        async with pool.request():
+            await asyncio.sleep(10)
+
+    outcome = asyncio.run(call_with_retries(call, max_retries=1, timeout=0.02, backoff_base=0.001, backoff_max=0.001))
+    assert outcome.status == PAGE_TIMED_OUT
+    replica = pool.replicas[0]
+    assert (replica.failures, replica.healthy, replica.outstanding) == (2, False, 0)
+
+
+def test_abandoned_calls_do_not_count():
+    pool = ReplicaPool("visual", ["http://a"], eject_after=1)
+
+    async def call(hint):
+        async with pool.request():
+            await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(call_with_retries(call, max_retries=0, timeout=5, backoff_base=0.001,
+                                                     backoff_max=0.001))
+        await asyncio.sleep(0.01)
+        task.cancel() # e.g. the client disconnected
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    replica = pool.replicas[0]
+    assert (replica.requests, replica.healthy, replica.outstanding) == (0, True, 0)
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from orchestrator.dedup import CACHE_KEY_SETTINGS, SingleFlight, cache_key, content_hash, content_hasher
+
+
+def config(**overrides):
+    values = {name: "default" for name in CACHE_KEY_SETTINGS}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_content_hash_streams_like_the_whole_upload():
+    data = b"%PDF-1.4 " * 1000
+    hasher = content_hasher()
+    for i in range(0, len(data), 333):
+        hasher.update(data[i:i + 333])
+    assert hasher.hexdigest() == content_hash(data)
+    assert len(content_hash(data)) == 64
+
+
+def test_cache_key_covers_content_type_and_pipeline_config():
+    digest = content_hash(b"document")
+    key = cache_key(digest, "application/pdf", config())
+    assert key.startswith(digest + ":")
+    assert cache_key(digest, "application/pdf", config()) == key
+    assert cache_key(content_hash(b"other"), "application/pdf", config()) != key
+    assert cache_key(digest, "image/png", config()) != key
+    assert cache_key(digest, "application/pdf", config(FIREWORKS_MODEL="other-model")) != key
+    assert cache_key(digest, "application/pdf", config(VLM_ROUTES={"simple": "small"})) != key
+    # Settings that do not change the output do not change the key
+    assert cache_key(digest, "application/pdf", SimpleNamespace(**vars(config()), LOG_LEVEL="DEBUG")) == key
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def run():
+        results = await asyncio.gather(*(flights.run("key", work) for _ in range(3)), flights.run("other", work))
+        return results, flights.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == [("result", False), ("result", True), ("result", True), ("result", False)]
+    assert len(calls) == 2
+    assert stats == {"in_flight": 0, "coalesced": 2}
+
+
+def test_errors_are_shared_and_the_key_is_released():
+    flights = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("pipeline failed")
+
+    async def run():
+        results = await asyncio.gather(flights.run("key", fail), flights.run("key", fail), return_exceptions=True)
+        # Done: the next call runs again instead of getting the old error
+        again = await asyncio.gather(flights.run("key", fail), return_exceptions=True)
+        return results + again
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(calls) == 2
+
+
+def test_work_is_cancelled_only_when_every_caller_is_gone():
+    flights = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(0.1)
+            return "done"
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        first = asyncio.create_task(flights.run("key", work))
+        second = asyncio.create_task(flights.run("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel() # One client disconnects: the other still gets the result
+        assert await second == ("done", True)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert cancelled == []
+
+        third = asyncio.create_task(flights.run("key", work))
+        await asyncio.sleep(0.01)
+        third.cancel() # The only client disconnects: the work stops
+        with pytest.raises(asyncio.CancelledError):
+            await third
+        await asyncio.sleep(0)
+        return flights.stats()
+
+    assert asyncio.run(run())["in_flight"] == 0
+    assert cancelled == [1]
@@ -0,0 +1,114 @@
+import asyncio
+import base64
+
+import pytest
+
+from common.config import settings
+from common.deadline import Deadline
+from orchestrator import main
+
+DETECTION = {"label": "text", "bbox": {"x1": 10, "y1": 10, "x2": 90, "y2": 30}, "confidence": 1.0,
+             "attributes": {"text": "Invoice 1001"}}
+
+
+def page_image(page_number: int) -> bytes:
+    """Rendered PDF page n: opaque bytes the fake backend can recognise."""
+    return f"page-{page_number}".encode()
+
+
+class FakeBackend:
+    """Stands in for ServicesBackend/EmbeddedBackend; records the page bytes sent to layout detection."""
+
+    def __init__(self, pages=1, detections=None):
+        self.pages = pages
+        self.detections = detections or {}
+        self.detected = []
+        self.normalized = []
+
+    async def pdf_to_images(self, client, contents, filename, text_layer, deadline):
+        # Every rendered scan was turned upright by 90 degrees
+        return {"pages": [{"page_number": n, "image": page_image(n), "width": 100, "height": 140,
+                           "needs_preprocessing": True, "orientation": {"angle": 90, "confidence": 0.9}}
+                          for n in range(1, self.pages + 1)]}
+
+    async def normalize(self, client, contents, filename, content_type, deadline, orientation=True):
+        self.normalized.append(orientation)
+        angle = 180 if orientation else 0 # What a (second) orientation check would find
+        return {"processed_image": b"processed:" + contents, "processed_dims": {"width": 100, "height": 140},
+                "orientation": {"angle": angle, "confidence": 0.9}, "complexity": {"class": "simple"}}
+
+    async def probe(self, client, contents, filename, content_type, deadline):
+        return {"processed_dims": {"width": 100, "height": 140}}
+
+    async def tables(self, client, contents, specs, words, deadline):
+        return []
+
+    async def detect(self, client, contents, priority, complexity, deadline, tried):
+        self.detected.append(contents)
+        page_number = next((n for n in self.detections if page_image(n) in contents), None)
+        return {"detections": self.detections.get(page_number, [DETECTION])}
+
+
+@pytest.fixture
+def run_job(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "result_store", None)
+    monkeypatch.setattr(main, "entity_extractor", None)
+    monkeypatch.setattr(settings, "PAGE_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", False)
+
+    def run(backend, contents: bytes, content_type: str):
+        monkeypatch.setattr(main, "backend", backend)
+        file_path = tmp_path / "upload"
+        file_path.write_bytes(contents)
+        return asyncio.run(main.run_job("job-1", str(file_path), "upload", content_type, 0, "normal", Deadline(30),
+                                        "key", "digest"))
+
+    return run
+
+
+def test_a_malformed_detection_fails_only_its_page(run_job, monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_NORMALIZATION", False)
+    bad_text = {**DETECTION, "attributes": {"text": 42}}
+    bad_bbox = {**DETECTION, "bbox": [10, 10, 90, 30]}
+    backend = FakeBackend(pages=4, detections={2: [bad_text], 4: [DETECTION, bad_bbox]})
+    response = run_job(backend, b"%PDF-1.4", "application/pdf")
+    assert response.status == "partial"
+    pages = response.document.pages
+    assert [p.status for p in pages] == ["ok", "failed", "ok", "failed"]
+    assert "TypeError" in pages[1].error and pages[1].attempts == 1
+    assert "AttributeError" in pages[3].error
+    assert [b.text for b in pages[2].blocks] == ["Invoice 1001"]
+    assert pages[3].base64_image # Failed pages keep their image
+
+
+def test_the_processed_page_is_sent_to_layout_detection(run_job, monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_NORMALIZATION", True)
+    backend = FakeBackend()
+    response = run_job(backend, b"upload", "image/png")
+    assert backend.detected == [b"processed:upload"]
+    assert response.document.pages[0].base64_image == "data:image/png;base64," + base64.b64encode(b"processed:upload").decode()
+
+    # Rendered PDF scans go through normalize in the pipeline too
+    backend = FakeBackend(pages=2)
+    run_job(backend, b"%PDF-1.4", "application/pdf")
+    assert sorted(backend.detected) == [b"processed:" + page_image(1), b"processed:" + page_image(2)]
+
+    # Normalization off: a header probe only, the upload goes as is
+    monkeypatch.setattr(settings, "ENABLE_NORMALIZATION", False)
+    backend = FakeBackend()
+    run_job(backend, b"upload", "image/png")
+    assert backend.detected == [b"upload"]
+
+
+def test_rendered_pages_are_not_turned_upright_twice(run_job, monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_NORMALIZATION", True)
+    backend = FakeBackend(pages=2)
+    response = run_job(backend, b"%PDF-1.4", "application/pdf")
+    assert backend.normalized == [False, False]
+    assert [p.orientation for p in response.document.pages] == [90, 90]
+
+    # Uploaded images are only checked in normalize
+    backend = FakeBackend()
+    response = run_job(backend, b"upload", "image/png")
+    assert backend.normalized == [True]
+    assert response.document.pages[0].orientation == 180
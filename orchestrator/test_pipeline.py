@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from orchestrator.pipeline import Pipeline, PipelineMonitor, Stage
+
+
+def test_results_keep_input_order_and_skips_pass_through():
+    async def double(x):
+        await asyncio.sleep(0.001 * (10 - x)) # Later items finish first
+        return x * 2
+
+    async def label(x):
+        return f"page-{x}"
+
+    monitor = PipelineMonitor()
+    stages = [Stage("preprocess", double, workers=3, skip=lambda x: x % 2), Stage("visual", label, workers=2)]
+    results = asyncio.run(Pipeline(stages, monitor=monitor).run(list(range(10))))
+    assert results == [f"page-{x * 2 if x % 2 == 0 else x}" for x in range(10)]
+    stats = monitor.stats()
+    assert stats["running_pipelines"] == 0
+    assert stats["stages"]["preprocess"] == {"queued": 0, "active": 0, "processed": 5, "skipped": 5}
+    assert stats["stages"]["visual"]["processed"] == 10
+
+
+def test_stage_concurrency_is_bounded_by_workers():
+    peak = {"preprocess": 0, "visual": 0}
+    pipeline = None
+
+    def stage(name, seconds):
+        async def fn(x):
+            peak[name] = max(peak[name], pipeline.active[name])
+            await asyncio.sleep(seconds)
+            return x
+        return fn
+
+    # Visual calls are slower than preprocessing, so pages are ready for every visual worker
+    pipeline = Pipeline([Stage("preprocess", stage("preprocess", 0.002), workers=2),
+                         Stage("visual", stage("visual", 0.02), workers=5)])
+    asyncio.run(pipeline.run(list(range(20))))
+    assert peak == {"preprocess": 2, "visual": 5}
+
+
+def test_bounded_queue_holds_back_a_fast_stage():
+    depths = []
+    pipeline = None
+
+    async def fast(x):
+        return x
+
+    async def slow(x):
+        depths.append(pipeline.depths()["visual"])
+        await asyncio.sleep(0.005)
+        return x
+
+    pipeline = Pipeline([Stage("preprocess", fast, workers=4), Stage("visual", slow, workers=1)], queue_size=3)
+    results = asyncio.run(pipeline.run(list(range(30))))
+    assert results == list(range(30))
+    assert max(depths) <= 3
+
+
+def test_stage_error_propagates_and_stops_the_pipeline():
+    started = []
+    monitor = PipelineMonitor()
+
+    async def preprocess(x):
+        if x == 3:
+            raise ValueError("bad page")
+        return x
+
+    async def visual(x):
+        started.append(x)
+        await asyncio.sleep(10)
+        return x
+
+    async def run():
+        pipeline = Pipeline([Stage("preprocess", preprocess), Stage("visual", visual, workers=2)], monitor=monitor)
+        with pytest.raises(ValueError, match="bad page"):
+            await asyncio.wait_for(pipeline.run(list(range(10))), timeout=2)
+        await asyncio.sleep(0) # Let the cancellation reach the other stage
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert monitor.running == set()
+    assert sum(pipeline.active.values()) == 0
+    assert len(started) <= 3
+
+
+def test_cancellation_stops_every_stage():
+    cancelled = []
+
+    async def visual(x):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(x)
+            raise
+
+    async def passthrough(x):
+        return x
+
+    async def run():
+        pipeline = Pipeline([Stage("preprocess", passthrough), Stage("visual", visual, workers=3)])
+        task = asyncio.create_task(pipeline.run(list(range(6))))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert sorted(cancelled) == [0, 1, 2]
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from common.deadline import Deadline
+from orchestrator.resilience import (LatencyTracker, ClientDisconnected, call_with_retries, hedged_call,
+                                     unless_disconnected, wait_for_disconnect,
+                                     PAGE_OK, PAGE_RETRIED, PAGE_FAILED, PAGE_TIMED_OUT)
+
+RETRY = {"backoff_base": 0.001, "backoff_max": 0.001}
+
+
+def test_latency_tracker_quantile():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for i in range(9):
+        tracker.record(i / 100)
+    assert tracker.quantile(0.95) is None
+    for i in range(9, 100):
+        tracker.record(i / 100)
+    assert tracker.quantile(0.95) == 0.95
+    assert tracker.quantile(1.0) == 0.99
+
+
+def test_hedge_fires_after_delay_and_loser_is_cancelled():
+    started, cancelled = {}, []
+
+    async def call(hint):
+        started[hint] = time.monotonic()
+        try:
+            await asyncio.sleep(10 if hint == 0 else 0.01)
+            return hint
+        except asyncio.CancelledError:
+            cancelled.append(hint)
+            raise
+
+    async def run():
+        t0 = time.monotonic()
+        result = await hedged_call(call, hedge_delay=0.05)
+        await asyncio.sleep(0) # Let the cancellation reach the loser
+        return result, t0
+
+    (result, hedged), t0 = asyncio.run(run())
+    assert (result, hedged) == (1, True)
+    assert started[1] - t0 >= 0.05
+    assert cancelled == [0]
+
+
+def test_no_hedge_when_primary_is_fast():
+    calls = []
+
+    async def call(hint):
+        calls.append(hint)
+        return "ok"
+
+    assert asyncio.run(hedged_call(call, hedge_delay=0.05)) == ("ok", False)
+    assert calls == [0]
+
+
+def test_retry_succeeds():
+    attempts = []
+
+    async def call(hint):
+        attempts.append(hint)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    outcome = asyncio.run(call_with_retries(call, max_retries=3, timeout=1.0, **RETRY))
+    assert (outcome.result, outcome.status, outcome.attempts) == ("ok", PAGE_RETRIED, 3)
+
+    outcome = asyncio.run(call_with_retries(lambda hint: asyncio.sleep(0, "first"), max_retries=3, timeout=1.0, **RETRY))
+    assert (outcome.result, outcome.status, outcome.attempts) == ("first", PAGE_OK, 1)
+
+
+def test_retries_exhausted_fail():
+    errors = []
+
+    async def call(hint):
+        raise httpx.ConnectError("refused")
+
+    outcome = asyncio.run(call_with_retries(call, max_retries=2, timeout=1.0, on_error=lambda a, e: errors.append(a),
+                                            **RETRY))
+    assert (outcome.status, outcome.attempts, outcome.result) == (PAGE_FAILED, 3, None)
+    assert errors == [0, 1, 2]
+    assert "ConnectError" in outcome.error
+
+
+def test_client_errors_are_not_retried():
+    async def call(hint):
+        request = httpx.Request("POST", "http://visual/detect/layout")
+        raise httpx.HTTPStatusError("bad request", request=request, response=httpx.Response(400, request=request))
+
+    outcome = asyncio.run(call_with_retries(call, max_retries=3, timeout=1.0, **RETRY))
+    assert (outcome.status, outcome.attempts) == (PAGE_FAILED, 1)
+
+
+def test_attempt_timeouts_exhausted_time_out():
+    async def call(hint):
+        await asyncio.sleep(10)
+
+    outcome = asyncio.run(call_with_retries(call, max_retries=1, timeout=0.05, **RETRY))
+    assert (outcome.status, outcome.attempts) == (PAGE_TIMED_OUT, 2)
+
+
+def test_deadline_cuts_retries_short():
+    async def call(hint):
+        await asyncio.sleep(10)
+
+    started = time.monotonic()
+    outcome = asyncio.run(call_with_retries(call, max_retries=5, timeout=1.0, deadline=Deadline(0.1), **RETRY))
+    assert outcome.status == PAGE_TIMED_OUT
+    assert outcome.attempts <= 2
+    assert time.monotonic() - started < 0.5
+
+    outcome = asyncio.run(call_with_retries(call, max_retries=5, timeout=1.0, deadline=Deadline(0), **RETRY))
+    assert (outcome.status, outcome.attempts, outcome.error) == (PAGE_TIMED_OUT, 0, "Job deadline exceeded")
+
+
+def test_disconnect_cancels_the_work():
+    cancelled = []
+    connected = [True]
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def is_disconnected():
+        return not connected[0]
+
+    async def run():
+        disconnect = asyncio.create_task(wait_for_disconnect(is_disconnected, interval=0.01))
+        asyncio.get_running_loop().call_later(0.05, connected.clear)
+        started = time.monotonic()
+        try:
+            with pytest.raises(ClientDisconnected):
+                await unless_disconnected(work(), disconnect)
+            await asyncio.sleep(0) # Let the cancellation reach the work
+            return time.monotonic() - started
+        finally:
+            disconnect.cancel()
+
+    assert asyncio.run(run()) < 0.5
+    assert cancelled == [True]
+
+
+def test_connected_client_gets_the_result_and_errors():
+    async def never_disconnects():
+        return False
+
+    async def fail():
+        raise ValueError("boom")
+
+    async def run():
+        disconnect = asyncio.create_task(wait_for_disconnect(never_disconnects, interval=0.01))
+        try:
+            assert await unless_disconnected(asyncio.sleep(0.02, "done"), disconnect) == "done"
+            with pytest.raises(ValueError):
+                await unless_disconnected(fail(), disconnect)
+        finally:
+            disconnect.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,50 @@
+import pytest
+
+from orchestrator.retrieval import (ALL_FIELDS, decode_cursor, encode_cursor, page_in_ranges, parse_fields,
+                                    parse_page_ranges, ranges_sql)
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("1-3,7,10-") == [(1, 3), (7, 7), (10, 2**31 - 1)]
+    assert parse_page_ranges(" -2 , 5 ,") == [(1, 2), (5, 5)]
+    assert parse_page_ranges(None) is None
+    assert parse_page_ranges("") is None
+    assert parse_page_ranges(",") is None
+
+
+@pytest.mark.parametrize("value", ["0", "3-1", "a", "1-b", "-0", "1--2"])
+def test_parse_page_ranges_rejects_invalid(value):
+    with pytest.raises(ValueError, match="Invalid page range"):
+        parse_page_ranges(value)
+
+
+def test_page_in_ranges_and_sql():
+    ranges = parse_page_ranges("2-3,9")
+    assert [n for n in range(1, 11) if page_in_ranges(n, ranges)] == [2, 3, 9]
+    assert page_in_ranges(42, None)
+    assert ranges_sql(ranges) == ("(page_number BETWEEN ? AND ? OR page_number BETWEEN ? AND ?)", [2, 3, 9, 9])
+    assert ranges_sql(None) == ("1", [])
+
+
+def test_parse_fields():
+    assert parse_fields(None) == ALL_FIELDS
+    assert parse_fields("blocks, tables") == {"pages", "blocks", "tables"}
+    assert parse_fields("images") == {"pages", "images"}
+    with pytest.raises(ValueError, match="Unknown fields"):
+        parse_fields("text,pixels")
+
+
+def test_cursor_round_trip():
+    for position in [(1, 0), (12, 345), (2**31 - 1, 0)]:
+        cursor = encode_cursor(*position)
+        assert cursor.isascii() and "/" not in cursor and "+" not in cursor # URL-safe
+        assert decode_cursor(cursor) == position
+    # No cursor: before the first block
+    assert decode_cursor(None) == (0, -1)
+    assert decode_cursor("") == (0, -1)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "MTI", encode_cursor(1, 2)[:-2] + "zz", "YTpi"])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
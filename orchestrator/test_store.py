@@ -0,0 +1,150 @@
+import time
+
+import pytest
+
+from common.schemas import AnalysisResponse
+from orchestrator.retrieval import ALL_FIELDS
+from orchestrator.store import PAGE_BREAK, ResultStore, assign_text_anchors
+
+IMAGE = "data:image/png;base64,iVBORw0KGgo="
+
+
+def make_response(job_id: str = "job-1") -> AnalysisResponse:
+    pages = [
+        ["Invoice 1001", "Payment due within thirty days", "Total 120.00 EUR"],
+        ["Delivery address", "Payment reference INV-1001"],
+    ]
+    return AnalysisResponse.model_validate({
+        "job_id": job_id,
+        "status": "completed",
+        "timestamp": "0",
+        "document": {
+            "text": PAGE_BREAK.join("\n\n".join(blocks) for blocks in pages),
+            "pages": [{
+                "page_number": n,
+                "dimension": {"width": 1000, "height": 1400},
+                "base64_image": IMAGE,
+                "blocks": [{"block_type": "text", "text": t, "bounding_box": {"x1": 10, "y1": 10 + 50 * i,
+                                                                              "x2": 900, "y2": 50 + 50 * i}}
+                           for i, t in enumerate(blocks)],
+            } for n, blocks in enumerate(pages, start=1)],
+            "tables": [{"page_number": 2, "confidence": 1.0}],
+        },
+    })
+
+
+@pytest.fixture
+def store():
+    store = ResultStore(":memory:")
+    yield store
+    store.close()
+
+
+def test_save_and_get_round_trip(store):
+    response = make_response()
+    store.save(response, "invoice.pdf")
+    assert store.exists("job-1") and not store.exists("job-2")
+    assert store.get("job-1") == response
+    assert store.get("job-2") is None
+
+    # Saving again replaces the job (no duplicate blocks)
+    store.save(make_response())
+    assert len(store.list_blocks("job-1")) == 5
+
+
+def test_text_anchors_point_into_the_text():
+    response = make_response()
+    assign_text_anchors(response)
+    text = response.document.text
+    for page in response.document.pages:
+        for block in page.blocks:
+            assert text[block.text_anchor.start_offset:block.text_anchor.end_offset] == block.text
+
+
+def test_search_finds_blocks_with_their_position(store):
+    store.save(make_response("job-1"))
+    store.save(make_response("job-2"))
+    hits = store.search("payment")
+    assert {(h["job_id"], h["page_number"]) for h in hits} == {("job-1", 1), ("job-1", 2), ("job-2", 1), ("job-2", 2)}
+    hits = store.search("refer*", job_id="job-2")
+    assert [(h["page_number"], h["block_index"], h["text"]) for h in hits] == [(2, 1, "Payment reference INV-1001")]
+    assert hits[0]["bounding_box"]["y1"] == 60
+    assert "[" in hits[0]["snippet"]
+    # Query syntax in user input is matched literally, not parsed
+    assert store.search('"thirty OR') == []
+    assert store.search("   ") == []
+
+
+def test_list_blocks_pages_by_keyset(store):
+    store.save(make_response())
+    first = store.list_blocks("job-1", limit=2)
+    assert [(b["page_number"], b["block_index"]) for b in first] == [(1, 0), (1, 1)]
+    rest = store.list_blocks("job-1", after=(1, 1), limit=10)
+    assert [(b["page_number"], b["block_index"]) for b in rest] == [(1, 2), (2, 0), (2, 1)]
+    assert store.list_blocks("job-1", pages=[(2, 2)], limit=10)[0]["text"] == "Delivery address"
+
+
+def test_get_slice_reads_only_what_is_selected(store):
+    store.save(make_response())
+    full = store.get_slice("job-1", None, set(ALL_FIELDS))
+    assert full["total_pages"] == 2
+    assert full["document"]["pages"][0]["base64_image"] == IMAGE
+
+    page_two = store.get_slice("job-1", [(2, 2)], {"text", "pages", "tables"})
+    assert page_two["document"]["text"] == "Delivery address\n\nPayment reference INV-1001"
+    assert [p["page_number"] for p in page_two["document"]["pages"]] == [2]
+    assert "blocks" not in page_two["document"]["pages"][0]
+    assert "base64_image" not in page_two["document"]["pages"][0]
+    assert len(page_two["document"]["tables"]) == 1
+    assert store.get_slice("missing", None, {"text"}) is None
+
+
+def test_get_slice_reads_the_full_text_only_when_needed(store):
+    store.save(make_response())
+    statements = []
+    store._conn.set_trace_callback(statements.append)
+
+    def job_query(pages, fields):
+        statements.clear()
+        store.get_slice("job-1", pages, fields)
+        return next(s for s in statements if "FROM jobs" in s)
+
+    assert ", text FROM jobs" in job_query(None, {"text"})
+    assert "text" not in job_query(None, {"pages", "blocks"})
+    assert "text" not in job_query([(1, 1)], {"text"}) # Rebuilt from page 1's blocks
+
+
+def test_result_cache_ttl_and_invalidation(store):
+    store.save(make_response())
+    store.cache_put("key-a", "hash-a", "job-1")
+    store.cache_put("key-b", "hash-b", "job-1")
+    assert store.cache_lookup("key-a", ttl=60) == "job-1"
+    assert store.cache_lookup("key-a", ttl=0) is None
+    assert store.cache_invalidate("hash-a") == 1
+    assert store.cache_lookup("key-a", ttl=60) is None
+    assert store.cache_invalidate() == 1
+
+
+def test_prune_drops_old_images_then_old_jobs(store, monkeypatch):
+    store.save(make_response("old"))
+    store.cache_put("key-old", "hash-old", "old")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 2 * 86400)
+    store.save(make_response("new"))
+    store.cache_put("key-new", "hash-new", "new")
+
+    assert store.prune(retention=0, image_retention=86400) == {"jobs": 0, "images": 2}
+    old = store.get("old")
+    assert [p.base64_image for p in old.document.pages] == [None, None]
+    assert old.document.text == make_response().document.text # Text, blocks and index are kept
+    assert store.search("delivery", job_id="old")
+    # A result without images is no longer served from the cache
+    assert store.cache_lookup("key-old", ttl=10 * 86400) is None
+    assert store.cache_lookup("key-new", ttl=10 * 86400) == "new"
+    assert store.get("new").document.pages[0].base64_image == IMAGE
+
+    assert store.prune(retention=86400, image_retention=86400) == {"jobs": 1, "images": 0}
+    assert store.get("old") is None and not store.search("delivery", job_id="old")
+    assert store.list_blocks("old") == []
+    assert store.get("new") is not None
+    assert store.prune() == {"jobs": 0, "images": 0}
@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+
+SIMPLE = "simple"   # Near-empty pages, plain paragraphs: a small VLM is enough
+COMPLEX = "complex" # Tables, diagrams, photos, dense or colorful layouts: large VLM
+
+# Feature thresholds for the complex class (tuned on A4 pages at 150-300 DPI)
+MAX_SIMPLE_INK = 0.12       # Fraction of dark pixels
+MAX_SIMPLE_EDGES = 0.25     # Fraction of Canny edge pixels (text alone stays well below)
+MAX_SIMPLE_GRAPHICS = 0.3   # Share of ink in components taller than a text line (shapes, photos, rules)
+MAX_SIMPLE_COLORFULNESS = 25.0
+GRID_MIN_LINES = 3          # Long horizontal AND vertical rules suggest a table grid
+
+
+def _downsample(image: np.ndarray, max_side: int = 800) -> np.ndarray:
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _count_lines(binary: np.ndarray, kernel_shape) -> int:
+    """Number of long straight rules left after a morphological open with a line kernel."""
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_shape)
+    lines = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    count, _ = cv2.connectedComponents(lines)
+    return count - 1 # Minus background
+
+
+def graphics_ratio(binary: np.ndarray, min_height_frac: float = 0.04) -> float:
+    """Share of ink belonging to connected components taller than a text line."""
+    total = np.count_nonzero(binary)
+    if total == 0:
+        return 0.0
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+    large = stats[1:, cv2.CC_STAT_HEIGHT] > binary.shape[0] * min_height_frac
+    return float(stats[1:, cv2.CC_STAT_AREA][large].sum()) / total
+
+
+def colorfulness(image: np.ndarray) -> float:
+    """Hasler & Suesstrunk colorfulness metric (0 for grayscale)."""
+    if image.ndim != 3:
+        return 0.0
+    b, g, r = [c.astype(np.float32) for c in cv2.split(image)]
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    return float(np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean()))
+
+
+def score_complexity(image: np.ndarray) -> dict:
+    """
+    Cheap page-complexity features on a downsampled copy of the page:
+    ink density, edge density, graphics (non-text shapes), table grid lines and colorfulness.
+    Returns {"class": simple|complex, "score": 0..1, "features": {...}}.
+    """
+    small = _downsample(image)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    h, w = gray.shape
+    ink = float(np.count_nonzero(binary)) / binary.size
+    edges = float(np.count_nonzero(cv2.Canny(gray, 100, 200))) / gray.size
+    h_lines = _count_lines(binary, (max(10, w // 8), 1))
+    v_lines = _count_lines(binary, (1, max(10, h // 8)))
+    graphics = graphics_ratio(binary)
+    color = colorfulness(small)
+
+    has_grid = h_lines >= GRID_MIN_LINES and v_lines >= GRID_MIN_LINES
+    # Each feature as a fraction of its threshold; the class flips when any reaches 1
+    ratios = [
+        ink / MAX_SIMPLE_INK,
+        edges / MAX_SIMPLE_EDGES,
+        graphics / MAX_SIMPLE_GRAPHICS,
+        color / MAX_SIMPLE_COLORFULNESS,
+        1.0 if has_grid else min(h_lines, v_lines) / GRID_MIN_LINES,
+    ]
+    score = min(1.0, max(ratios))
+
+    return {
+        "class": COMPLEX if score >= 1.0 else SIMPLE,
+        "score": round(score, 3),
+        "features": {
+            "ink_density": round(ink, 4),
+            "edge_density": round(edges, 4),
+            "graphics": round(graphics, 3),
+            "h_lines": h_lines,
+            "v_lines": v_lines,
+            "colorfulness": round(color, 1),
+        },
+    }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The operations tests import common/ and preprocessing_service.*: make the repository root importable
+# when the suite is run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
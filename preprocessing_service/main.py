@@ -1,120 +1,161 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Header
+from fastapi.responses import JSONResponse
 import uvicorn
-import numpy as np
-import cv2
-from preprocessing_service.processors import ImageProcessor
+import asyncio
+import base64
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
 from common.config import settings
+from common.deadline import Deadline
 from common.logger import configure_logger
+from common.readiness import Readiness
+from preprocessing_service.operations import (InvalidImage, convert_pdf, extract_tables, normalize_image, probe_image,
+                                              warm_up_opencv)
+
+# OpenCV/numpy (via preprocessing_service.processors) and pdf2image are imported
+# lazily so the process starts serving /health immediately; warm-up loads them.
 
 # Configure Structured Logging
 logger = configure_logger("preprocessing_service")
 
 app = FastAPI(title="Document Preprocessing Service", version="1.0.0")
 
+readiness = Readiness("preprocessing")
+
+# OpenCV and poppler release the GIL: CPU-bound work runs here so the event loop keeps serving
+executor = ThreadPoolExecutor(max_workers=settings.PREPROCESS_WORKERS, thread_name_prefix="preprocess")
+
+async def run_blocking(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+def warm_up_pdf():
+    import pdf2image  # noqa: F401
+
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Service started in {settings.ENV} mode", 
                 extra={"config": settings.model_dump(mode='json')})
+    readiness.start({"opencv": warm_up_opencv, "pdf2image": warm_up_pdf}, enabled=settings.STARTUP_WARMUP)
 
 @app.get("/health")
 def health_check():
-    """Health check endpoint to verify service status."""
+    """Liveness: the process is up and serving requests."""
     return {"status": "healthy", "service": "preprocessing"}
 
+@app.get("/ready")
+def ready_check():
+    """Readiness: heavy modules are loaded and a warm-up pass has completed."""
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
+@app.post("/preprocess/probe")
+async def probe_document(file: UploadFile = File(...)):
+    """
+    Cheap dimensions lookup: reads only the image header, no decode or processing.
+    Used instead of /preprocess/normalize when normalization is disabled.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    contents = await file.read()
+    try:
+        return {"filename": file.filename, **probe_image(contents)}
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/preprocess/normalize")
-async def normalize_document(file: UploadFile = File(...)):
+async def normalize_document(file: UploadFile = File(...), return_image: bool = False, orientation: bool = True,
+                             x_deadline_ms: str = Header(None)):
     """
     Main endpoint to ingest a raw document image and apply normalization.
     Steps:
     1. Validate Image
     2. Remove Noise (Denoise)
-    3. Correct Orientation (Deskew) - Placeholder for now
+    3. Correct Skew (Deskew)
+    4. Correct Orientation: 0/90/180/270 rotation, applied when its
+       confidence reaches ORIENTATION_MIN_CONFIDENCE ('orientation': {"angle", "confidence"});
+       orientation=false skips it for pages that were already turned upright
+    With return_image=true the processed page is returned as a base64 PNG
+    ('processed_image') so callers can forward it instead of the raw upload.
+    'complexity' (simple/complex) lets the visual service route the page to a smaller VLM.
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
+    if Deadline.from_header(x_deadline_ms).expired:
+        raise HTTPException(status_code=504, detail="Job deadline exceeded")
 
     try:
-        # Read image into numpy array
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if img is None:
-             raise HTTPException(status_code=400, detail="Invalid image file or corrupt data")
-        
-        if img is None:
-             raise HTTPException(status_code=400, detail="Invalid image file or corrupt data")
-        
-        # Get original dims
-        height, width, _ = img.shape
-
-        # Apple Processing Steps
-        logger.info("Starting Denoising...")
-        denoised_img = ImageProcessor.denoise_image(img)
-        
-        logger.info("Starting Deskewing...")
-        processed_img = ImageProcessor.deskew_image(denoised_img)
-        
-        # Encode back to memory to return or pass forward
-        # For this endpoint, we might want to return the processed image bytes 
-        # OR save it to shared storage and return the path. 
-        # For now, let's return metadata + success status.
-        
-        final_h, final_w = processed_img.shape[:2]
-        
-        return {
-            "filename": file.filename,
-            "original_dims": {"width": width, "height": height},
-            "processed_dims": {"width": final_w, "height": final_h},
-            "steps_completed": ["denoise", "deskew"],
-            "status": "success"
-        }
-
+        result = await run_blocking(normalize_image, contents, file.filename, return_image, orientation)
+        if return_image:
+            result["processed_image"] = base64.b64encode(result["processed_image"]).decode("utf-8")
+        return result
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @app.post("/preprocess/pdf_to_images")
-async def pdf_to_images(file: UploadFile = File(...)):
+async def pdf_to_images(file: UploadFile = File(...), text_layer: bool = True, x_deadline_ms: str = Header(None)):
     """
     Convert PDF to a list of images (Base64 encoded).
+    Pages that look scanned (not a clean vector render) are flagged 'needs_preprocessing'.
+    With text_layer=true, each page is also classified as text_native, scanned or
+    mixed. text_native pages carry 'detections' built from the embedded text
+    layer, so they need no VLM call; mixed pages carry its 'words' (pixel boxes).
+    Other pages are rotated upright when sideways or upside down ('orientation').
+    X-Deadline-Ms (the job's remaining time) bounds text extraction and rendering.
     """
     if file.content_type != "application/pdf":
          raise HTTPException(status_code=400, detail="File must be a PDF")
-    
-    import io
-    import base64
-    from pdf2image import convert_from_bytes
+    deadline = Deadline.from_header(x_deadline_ms)
+    if deadline.expired:
+        raise HTTPException(status_code=504, detail="Job deadline exceeded")
     
     try:
         contents = await file.read()
-        
-        # Convert to list of PIL Images
-        # poppler_path can be omitted if it's in PATH
-        images = convert_from_bytes(contents)
-        
-        results = []
-        for i, img in enumerate(images):
-            # Convert to base64
-            buffered = io.BytesIO()
-            img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-            
-            results.append({
-                "page_number": i + 1,
-                "base64_image": img_str,
-                "width": img.width,
-                "height": img.height
-            })
-            
-        return {"pages": results, "total_pages": len(results)}
-        
+        result = await run_blocking(convert_pdf, contents, text_layer, deadline)
+        for page in result["pages"]:
+            page["base64_image"] = base64.b64encode(page.pop("image")).decode("utf-8")
+        return result
     except Exception as e:
         logger.error(f"PDF conversion failed: {e}")
+        if deadline.expired:
+            raise HTTPException(status_code=504, detail="Job deadline exceeded")
         # Hint about poppler if it's missing
         if "poppler" in str(e).lower():
             raise HTTPException(status_code=500, detail="PDF engine (poppler) missing. Please install poppler-utils.")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/preprocess/tables")
+async def table_structure(file: UploadFile = File(...), tables: str = Form(...), words: str = Form(None),
+                          x_deadline_ms: str = Header(None)):
+    """
+    Cell structure of the tables the VLM found on a page, without another model call.
+    file is the page image the VLM saw; tables a JSON list of {"bbox", "text", "html"}
+    in its pixel space; words (optional) the page's text-layer words
+    [{"text", "x1", "y1", "x2", "y2"}] in the same space.
+    Returns {"tables": [{"header_rows", "body_rows", "rows", "cols", "source"}]} in input order.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    if Deadline.from_header(x_deadline_ms).expired:
+        raise HTTPException(status_code=504, detail="Job deadline exceeded")
+    try:
+        specs = json.loads(tables)
+        page_words = json.loads(words) if words else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tables/words JSON: {e}")
+
+    try:
+        contents = await file.read()
+        return await run_blocking(extract_tables, contents, specs, page_words)
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Table structure extraction failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8001, reload=True)
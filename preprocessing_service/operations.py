@@ -0,0 +1,241 @@
+"""
+The preprocessing service's work as plain functions: bytes in, dicts out.
+
+The HTTP endpoints in main.py run them on a thread pool and base64-encode
+the images for JSON; the orchestrator's embedded mode (DEPLOYMENT_MODE=embedded)
+calls them on a local process pool and keeps the images as bytes. All of
+them are blocking and picklable (top-level, plain arguments).
+"""
+import io
+from typing import List, Optional
+
+import structlog
+
+from common.config import settings
+from common.deadline import Deadline
+
+# OpenCV/numpy and pdf2image are imported inside the functions so that importing
+# this module stays cheap (the services serve /health before warm-up loads them).
+
+logger = structlog.get_logger(service_name="preprocessing_service")
+
+
+class InvalidImage(ValueError):
+    """The upload could not be decoded as an image (HTTP 400)."""
+
+    def __init__(self, message: str = "Invalid image file or corrupt data"):
+        super().__init__(message)
+
+
+def init_worker():
+    """Process pool initializer: logs synchronously (a worker has no event loop to keep responsive)."""
+    from common.logger import configure_logger
+    settings.LOG_ASYNC = False
+    configure_logger("preprocessing_service")
+
+
+def warm_up_opencv():
+    """Imports OpenCV and runs the normalization path once on a small synthetic page."""
+    import numpy as np
+    import cv2
+    from preprocessing_service.processors import ImageProcessor
+
+    img = np.full((256, 256, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "WARM UP", (20, 128), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    ImageProcessor.correct_orientation(ImageProcessor.deskew_image(ImageProcessor.denoise_image(img)))
+
+
+def probe_image(contents: bytes) -> dict:
+    """Dimensions and format from the image header only, no decode or processing."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        # Image.open is lazy: it parses the header and defers pixel decoding
+        with Image.open(io.BytesIO(contents)) as image:
+            width, height = image.size
+            image_format = image.format
+    except UnidentifiedImageError:
+        raise InvalidImage()
+
+    return {
+        "format": image_format,
+        "original_dims": {"width": width, "height": height},
+        "processed_dims": {"width": width, "height": height},
+        "steps_completed": [],
+        "status": "success"
+    }
+
+
+def normalize_image(contents: bytes, filename: str, return_image: bool, orientation: bool = True) -> dict:
+    """
+    Denoise, deskew and orientation of one page image. With return_image, 'processed_image' holds PNG bytes.
+    orientation=False skips the orientation check (pages already turned upright while rendering).
+    """
+    import numpy as np
+    import cv2
+    from preprocessing_service.complexity import score_complexity
+    from preprocessing_service.processors import ImageProcessor
+
+    # Read image into numpy array
+    nparr = np.frombuffer(contents, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    if img is None:
+        raise InvalidImage()
+
+    # Get original dims
+    height, width, _ = img.shape
+
+    # Apple Processing Steps
+    steps_completed = []
+    logger.info("Starting Denoising...")
+    processed_img = ImageProcessor.denoise_image(img)
+    steps_completed.append("denoise")
+
+    if settings.ENABLE_DESKEW:
+        logger.info("Starting Deskewing...")
+        processed_img = ImageProcessor.deskew_image(processed_img)
+        steps_completed.append("deskew")
+
+    angle, confidence = 0, 0.0
+    if settings.ENABLE_ORIENTATION and orientation:
+        processed_img, angle, confidence = ImageProcessor.correct_orientation(
+            processed_img, settings.ORIENTATION_MIN_CONFIDENCE)
+        steps_completed.append("orientation")
+
+    final_h, final_w = processed_img.shape[:2]
+
+    result = {
+        "filename": filename,
+        "original_dims": {"width": width, "height": height},
+        "processed_dims": {"width": final_w, "height": final_h},
+        "steps_completed": steps_completed,
+        "orientation": {"angle": angle, "confidence": confidence},
+        "complexity": score_complexity(processed_img),
+        "status": "success"
+    }
+
+    if return_image:
+        # Encode back to memory so the caller can pass the processed page forward
+        ok, buffer = cv2.imencode(".png", processed_img)
+        if not ok:
+            raise ValueError("PNG encoding of processed image failed")
+        result["processed_image"] = buffer.tobytes()
+        result["image_format"] = "png"
+
+    return result
+
+
+def convert_pdf(contents: bytes, text_layer: bool, deadline: Deadline) -> dict:
+    """PDF pages as PNG bytes ('image'), with text-layer classification, routing hints and orientation."""
+    import numpy as np
+    from preprocessing_service.complexity import score_complexity
+    from preprocessing_service.processors import ImageProcessor
+    from preprocessing_service.rendering import RenderPolicy, render_pdf
+    from preprocessing_service.text_layer import (extract_text_layer, classify_page, layer_to_detections,
+                                                  layer_to_words, min_text_height, TEXT_NATIVE, MIXED)
+
+    layers = []
+    if text_layer:
+        try:
+            layers = extract_text_layer(contents, timeout=deadline.timeout(60.0))
+        except Exception as e:
+            logger.warning(f"Text layer extraction failed, all pages go to the VLM: {e}")
+
+    # Convert to list of PIL Images, DPI chosen per page (size + smallest text)
+    # poppler_path can be omitted if it's in PATH
+    policy = RenderPolicy(
+        target_pixels=settings.RENDER_TARGET_MPIX * 1_000_000,
+        min_dpi=settings.RENDER_MIN_DPI,
+        max_dpi=settings.RENDER_MAX_DPI,
+        min_text_px=settings.RENDER_MIN_TEXT_PX,
+    )
+    min_text_pts = {layer.page_number: min_text_height(layer) for layer in layers}
+    images, render_stats = render_pdf(contents, policy, workers=settings.RENDER_WORKERS,
+                                      grayscale=settings.RENDER_GRAYSCALE, min_text_pts=min_text_pts,
+                                      timeout=deadline.timeout())
+
+    results = []
+    for i, img in enumerate(images):
+        page = {
+            "page_number": i + 1,
+            "render": render_stats[i]
+        }
+
+        if text_layer:
+            layer = layers[i] if i < len(layers) else None
+            # A 4x downsampled grayscale raster is plenty to spot non-text ink
+            page_type, stats = classify_page(layer, np.asarray(img.convert("L").reduce(4)))
+            page["page_type"] = page_type
+            page["text_layer_stats"] = stats
+            if page_type == TEXT_NATIVE:
+                page["detections"] = layer_to_detections(layer, img.width, img.height)
+            elif page_type == MIXED:
+                # Exact text for the cells of tables the VLM finds on the page
+                page["words"] = layer_to_words(layer, img.width, img.height)
+
+        if page.get("page_type") != TEXT_NATIVE and settings.ENABLE_ORIENTATION:
+            # Text-native pages are laid out from the text layer; scans can be sideways or upside down
+            img, angle, confidence = rotate_upright(img)
+            page["orientation"] = {"angle": angle, "confidence": confidence}
+            if angle:
+                page.pop("words", None) # Text-layer positions are for the unrotated page
+
+        buffered = io.BytesIO()
+        img.save(buffered, format="PNG")
+        page["image"] = buffered.getvalue()
+        page["width"], page["height"] = img.width, img.height
+
+        if page.get("page_type") != TEXT_NATIVE:
+            # Model routing hint for the visual service (text-native pages skip the VLM)
+            page["complexity"] = score_complexity(np.asarray(img.convert("RGB"))[:, :, ::-1])
+            # Scans get denoise/deskew in the orchestrator's page pipeline; clean vector renders skip it
+            page["needs_preprocessing"] = not ImageProcessor.is_clean_render(np.asarray(img.convert("L")))
+
+        results.append(page)
+
+    if text_layer:
+        native = sum(1 for p in results if p.get("page_type") == TEXT_NATIVE)
+        logger.info(f"Text layer fast path: {native}/{len(results)} pages text-native")
+    logger.info(f"Rendered {len(results)} pages", render=[(s["dpi"], s["render_ms"], s["pixels"]) for s in render_stats])
+
+    return {"pages": results, "total_pages": len(results)}
+
+
+def rotate_upright(img):
+    """Rendered PDF page (PIL) rotated upright if confidently sideways/upside down: (image, angle, confidence)."""
+    import numpy as np
+    from PIL import Image
+    from preprocessing_service.processors import ImageProcessor
+
+    angle, confidence = ImageProcessor.detect_orientation(np.asarray(img.convert("L")))
+    if angle == 0 or confidence < settings.ORIENTATION_MIN_CONFIDENCE:
+        return img, 0, confidence
+    logger.info(f"Detected orientation: {angle} (confidence {confidence})")
+    # PIL's ROTATE_* transposes are counterclockwise
+    transpose = {90: Image.Transpose.ROTATE_270, 180: Image.Transpose.ROTATE_180, 270: Image.Transpose.ROTATE_90}
+    return img.transpose(transpose[angle]), angle, confidence
+
+
+def extract_tables(contents: bytes, specs: list, words: Optional[List[dict]]) -> dict:
+    """Cell structure of the tables ({"bbox", "text", "html"} specs) on one page image."""
+    import numpy as np
+    import cv2
+    from preprocessing_service.tables import extract_table
+
+    gray = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise InvalidImage()
+
+    results = []
+    for spec in specs:
+        bbox = spec.get("bbox") or {}
+        # Only the words inside the (padded) table box are candidates for its cells
+        table_words = [
+            w for w in words or []
+            if bbox.get("x1", 0) - 5 <= (w["x1"] + w["x2"]) / 2 <= bbox.get("x2", 0) + 5
+            and bbox.get("y1", 0) - 5 <= (w["y1"] + w["y2"]) / 2 <= bbox.get("y2", 0) + 5
+        ]
+        results.append(extract_table(gray, bbox, text=spec.get("text") or "", html=spec.get("html") or "",
+                                     words=table_words))
+    return {"tables": results}
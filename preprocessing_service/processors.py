@@ -1,9 +1,15 @@
 import cv2
 import numpy as np
 import logging
+from typing import Tuple
 
 logger = logging.getLogger("preprocessing_service")
 
+ORIENTATION_MAX_SIDE = 1200 # The orientation detector halves the page until its long side is at most this
+MIN_LINE_HEIGHT = 4 # Pixels (on the downsampled page): thinner ink runs are not text lines
+FULL_ASYMMETRY = 0.025 # Ascender/descender ink imbalance (share of line ink) that counts as certain; running text: 0.02-0.04
+_ROTATIONS = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
 class ImageProcessor:
     @staticmethod
     def denoise_image(image: np.ndarray) -> np.ndarray:
@@ -48,12 +54,14 @@ class ImageProcessor:
             # Get minimum area rectangle
             angle = cv2.minAreaRect(coords)[-1]
             
-            # minAreaRect returns angle in range [-90, 0). 
-            # We need to adjust it to represent the rotation needed.
-            if angle < -45:
-                angle = -(90 + angle)
-            else:
-                angle = -angle
+            # minAreaRect returns angle in range [-90, 0) on OpenCV < 4.5 and (0, 90] on newer
+            # versions. Fold it into (-45, 45] and negate to get the rotation needed;
+            # otherwise an upright page on OpenCV 4.5+ reads as 90 degrees skewed.
+            if angle > 45:
+                angle -= 90
+            elif angle <= -45:
+                angle += 90
+            angle = -angle
                 
             logger.info(f"Detected skew angle: {angle}")
 
@@ -73,10 +81,113 @@ class ImageProcessor:
             return image
     
     @staticmethod
-    def correct_orientation(image: np.ndarray) -> np.ndarray:
+    def is_clean_render(gray: np.ndarray, min_pure_white: float = 0.95) -> bool:
+        """
+        True for pages rasterized from vector content (born-digital PDFs): the
+        background is exactly white, so there is no sensor noise or skew to fix.
+        Scans have an off-white, noisy background. gray is a 2D uint8 page.
+        """
+        sample = gray[::2, ::2]
+        # Near-white pixels: background, plus a thin anti-aliasing fringe around glyphs
+        background = np.count_nonzero(sample >= 230)
+        if background == 0:
+            return False
+        return np.count_nonzero(sample == 255) / background >= min_pure_white
+
+    @staticmethod
+    def detect_orientation(image: np.ndarray, max_side: int = ORIENTATION_MAX_SIDE) -> Tuple[int, float]:
         """
-        Traditional methods (tesseract OSD) are slow. 
-        For now, we assume upright. 
-        TODO: Implement deep-learning based orientation classifier (0, 90, 180, 270)
+        Clockwise rotation (0, 90, 180 or 270) that makes the page upright, and
+        a confidence in [0, 1]. Works on a binarized page halved until its long
+        side is at most max_side pixels, in two steps:
+        - 0/180 vs 90/270: smeared along the text direction, characters merge
+          into long line bars; smeared across it, they stay glyph-sized blobs.
+        - 0 vs 180: in Latin text ascenders (b, d, h, k, l, capitals, digits)
+          carry more ink than descenders (g, j, p, q, y), so the row profile
+          of each line has more ink above its x-height band than below it.
+        Pages without that asymmetry (all capitals, numbers only) get a low
+        confidence instead of a guess.
         """
-        return image
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        while max(gray.shape) > max_side:
+            # Halving: INTER_AREA's 2x fast path costs ~1 ms on A4 at 300 DPI, an arbitrary factor 10-30x more
+            gray = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        if np.count_nonzero(binary) < 0.001 * binary.size:
+            return 0, 0.0 # Blank page
+
+        glyph = _glyph_size(binary)
+        horizontal = _smeared_elongation(binary, (glyph, 1), glyph)
+        vertical = _smeared_elongation(binary, (1, glyph), glyph)
+        is_vertical = vertical > horizontal
+        axis_confidence = min(1.0, abs(horizontal - vertical))
+
+        # Turn vertical text horizontal (90 clockwise), then decide upright vs upside down
+        lines = np.rot90(binary, k=-1) if is_vertical else binary
+        asymmetry = _ascender_asymmetry(lines)
+        flip_confidence = min(1.0, abs(asymmetry) / FULL_ASYMMETRY)
+
+        upright = asymmetry >= 0
+        angle = (90 if upright else 270) if is_vertical else (0 if upright else 180)
+        return angle, round(axis_confidence * flip_confidence, 3)
+
+    @staticmethod
+    def correct_orientation(image: np.ndarray, min_confidence: float = 0.0) -> Tuple[np.ndarray, int, float]:
+        """
+        Rotates the page upright when the detected orientation is at least
+        min_confidence. Returns (image, clockwise rotation applied, confidence).
+        """
+        angle, confidence = ImageProcessor.detect_orientation(image)
+        if angle == 0 or confidence < min_confidence:
+            return image, 0, confidence
+        logger.info(f"Detected orientation: {angle} (confidence {confidence})")
+        return cv2.rotate(image, _ROTATIONS[angle]), angle, confidence
+
+
+def _glyph_size(binary: np.ndarray) -> int:
+    """Median longer side of glyph-sized connected components (text size, whatever the rotation)."""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+    sizes = np.maximum(stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT])
+    sizes = sizes[(sizes >= 3) & (sizes < min(binary.shape) / 4)]
+    return max(3, int(np.median(sizes))) if sizes.size else 8
+
+
+def _smeared_elongation(binary: np.ndarray, kernel: Tuple[int, int], glyph: int) -> float:
+    """
+    Dilates with a kernel one glyph long (bridging letter and word gaps, not
+    line gaps) and returns the ink-weighted mean log aspect ratio of the
+    resulting blobs, measured along the kernel: text lines become long bars.
+    """
+    smeared = cv2.dilate(binary, cv2.getStructuringElement(cv2.MORPH_RECT, kernel))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(smeared)
+    stats = stats[1:]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= glyph * glyph // 4] # Specks
+    if not len(stats):
+        return 0.0
+    along, across = (cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT) if kernel[0] > 1 else (cv2.CC_STAT_HEIGHT, cv2.CC_STAT_WIDTH)
+    return float(np.average(np.log(stats[:, along] / stats[:, across]), weights=stats[:, cv2.CC_STAT_AREA]))
+
+
+def _ascender_asymmetry(binary: np.ndarray) -> float:
+    """
+    (ink above - ink below the x-height band) / ink, over the text lines of a
+    page whose lines run horizontally: positive when upright. Lines are runs
+    of rows holding ink; the band is the rows of a line at least half as
+    dense as its densest row.
+    """
+    profile = binary.sum(axis=1, dtype=np.int64)
+    inked = profile > max(1, int(profile.max() * 0.02))
+    # Run boundaries: starts where ink begins, ends where it stops
+    edges = np.diff(np.concatenate(([0], inked.view(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    above = below = total = 0
+    for start, end in zip(starts, ends):
+        if end - start < MIN_LINE_HEIGHT:
+            continue # Rules, specks and underlines carry no asymmetry
+        line = profile[start:end]
+        band = np.flatnonzero(line >= line.max() * 0.5)
+        # The row next to the band is mostly the band's own anti-aliased edge: skip it on both sides
+        above += int(line[:max(0, band[0] - 1)].sum())
+        below += int(line[band[-1] + 2:].sum())
+        total += int(line.sum())
+    return (above - below) / total if total else 0.0
@@ -0,0 +1,131 @@
+import math
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+POINTS_PER_INCH = 72.0
+DEFAULT_DPI = 200 # pdf2image's default, used when page sizes are unknown
+
+
+@dataclass
+class RenderPolicy:
+    """
+    Picks a rasterization DPI per page.
+
+    The DPI is the one that fits the page into target_pixels, raised so that the
+    smallest text on the page (when known from the text layer) is at least
+    min_text_px tall, and clamped to [min_dpi, max_dpi].
+    """
+    target_pixels: float = 4_000_000 # ~A4/Letter at 200 DPI
+    min_dpi: int = 72
+    max_dpi: int = 300
+    min_text_px: float = 12.0
+    step: int = 10 # Round DPIs so neighbouring pages share a render call
+
+    def choose_dpi(self, width_pt: float, height_pt: float, min_text_pt: Optional[float] = None) -> int:
+        area_in2 = (width_pt / POINTS_PER_INCH) * (height_pt / POINTS_PER_INCH)
+        dpi = math.sqrt(self.target_pixels / area_in2) if area_in2 > 0 else DEFAULT_DPI
+        # The pixel budget rounds down; the text floor rounds up, or small text ends up below min_text_px
+        dpi = int(dpi // self.step * self.step)
+        if min_text_pt:
+            text_dpi = self.min_text_px * POINTS_PER_INCH / min_text_pt
+            dpi = max(dpi, math.ceil(text_dpi / self.step - 1e-9) * self.step)
+        return max(self.min_dpi, min(self.max_dpi, dpi))
+
+
+_PAGE_SIZE = re.compile(r"^Page\s+(\d+)\s+size:\s+([\d.]+)\s+x\s+([\d.]+)\s+pts", re.MULTILINE)
+_PAGE_ROT = re.compile(r"^Page\s+(\d+)\s+rot:\s+(\d+)", re.MULTILINE)
+
+
+def parse_page_sizes(pdfinfo_output: str) -> List[Tuple[float, float]]:
+    """Parses `pdfinfo -f 1 -l N` output into displayed (width, height) in points per page."""
+    sizes = {int(n): (float(w), float(h)) for n, w, h in _PAGE_SIZE.findall(pdfinfo_output)}
+    for n, rot in _PAGE_ROT.findall(pdfinfo_output):
+        n = int(n)
+        if n in sizes and int(rot) % 180 == 90:
+            sizes[n] = sizes[n][::-1]
+    return [sizes[n] for n in sorted(sizes)]
+
+
+def page_sizes(pdf_path: str, timeout: float = 30.0) -> List[Tuple[float, float]]:
+    out = subprocess.run(
+        ["pdfinfo", "-f", "1", "-l", "100000", pdf_path],
+        capture_output=True, text=True, timeout=timeout, check=True,
+    ).stdout
+    return parse_page_sizes(out)
+
+
+def plan_chunks(dpis: List[int], workers: int) -> List[Tuple[int, int, int]]:
+    """
+    Splits pages into (first_page, last_page, dpi) render calls: consecutive pages
+    with the same DPI are grouped, then split so every worker gets a share.
+    """
+    runs = []
+    for page, dpi in enumerate(dpis, start=1):
+        if runs and runs[-1][2] == dpi and runs[-1][1] == page - 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page, dpi])
+
+    chunk_size = max(1, math.ceil(len(dpis) / max(1, workers)))
+    chunks = []
+    for first, last, dpi in runs:
+        for start in range(first, last + 1, chunk_size):
+            chunks.append((start, min(last, start + chunk_size - 1), dpi))
+    return chunks
+
+
+def render_pdf(pdf_bytes: bytes, policy: RenderPolicy, workers: int = 4, grayscale: bool = False,
+               min_text_pts: Optional[Dict[int, float]] = None, timeout: Optional[float] = None):
+    """
+    Rasterizes every page with a per-page DPI, rendering page ranges in parallel
+    (one pdftoppm process per chunk).
+    Returns (images, stats) with stats[i] = {"dpi", "render_ms", "pixels"}.
+    min_text_pts maps page number -> smallest text height (pt) from the text layer.
+    timeout (s) bounds each poppler process (chunks render in parallel).
+    """
+    from pdf2image import convert_from_path
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(pdf_bytes)
+        path = tmp.name
+    try:
+        try:
+            sizes = page_sizes(path, timeout=min(30.0, timeout or 30.0))
+        except Exception:
+            sizes = []
+        if sizes:
+            min_text_pts = min_text_pts or {}
+            dpis = [policy.choose_dpi(w, h, min_text_pts.get(i + 1)) for i, (w, h) in enumerate(sizes)]
+            chunks = plan_chunks(dpis, workers)
+        else:
+            # Page sizes unknown: single call at the default DPI
+            chunks = [(None, None, DEFAULT_DPI)]
+
+        def render(chunk):
+            first, last, dpi = chunk
+            started = time.perf_counter()
+            images = convert_from_path(path, dpi=dpi, first_page=first, last_page=last,
+                                       grayscale=grayscale, thread_count=1, timeout=timeout)
+            return chunk, images, (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            rendered = list(pool.map(render, chunks))
+    finally:
+        os.remove(path)
+
+    images, stats = [], []
+    for (_, _, dpi), chunk_images, elapsed_ms in rendered:
+        for img in chunk_images:
+            images.append(img)
+            stats.append({
+                "dpi": dpi,
+                "render_ms": round(elapsed_ms / max(1, len(chunk_images)), 1),
+                "pixels": img.width * img.height,
+            })
+    return images, stats
@@ -0,0 +1,452 @@
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Where a table's structure came from, best first
+SOURCE_HTML = "html"         # The VLM's HTML (text and spans); cell boxes from the image grid when it agrees
+SOURCE_RULINGS = "rulings"   # Row and column boundaries from ruling lines
+SOURCE_LAYOUT = "layout"     # Borderless: boundaries from whitespace between text lines and columns
+SOURCE_TEXT = "text"         # Only the VLM text could be split into rows/cells (no boxes)
+
+CROP_PAD = 0.02        # The VLM box is approximate: crop a little wider (fraction of the page) to keep the frame
+MIN_RULE_TEXT_H = 2.5  # A ruling line is longer than this many text heights (glyph strokes are not)
+SPAN_COVERAGE = 0.5    # A cell border drawn along less than this fraction of its length is a merged (spanned) cell
+
+# Cell separators in VLM table text: tabs, pipes, or runs of 2+ spaces
+_CELL_SPLIT = re.compile(r"\t+|\s*\|\s*|\s{2,}")
+
+
+@dataclass
+class Cell:
+    row: int
+    col: int
+    text: str = ""
+    row_span: int = 1
+    col_span: int = 1
+    header: bool = False
+    bbox: Optional[Tuple[float, float, float, float]] = None
+
+
+@dataclass
+class Grid:
+    """Row and column boundaries (pixels in the crop) plus the merged cells found between them."""
+    ys: List[int]
+    xs: List[int]
+    source: str
+    spans: Dict[Tuple[int, int], Tuple[int, int]] # (row, col) of a merged cell's top-left -> (row_span, col_span)
+    covered: set                                  # Grid positions inside a merged cell, other than its top-left
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.ys) - 1, len(self.xs) - 1
+
+
+# --- HTML ---
+
+class _TableHTMLParser(HTMLParser):
+    """Rows of cells from the first <table> (or bare <tr>s); nested tables are flattened into their cell's text."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[List[Cell]] = []
+        self._depth = 0
+        self._section = None
+        self._cell: Optional[Cell] = None
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._depth += 1
+        elif tag == "br":
+            self._text.append("\n")
+        elif self._depth > 1:
+            return
+        elif tag in ("thead", "tbody", "tfoot"):
+            self._section = tag
+        elif tag == "tr":
+            self._close_cell()
+            self.rows.append([])
+        elif tag in ("td", "th"):
+            self._close_cell()
+            if not self.rows:
+                self.rows.append([])
+            attrs = dict(attrs)
+            self._cell = Cell(row=len(self.rows) - 1, col=0,
+                              row_span=_span(attrs.get("rowspan")), col_span=_span(attrs.get("colspan")),
+                              header=tag == "th" or self._section == "thead")
+
+    def handle_endtag(self, tag):
+        if tag == "table":
+            self._depth -= 1
+            if self._depth <= 0:
+                self._close_cell()
+        elif self._depth > 1:
+            if tag in ("td", "th"):
+                self._text.append(" ")
+        elif tag in ("td", "th", "tr"):
+            self._close_cell()
+        elif tag == "thead":
+            self._section = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._text.append(data.replace("\n", " "))
+
+    def close(self):
+        super().close()
+        self._close_cell()
+
+    def _close_cell(self):
+        if self._cell is not None:
+            lines = "".join(self._text).split("\n")
+            self._cell.text = "\n".join(" ".join(line.split()) for line in lines).strip()
+            self.rows[-1].append(self._cell)
+        self._cell = None
+        self._text = []
+
+
+def _span(value) -> int:
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def place_cells(rows: List[List[Cell]]) -> Tuple[List[Cell], int, int]:
+    """Assigns grid columns to cells row by row, skipping positions taken by row spans from above (the HTML table model)."""
+    occupied = set()
+    cells = []
+    n_rows = n_cols = 0
+    for r, row in enumerate(rows):
+        c = 0
+        for cell in row:
+            while (r, c) in occupied:
+                c += 1
+            cell.row, cell.col = r, c
+            for dr in range(cell.row_span):
+                for dc in range(cell.col_span):
+                    occupied.add((r + dr, c + dc))
+            cells.append(cell)
+            c += cell.col_span
+            n_cols = max(n_cols, c)
+            n_rows = max(n_rows, r + cell.row_span)
+    return cells, n_rows, n_cols
+
+
+def parse_html_table(html: str) -> Tuple[List[Cell], int, int]:
+    """Cells (with spans and header flags, grid positions assigned) and the (rows, cols) shape of an HTML table."""
+    parser = _TableHTMLParser()
+    parser.feed(html)
+    parser.close()
+    rows = [row for row in parser.rows if row]
+    # Without <thead>/<th>, nothing is marked as header here; the caller's heuristic decides
+    return place_cells(rows)
+
+
+# --- Image grid ---
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, end) runs of True in a 1D boolean array."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def _rule_positions(profile: np.ndarray, min_count: int) -> List[int]:
+    """Centers of the ruling lines in a projection of a line mask."""
+    return [(start + end - 1) // 2 for start, end in _runs(profile >= min_count)]
+
+
+def text_height(binary: np.ndarray) -> float:
+    """Median height of glyph-sized connected components (a robust text size estimate)."""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    heights = heights[(heights >= 4) & (heights < binary.shape[0] / 2)]
+    return float(np.median(heights)) if heights.size else 10.0
+
+
+def find_rulings(binary: np.ndarray, text_h: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Horizontal and vertical ruling-line masks: a morphological open with line kernels longer than any glyph stroke."""
+    length = max(15, int(text_h * MIN_RULE_TEXT_H))
+    horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1)))
+    vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, length)))
+    return horizontal, vertical
+
+
+def _whitespace_bounds(ink_profile: np.ndarray, min_gap: int) -> List[int]:
+    """Boundaries between ink runs separated by at least min_gap empty pixels: first ink, gap midpoints, last ink."""
+    runs = _runs(ink_profile > 0)
+    if not runs:
+        return []
+    merged = [list(runs[0])]
+    for start, end in runs[1:]:
+        if start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    bounds = [merged[0][0]]
+    bounds += [(prev[1] + nxt[0]) // 2 for prev, nxt in zip(merged, merged[1:])]
+    return bounds + [merged[-1][1]]
+
+
+def _with_edges(rules: List[int], ink_profile: np.ndarray, tolerance: int) -> List[int]:
+    """Rule positions plus the first/last ink position when there is text outside the outermost rules."""
+    ink = np.flatnonzero(ink_profile)
+    if ink.size == 0:
+        return rules
+    bounds = list(rules)
+    if not bounds or ink[0] < bounds[0] - tolerance:
+        bounds.insert(0, int(ink[0]))
+    if ink[-1] > bounds[-1] + tolerance:
+        bounds.append(int(ink[-1]) + 1)
+    return bounds
+
+
+def _segment_drawn(mask: np.ndarray, fixed: int, start: int, end: int, vertical: bool, band: int = 2) -> bool:
+    """True if a ruling line is drawn along at least SPAN_COVERAGE of the segment [start, end) at position fixed."""
+    if end <= start:
+        return True
+    lo, hi = max(0, fixed - band), fixed + band + 1
+    strip = mask[start:end, lo:hi] if vertical else mask[lo:hi, start:end]
+    drawn = np.count_nonzero(strip.max(axis=1 if vertical else 0))
+    return drawn >= SPAN_COVERAGE * (end - start)
+
+
+def _find_spans(ys: List[int], xs: List[int], horizontal: np.ndarray, vertical: np.ndarray):
+    """Merges grid cells whose shared border is not drawn; only rectangular merges are kept."""
+    n_rows, n_cols = len(ys) - 1, len(xs) - 1
+    parent = list(range(n_rows * n_cols))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for r in range(n_rows):
+        for c in range(n_cols):
+            inset_y = (ys[r + 1] - ys[r]) // 6
+            inset_x = (xs[c + 1] - xs[c]) // 6
+            if c + 1 < n_cols and not _segment_drawn(vertical, xs[c + 1], ys[r] + inset_y, ys[r + 1] - inset_y, True):
+                parent[find(r * n_cols + c + 1)] = find(r * n_cols + c)
+            if r + 1 < n_rows and not _segment_drawn(horizontal, ys[r + 1], xs[c] + inset_x, xs[c + 1] - inset_x, False):
+                parent[find((r + 1) * n_cols + c)] = find(r * n_cols + c)
+
+    groups: Dict[int, List[Tuple[int, int]]] = {}
+    for r in range(n_rows):
+        for c in range(n_cols):
+            groups.setdefault(find(r * n_cols + c), []).append((r, c))
+    spans, covered = {}, set()
+    for members in groups.values():
+        if len(members) == 1:
+            continue
+        rows = [r for r, _ in members]
+        cols = [c for _, c in members]
+        row_span, col_span = max(rows) - min(rows) + 1, max(cols) - min(cols) + 1
+        if row_span * col_span != len(members):
+            continue # L-shaped or otherwise irregular: keep the cells separate
+        top_left = (min(rows), min(cols))
+        spans[top_left] = (row_span, col_span)
+        covered.update(m for m in members if m != top_left)
+    return spans, covered
+
+
+def detect_grid(gray: np.ndarray) -> Optional[Grid]:
+    """
+    Row/column structure of a cropped table image. With horizontal and
+    vertical ruling lines, boundaries are the rules (cells may span several
+    grid positions where a border is missing). Otherwise rows are text lines
+    and columns are separated by vertical whitespace running through all
+    rows, with vertical rules still used as column boundaries when present.
+    """
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+    text_h = text_height(binary)
+    horizontal, vertical = find_rulings(binary, text_h)
+    rules = cv2.dilate(cv2.bitwise_or(horizontal, vertical), np.ones((3, 3), np.uint8))
+    text_ink = cv2.bitwise_and(binary, cv2.bitwise_not(rules))
+    row_ink = np.count_nonzero(text_ink, axis=1)
+    col_ink = np.count_nonzero(text_ink, axis=0)
+    if not row_ink.any():
+        return None
+
+    min_len = max(15, int(text_h * MIN_RULE_TEXT_H))
+    h_rules = _rule_positions(np.count_nonzero(horizontal, axis=1), min_len)
+    v_rules = _rule_positions(np.count_nonzero(vertical, axis=0), min_len)
+    tolerance = max(2, int(text_h / 2))
+
+    if len(h_rules) >= 2 and len(v_rules) >= 2:
+        ys = _with_edges(h_rules, row_ink, tolerance)
+        xs = _with_edges(v_rules, col_ink, tolerance)
+        spans, covered = _find_spans(ys, xs, horizontal, vertical)
+        grid = Grid(ys, xs, SOURCE_RULINGS, spans, covered)
+    else:
+        ys = _whitespace_bounds(row_ink, min_gap=2)
+        xs = _with_edges(v_rules, col_ink, tolerance) if v_rules else _whitespace_bounds(col_ink, max(6, int(text_h)))
+        grid = Grid(ys, xs, SOURCE_LAYOUT, {}, set())
+    n_rows, n_cols = grid.shape
+    return grid if n_rows >= 1 and n_cols >= 1 else None
+
+
+def grid_cells(grid: Grid) -> List[Cell]:
+    """One Cell per grid position or merged region, in row-major order, with crop-relative boxes."""
+    n_rows, n_cols = grid.shape
+    cells = []
+    for r in range(n_rows):
+        for c in range(n_cols):
+            if (r, c) in grid.covered:
+                continue
+            row_span, col_span = grid.spans.get((r, c), (1, 1))
+            bbox = (grid.xs[c], grid.ys[r], grid.xs[c + col_span], grid.ys[r + row_span])
+            cells.append(Cell(r, c, row_span=row_span, col_span=col_span, bbox=bbox))
+    return cells
+
+
+# --- Text assignment ---
+
+def assign_words(cells: List[Cell], words: Sequence[dict]):
+    """Puts each word (crop-relative box) into the cell containing its center; lines within a cell are kept."""
+    contents: Dict[int, List[dict]] = {}
+    for word in words:
+        cx, cy = (word["x1"] + word["x2"]) / 2, (word["y1"] + word["y2"]) / 2
+        for i, cell in enumerate(cells):
+            x1, y1, x2, y2 = cell.bbox
+            if x1 <= cx < x2 and y1 <= cy < y2:
+                contents.setdefault(i, []).append(word)
+                break
+    for i, cell_words in contents.items():
+        cell_words.sort(key=lambda w: ((w["y1"] + w["y2"]) / 2, w["x1"]))
+        lines, last_cy, last_h = [], None, 0.0
+        for w in cell_words:
+            cy, h = (w["y1"] + w["y2"]) / 2, w["y2"] - w["y1"]
+            if last_cy is None or cy - last_cy > max(h, last_h) / 2:
+                lines.append([])
+            lines[-1].append(w)
+            last_cy, last_h = cy, h
+        cells[i].text = "\n".join(" ".join(w["text"] for w in sorted(line, key=lambda w: w["x1"])) for line in lines)
+
+
+def split_text_rows(text: str) -> List[List[str]]:
+    """VLM table text -> rows of cell strings (lines; cells split on tabs, pipes or wide spaces)."""
+    rows = []
+    for line in text.splitlines():
+        line = line.strip().strip("|").strip()
+        if not line or set(line) <= set("-=:+| "):
+            continue # Blank and Markdown separator lines
+        rows.append([cell.strip() for cell in _CELL_SPLIT.split(line)])
+    return rows
+
+
+def assign_text(cells: List[Cell], n_rows: int, text_rows: List[List[str]], only_empty: bool = False) -> bool:
+    """
+    Fills cells row by row from split VLM text, only when every row's cell
+    count matches the grid. only_empty keeps text already assigned (from words).
+    """
+    by_row: Dict[int, List[Cell]] = {}
+    for cell in cells:
+        by_row.setdefault(cell.row, []).append(cell)
+    if len(text_rows) != n_rows or any(len(by_row.get(r, [])) != len(row) for r, row in enumerate(text_rows)):
+        return False
+    for r, row in enumerate(text_rows):
+        for cell, value in zip(by_row[r], row):
+            if not (only_empty and cell.text):
+                cell.text = value
+    return True
+
+
+def _mark_header(cells: List[Cell]):
+    """Without HTML header markup: the first row is a header if it has no digits while later rows do."""
+    first = [c for c in cells if c.row == 0]
+    rest = [c for c in cells if c.row > 0]
+    if first and rest and not any(ch.isdigit() for c in first for ch in c.text) \
+            and any(ch.isdigit() for c in rest for ch in c.text) and any(c.text for c in first):
+        for cell in first:
+            cell.header = True
+
+
+def to_rows(cells: List[Cell]) -> Dict[str, list]:
+    """Table schema shape: header_rows/body_rows of {"cells": [...]}, cells in column order."""
+    rows: Dict[int, List[Cell]] = {}
+    for cell in cells:
+        rows.setdefault(cell.row, []).append(cell)
+    header_rows, body_rows = [], []
+    in_header = True
+    for r in sorted(rows):
+        row_cells = sorted(rows[r], key=lambda c: c.col)
+        # Header rows form a prefix of the table
+        in_header = in_header and all(c.header for c in row_cells)
+        row = {"cells": [
+            {
+                "text": c.text,
+                "row_span": c.row_span,
+                "col_span": c.col_span,
+                "bounding_box": dict(zip(("x1", "y1", "x2", "y2"), c.bbox)) if c.bbox else None,
+            } for c in row_cells
+        ]}
+        (header_rows if in_header else body_rows).append(row)
+    return {"header_rows": header_rows, "body_rows": body_rows}
+
+
+def _offset(cells: List[Cell], dx: float, dy: float):
+    for cell in cells:
+        if cell.bbox:
+            x1, y1, x2, y2 = cell.bbox
+            cell.bbox = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+
+def extract_table(gray: np.ndarray, bbox: dict, text: str = "", html: str = "",
+                  words: Optional[Sequence[dict]] = None) -> dict:
+    """
+    Structure of one table on a page: gray is the 2D uint8 page, bbox the
+    table's box in page pixels. Text comes from (in order of preference)
+    the VLM's html, text-layer words (page pixel boxes), or the VLM text
+    split into rows/cells. Cell boxes are in page pixels.
+    Returns {"header_rows", "body_rows", "rows", "cols", "source"}.
+    """
+    page_h, page_w = gray.shape[:2]
+    pad_x, pad_y = int(page_w * CROP_PAD), int(page_h * CROP_PAD)
+    x1, y1 = max(0, int(bbox.get("x1", 0)) - pad_x), max(0, int(bbox.get("y1", 0)) - pad_y)
+    x2, y2 = min(page_w, int(bbox.get("x2", page_w)) + pad_x), min(page_h, int(bbox.get("y2", page_h)) + pad_y)
+    grid = detect_grid(gray[y1:y2, x1:x2]) if x2 - x1 > 4 and y2 - y1 > 4 else None
+
+    if html:
+        cells, n_rows, n_cols = parse_html_table(html)
+        if cells:
+            if grid is not None and grid.shape == (n_rows, n_cols):
+                for cell in cells:
+                    cell.bbox = (grid.xs[cell.col], grid.ys[cell.row],
+                                 grid.xs[min(cell.col + cell.col_span, n_cols)], grid.ys[min(cell.row + cell.row_span, n_rows)])
+                _offset(cells, x1, y1)
+            if not any(c.header for c in cells):
+                _mark_header(cells)
+            return {**to_rows(cells), "rows": n_rows, "cols": n_cols, "source": SOURCE_HTML}
+
+    text_rows = split_text_rows(text) if text else []
+    if grid is not None:
+        cells = grid_cells(grid)
+        n_rows, n_cols = grid.shape
+        filled = False
+        if words:
+            crop_words = [{**w, "x1": w["x1"] - x1, "x2": w["x2"] - x1, "y1": w["y1"] - y1, "y2": w["y2"] - y1}
+                          for w in words]
+            assign_words(cells, crop_words)
+            filled = any(c.text for c in cells)
+        if text_rows:
+            # The text layer can miss text (e.g. a scanned part of the page): the VLM text fills the gaps
+            filled = assign_text(cells, n_rows, text_rows, only_empty=filled) or filled
+        if filled:
+            _offset(cells, x1, y1)
+            _mark_header(cells)
+            return {**to_rows(cells), "rows": n_rows, "cols": n_cols, "source": grid.source}
+
+    if text_rows:
+        # The image grid did not match the text: keep the text's own rows and cells, without boxes
+        cells = [Cell(r, c, text=value) for r, row in enumerate(text_rows) for c, value in enumerate(row)]
+        _mark_header(cells)
+        return {**to_rows(cells), "rows": len(text_rows), "cols": max(len(row) for row in text_rows),
+                "source": SOURCE_TEXT}
+
+    return {"header_rows": [], "body_rows": [], "rows": 0, "cols": 0, "source": None}
@@ -0,0 +1,28 @@
+import cv2
+import numpy as np
+
+from complexity import COMPLEX, SIMPLE, score_complexity
+
+
+def _text_page():
+    page = np.full((1100, 850, 3), 255, np.uint8)
+    for y in range(100, 1000, 30):
+        cv2.putText(page, "Lorem ipsum dolor sit amet, consectetur", (60, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return page
+
+
+def test_blank_and_text_pages_are_simple():
+    assert score_complexity(np.full((1100, 850), 255, np.uint8))["class"] == SIMPLE
+    assert score_complexity(_text_page())["class"] == SIMPLE
+
+
+def test_table_grid_is_complex():
+    page = _text_page()
+    for y in range(100, 1000, 150):
+        cv2.line(page, (50, y), (800, y), (0, 0, 0), 2)
+    for x in range(50, 850, 250):
+        cv2.line(page, (x, 100), (x, 950), (0, 0, 0), 2)
+    result = score_complexity(page)
+    assert result["class"] == COMPLEX
+    assert result["features"]["h_lines"] >= 3 and result["features"]["v_lines"] >= 3
@@ -0,0 +1,70 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessing_service.operations import InvalidImage, normalize_image, probe_image
+
+
+def _page(width=600, height=800):
+    page = np.full((height, width, 3), 255, np.uint8)
+    for y in range(60, height - 40, 40):
+        cv2.putText(page, "Invoice line 1234 total", (40, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    return page
+
+
+def _encoded(page, ext=".png"):
+    return cv2.imencode(ext, page)[1].tobytes()
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG"])
+def test_probe_image_reads_the_header(fmt):
+    buffered = io.BytesIO()
+    noise = np.random.default_rng(0).integers(0, 255, (123, 321, 3), dtype=np.uint8)
+    Image.fromarray(noise).save(buffered, format=fmt)
+    data = buffered.getvalue()
+    # Truncated well before the end: only the header is read, nothing is decoded
+    result = probe_image(data[:2000])
+    assert len(data) > 20000
+    assert result["format"] == fmt
+    assert result["original_dims"] == result["processed_dims"] == {"width": 321, "height": 123}
+    assert result["steps_completed"] == []
+
+
+def test_probe_image_rejects_non_images():
+    with pytest.raises(InvalidImage):
+        probe_image(b"%PDF-1.4 not an image")
+
+
+def test_normalize_returns_the_processed_page():
+    page = _page()
+    rotation = cv2.getRotationMatrix2D((300, 400), 4, 1.0)
+    skewed = cv2.warpAffine(page, rotation, (600, 800), borderValue=(255, 255, 255))
+    contents = _encoded(skewed, ".jpg")
+
+    result = normalize_image(contents, "scan.jpg", return_image=True)
+    processed = cv2.imdecode(np.frombuffer(result["processed_image"], np.uint8), cv2.IMREAD_COLOR)
+    assert result["image_format"] == "png" and result["processed_image"].startswith(b"\x89PNG")
+    assert processed.shape[:2] == (result["processed_dims"]["height"], result["processed_dims"]["width"])
+    assert "deskew" in result["steps_completed"]
+    # The returned page is the processed one, not the upload re-encoded
+    original = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+    assert processed.shape != original.shape or not np.array_equal(processed, original)
+
+    assert "processed_image" not in normalize_image(contents, "scan.jpg", return_image=False)
+
+
+def test_normalize_can_skip_the_orientation_check():
+    upside_down = cv2.rotate(_page(), cv2.ROTATE_180)
+    contents = _encoded(upside_down)
+    assert "orientation" in normalize_image(contents, "page.png", return_image=False)["steps_completed"]
+    result = normalize_image(contents, "page.png", return_image=False, orientation=False)
+    assert "orientation" not in result["steps_completed"]
+    assert result["orientation"] == {"angle": 0, "confidence": 0.0}
+
+
+def test_normalize_rejects_undecodable_bytes():
+    with pytest.raises(InvalidImage):
+        normalize_image(b"not an image", "x.png", return_image=True)
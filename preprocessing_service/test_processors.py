@@ -38,6 +38,69 @@ def test_deskew():
     # but in our simple implementation we kept size same
     assert processed.shape == img.shape
 
+def rotate(image, degrees):
+    """Counter-clockwise rotation about the center, on a white background (as a skewed scan)."""
+    h, w = image.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), degrees, 1.0)
+    return cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=(255, 255, 255))
+
+def residual_skew(image):
+    """Angle (degrees) that best aligns the text lines with the rows: the sharpest horizontal projection profile."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    profile = lambda a: np.var((255 - rotate(gray, a)).sum(axis=1, dtype=np.int64))
+    return max(np.arange(-8, 8.25, 0.25), key=profile)
+
+@pytest.mark.parametrize("skew", [5.0, -5.0])
+def test_deskew_straightens_skewed_text(skew):
+    # Regression: OpenCV >= 4.5 reports minAreaRect angles in (0, 90]; a wrong fold doubles the
+    # skew or turns the page by 90 degrees instead of straightening it
+    page = rotate(create_text_page(TEXT), skew)
+    assert abs(residual_skew(page) + skew) <= 0.5 # The fixture is skewed as intended
+    processed = ImageProcessor.deskew_image(page)
+    assert processed.shape == page.shape
+    assert abs(residual_skew(processed)) <= 1.0
+
+def test_is_clean_render():
+    page = np.full((400, 300), 255, dtype=np.uint8)
+    cv2.putText(page, "Vector text", (20, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2, cv2.LINE_AA)
+    assert ImageProcessor.is_clean_render(page)
+    # Scanner noise on the paper background
+    scan = cv2.subtract(page, np.random.randint(0, 12, page.shape, dtype=np.uint8))
+    assert not ImageProcessor.is_clean_render(scan)
+
+def create_text_page(lines):
+    page = np.full((1400, 1000, 3), 255, dtype=np.uint8)
+    for i, line in enumerate(lines):
+        cv2.putText(page, line, (60, 100 + i * 55), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2, cv2.LINE_AA)
+    return page
+
+TEXT = ["Payment is due within thirty days", "of the invoice date. Please quote",
+        "your reference when paying by bank", "transfer; goods remain our property",
+        "until paid in full. Thank you for", "your order and kind regards."] * 3
+
+def test_detect_orientation():
+    page = create_text_page(TEXT)
+    # Page rotated by r clockwise -> rotation that makes it upright again
+    cases = [(None, 0), (cv2.ROTATE_90_CLOCKWISE, 270), (cv2.ROTATE_180, 180), (cv2.ROTATE_90_COUNTERCLOCKWISE, 90)]
+    for code, expected in cases:
+        rotated = page if code is None else cv2.rotate(page, code)
+        angle, confidence = ImageProcessor.detect_orientation(rotated)
+        assert angle == expected
+        assert confidence >= 0.25
+
+    upright, angle, _ = ImageProcessor.correct_orientation(cv2.rotate(page, cv2.ROTATE_90_CLOCKWISE), 0.25)
+    assert angle == 270
+    assert upright.shape == page.shape
+
+def test_correct_orientation_leaves_ambiguous_pages():
+    # Capitals and digits have no descenders: nothing tells upright from upside down
+    caps = cv2.rotate(create_text_page(["TOTAL DUE 1234.00 EUR"] * 18), cv2.ROTATE_180)
+    blank = np.full((800, 600, 3), 255, dtype=np.uint8)
+    for page in (caps, blank):
+        result, angle, confidence = ImageProcessor.correct_orientation(page, 0.25)
+        assert angle == 0 and confidence < 0.25
+        assert result is page
+
 if __name__ == "__main__":
     # Manually run if pytest not available in context
     try:
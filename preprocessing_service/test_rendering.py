@@ -0,0 +1,37 @@
+from rendering import RenderPolicy, parse_page_sizes, plan_chunks
+
+PDFINFO = """Producer:       pdfTeX
+Pages:          3
+Page    1 size: 595.276 x 841.89 pts (A4)
+Page    1 rot:  0
+Page    2 size: 2383.94 x 3370.39 pts (A0)
+Page    2 rot:  0
+Page    3 size: 612 x 792 pts (letter)
+Page    3 rot:  90
+"""
+
+def test_parse_page_sizes_handles_rotation():
+    sizes = parse_page_sizes(PDFINFO)
+    assert sizes == [(595.276, 841.89), (2383.94, 3370.39), (792.0, 612.0)]
+
+def test_policy_fits_pixel_budget():
+    policy = RenderPolicy(target_pixels=4_000_000, min_dpi=72, max_dpi=300)
+    a4 = policy.choose_dpi(595.276, 841.89)
+    assert a4 == 200
+    a0 = policy.choose_dpi(2383.94, 3370.39)
+    assert a0 == 72 # Clamped: A0 at budget would be ~50 DPI
+    assert policy.choose_dpi(100, 100) == 300 # Tiny page clamped to max
+
+def test_policy_raises_dpi_for_small_text():
+    policy = RenderPolicy(target_pixels=4_000_000, min_text_px=12)
+    # 4pt text on A4 needs 12 * 72 / 4 = 216 DPI, rounded up to the step so it stays >= 12 px
+    assert policy.choose_dpi(595.276, 841.89, min_text_pt=4.0) == 220
+    assert policy.choose_dpi(595.276, 841.89, min_text_pt=10.0) == 200
+    # Exactly on a step: not bumped to the next one
+    assert policy.choose_dpi(595.276, 841.89, min_text_pt=12 * 72 / 240) == 240
+    # Still clamped to max_dpi
+    assert policy.choose_dpi(595.276, 841.89, min_text_pt=1.0) == 300
+
+def test_plan_chunks_groups_and_splits():
+    assert plan_chunks([200, 200, 200, 200], workers=2) == [(1, 2, 200), (3, 4, 200)]
+    assert plan_chunks([200, 200, 72, 200], workers=1) == [(1, 2, 200), (3, 3, 72), (4, 4, 200)]
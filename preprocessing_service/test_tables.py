@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+from tables import SOURCE_HTML, SOURCE_LAYOUT, SOURCE_RULINGS, SOURCE_TEXT, extract_table, parse_html_table
+
+ROWS = [["Apples", "12", "3.50"], ["Pears", "7", "1.20"], ["Plums", "4", "9.99"]]
+XS = [100, 300, 500, 700]
+YS = [200, 260, 320, 380, 440]
+BBOX = {"x1": 105, "y1": 205, "x2": 695, "y2": 435}
+
+
+def _put(page, text, x, y):
+    cv2.putText(page, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 0, 2)
+
+
+def _ruled_page():
+    """3x4 ruled grid whose header row merges the last two columns."""
+    page = np.full((1000, 800), 255, np.uint8)
+    for y in YS:
+        cv2.line(page, (XS[0], y), (XS[-1], y), 0, 2)
+    for x in XS:
+        cv2.line(page, (x, YS[0]), (x, YS[-1]), 0, 2)
+    cv2.line(page, (XS[2], YS[0] + 3), (XS[2], YS[1] - 3), 255, 4)
+    _put(page, "Item", 110, 240)
+    _put(page, "Amount", 350, 240)
+    for r, row in enumerate(ROWS):
+        for c, text in enumerate(row):
+            _put(page, text, XS[c] + 10, YS[r + 1] + 40)
+    return page
+
+
+def _texts(rows):
+    return [[cell["text"] for cell in row["cells"]] for row in rows]
+
+
+def test_ruled_grid_with_spans_and_vlm_text():
+    text = "Item | Amount\n" + "\n".join(" | ".join(row) for row in ROWS)
+    table = extract_table(_ruled_page(), BBOX, text=text)
+
+    assert table["source"] == SOURCE_RULINGS
+    assert (table["rows"], table["cols"]) == (4, 3)
+    assert _texts(table["header_rows"]) == [["Item", "Amount"]]
+    assert _texts(table["body_rows"]) == ROWS
+    amount = table["header_rows"][0]["cells"][1]
+    assert amount["col_span"] == 2
+    assert amount["bounding_box"] == {"x1": 300, "y1": 200, "x2": 700, "y2": 260}
+
+
+def test_text_layer_words_go_to_the_cell_containing_them():
+    words = [
+        {"text": "Apples", "x1": 110, "y1": 270, "x2": 190, "y2": 290},
+        {"text": "(red)", "x1": 110, "y1": 295, "x2": 160, "y2": 312},
+        {"text": "3.50", "x1": 510, "y1": 280, "x2": 560, "y2": 300},
+    ]
+    table = extract_table(_ruled_page(), BBOX, words=words)
+    assert _texts(table["body_rows"])[1] == ["Apples\n(red)", "", "3.50"]
+
+
+def test_borderless_table_from_layout():
+    page = np.full((1000, 800), 255, np.uint8)
+    for r, row in enumerate([["Name", "Qty", "Price"]] + ROWS):
+        for c, text in enumerate(row):
+            _put(page, text, 100 + c * 220, 200 + r * 45)
+    text = "\n".join("\t".join(row) for row in [["Name", "Qty", "Price"]] + ROWS)
+    table = extract_table(page, {"x1": 90, "y1": 170, "x2": 660, "y2": 350}, text=text)
+
+    assert table["source"] == SOURCE_LAYOUT
+    assert _texts(table["header_rows"]) == [["Name", "Qty", "Price"]]
+    assert _texts(table["body_rows"]) == ROWS
+
+
+def test_html_spans_and_boxes_from_matching_grid():
+    html = ("<table><thead><tr><th>Item</th><th colspan='2'>Amount</th></tr></thead>"
+            + "".join("<tr>" + "".join(f"<td>{t}</td>" for t in row) + "</tr>" for row in ROWS) + "</table>")
+    table = extract_table(_ruled_page(), BBOX, html=html)
+
+    assert table["source"] == SOURCE_HTML
+    assert _texts(table["body_rows"]) == ROWS
+    assert table["header_rows"][0]["cells"][1]["bounding_box"] == {"x1": 300, "y1": 200, "x2": 700, "y2": 260}
+
+
+def test_html_rowspan_placement():
+    cells, n_rows, n_cols = parse_html_table(
+        "<tr><td rowspan=2>A</td><td>B<br>C</td></tr><tr><td>D</td></tr>")
+    assert (n_rows, n_cols) == (2, 2)
+    assert [(c.text, c.row, c.col, c.row_span) for c in cells] == [("A", 0, 0, 2), ("B\nC", 0, 1, 1), ("D", 1, 1, 1)]
+
+
+def test_text_only_when_the_image_has_no_table():
+    page = np.full((600, 600), 255, np.uint8)
+    table = extract_table(page, {"x1": 50, "y1": 50, "x2": 550, "y2": 300}, text="A | B\n1 | 2")
+    assert table["source"] == SOURCE_TEXT
+    assert table["body_rows"][0]["cells"][0]["bounding_box"] is None
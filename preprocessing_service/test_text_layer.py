@@ -0,0 +1,62 @@
+import numpy as np
+import cv2
+from text_layer import parse_bbox_layout, classify_page, layer_to_detections, TEXT_NATIVE, SCANNED, MIXED
+
+# Trimmed `pdftotext -bbox-layout` output: one page with text, one without
+BBOX_LAYOUT = b"""<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title></title></head>
+<body>
+<doc>
+  <page width="200.000000" height="100.000000">
+    <flow>
+      <block xMin="10.000000" yMin="10.000000" xMax="110.000000" yMax="40.000000">
+        <line xMin="10.000000" yMin="10.000000" xMax="110.000000" yMax="20.000000">
+          <word xMin="10.000000" yMin="10.000000" xMax="50.000000" yMax="20.000000">Invoice</word>
+          <word xMin="55.000000" yMin="10.000000" xMax="110.000000" yMax="20.000000">#1024</word>
+        </line>
+        <line xMin="10.000000" yMin="30.000000" xMax="100.000000" yMax="40.000000">
+          <word xMin="10.000000" yMin="30.000000" xMax="40.000000" yMax="40.000000">Total</word>
+          <word xMin="45.000000" yMin="30.000000" xMax="70.000000" yMax="40.000000">&amp;</word>
+          <word xMin="75.000000" yMin="30.000000" xMax="100.000000" yMax="40.000000">tax</word>
+        </line>
+      </block>
+    </flow>
+  </page>
+  <page width="200.000000" height="100.000000">
+  </page>
+</doc>
+</body>
+</html>
+"""
+
+def render(layer, extra_ink=False):
+    """Draws word boxes as ink on a 2x raster, optionally with a 'figure'."""
+    gray = np.full((200, 400), 255, dtype=np.uint8)
+    for w in layer.words:
+        cv2.rectangle(gray, (int(w.x1 * 2), int(w.y1 * 2)), (int(w.x2 * 2) - 1, int(w.y2 * 2) - 1), 0, -1)
+    if extra_ink:
+        cv2.rectangle(gray, (250, 100), (380, 190), 0, -1)
+    return gray
+
+def test_parse_bbox_layout():
+    pages = parse_bbox_layout(BBOX_LAYOUT)
+    assert len(pages) == 2
+    assert pages[0].width == 200.0 and pages[0].height == 100.0
+    assert len(pages[0].words) == 5
+    assert pages[0].blocks[0].text == "Invoice #1024\nTotal & tax"
+    assert pages[1].blocks == []
+
+def test_classify_page():
+    page, empty = parse_bbox_layout(BBOX_LAYOUT)
+    assert classify_page(page, render(page))[0] == TEXT_NATIVE
+    assert classify_page(page, render(page, extra_ink=True))[0] == MIXED
+    assert classify_page(empty, render(empty))[0] == SCANNED
+    assert classify_page(None, render(empty))[0] == SCANNED
+
+def test_layer_to_detections_scales_to_pixels():
+    page = parse_bbox_layout(BBOX_LAYOUT)[0]
+    detections = layer_to_detections(page, 400, 200)
+    assert len(detections) == 1
+    assert detections[0]["bbox"] == {"x1": 20.0, "y1": 20.0, "x2": 220.0, "y2": 80.0}
+    assert detections[0]["attributes"]["text"].startswith("Invoice")
@@ -0,0 +1,171 @@
+import os
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Page classes for the born-digital fast path
+TEXT_NATIVE = "text_native" # Usable text layer, no significant imagery: no VLM call needed
+SCANNED = "scanned"         # No (or negligible) text layer: VLM
+MIXED = "mixed"             # Text layer plus figures/images/handwriting outside it: VLM
+
+
+@dataclass
+class Word:
+    text: str
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+
+
+@dataclass
+class Line:
+    words: List[Word]
+    bbox: Tuple[float, float, float, float]
+
+    @property
+    def text(self) -> str:
+        return " ".join(w.text for w in self.words)
+
+
+@dataclass
+class TextBlock:
+    lines: List[Line]
+    bbox: Tuple[float, float, float, float]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines)
+
+
+@dataclass
+class PageTextLayer:
+    """Text layer of one PDF page. Coordinates are PDF points, origin top-left."""
+    page_number: int
+    width: float
+    height: float
+    blocks: List[TextBlock] = field(default_factory=list)
+
+    @property
+    def words(self) -> List[Word]:
+        return [w for b in self.blocks for line in b.lines for w in line.words]
+
+
+def _tag(element) -> str:
+    return element.tag.rsplit("}", 1)[-1]
+
+
+def _box(element) -> Tuple[float, float, float, float]:
+    return tuple(float(element.get(k)) for k in ("xMin", "yMin", "xMax", "yMax"))
+
+
+def parse_bbox_layout(xhtml: bytes) -> List[PageTextLayer]:
+    """Parses `pdftotext -bbox-layout` XHTML (doc > page > flow > block > line > word)."""
+    root = ET.fromstring(xhtml)
+    pages = []
+    for page_el in root.iter():
+        if _tag(page_el) != "page":
+            continue
+        page = PageTextLayer(len(pages) + 1, float(page_el.get("width")), float(page_el.get("height")))
+        for block_el in page_el.iter():
+            if _tag(block_el) != "block":
+                continue
+            lines = []
+            for line_el in block_el:
+                if _tag(line_el) != "line":
+                    continue
+                words = [Word((w.text or "").strip(), *_box(w)) for w in line_el if _tag(w) == "word"]
+                words = [w for w in words if w.text]
+                if words:
+                    lines.append(Line(words, _box(line_el)))
+            if lines:
+                page.blocks.append(TextBlock(lines, _box(block_el)))
+        pages.append(page)
+    return pages
+
+
+def extract_text_layer(pdf_bytes: bytes, timeout: float = 60.0) -> List[PageTextLayer]:
+    """
+    Extracts words/lines/blocks with positions from the PDF text layer using
+    poppler's pdftotext (same poppler install pdf2image already requires).
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(pdf_bytes)
+        path = tmp.name
+    try:
+        out = subprocess.run(
+            ["pdftotext", "-bbox-layout", "-enc", "UTF-8", path, "-"],
+            capture_output=True, timeout=timeout, check=True,
+        ).stdout
+    finally:
+        os.remove(path)
+    return parse_bbox_layout(out)
+
+
+def min_text_height(layer: PageTextLayer, quantile: float = 0.1) -> Optional[float]:
+    """Small-text height (pt) on the page: a low quantile of word heights, robust to stray super/subscripts."""
+    heights = sorted(w.y2 - w.y1 for w in layer.words if w.y2 > w.y1)
+    if not heights:
+        return None
+    return heights[int(quantile * (len(heights) - 1))]
+
+
+def non_text_ink_ratio(layer: PageTextLayer, gray: np.ndarray, ink_threshold: int = 160, pad: int = 2) -> float:
+    """
+    Fraction of the page covered by ink that is NOT explained by the text layer
+    (figures, photos, stamps, handwriting, or a scanned image under an OCR layer).
+    gray is the rendered page (any resolution) as a 2D uint8 array.
+    """
+    h, w = gray.shape[:2]
+    ink = gray < ink_threshold
+    sx, sy = w / layer.width, h / layer.height
+    for word in layer.words:
+        x1, y1 = max(0, int(word.x1 * sx) - pad), max(0, int(word.y1 * sy) - pad)
+        x2, y2 = min(w, int(word.x2 * sx) + pad + 1), min(h, int(word.y2 * sy) + pad + 1)
+        ink[y1:y2, x1:x2] = False
+    return float(ink.mean())
+
+
+def classify_page(layer: Optional[PageTextLayer], gray: np.ndarray,
+                  min_words: int = 5, max_non_text_ink: float = 0.02) -> Tuple[str, Dict[str, float]]:
+    """Classifies a page as text_native, scanned or mixed. Returns (page_type, stats)."""
+    word_count = len(layer.words) if layer else 0
+    if word_count < min_words:
+        return SCANNED, {"words": word_count}
+    ratio = non_text_ink_ratio(layer, gray)
+    page_type = MIXED if ratio > max_non_text_ink else TEXT_NATIVE
+    return page_type, {"words": word_count, "non_text_ink": round(ratio, 4)}
+
+
+def layer_to_detections(layer: PageTextLayer, width: int, height: int) -> List[Dict]:
+    """
+    Builds detections (same shape as visual_service /detect/layout) from the
+    text layer, scaled from PDF points to the rendered image's pixels.
+    """
+    sx, sy = width / layer.width, height / layer.height
+    detections = []
+    for block in layer.blocks:
+        x1, y1, x2, y2 = block.bbox
+        detections.append({
+            "label": "text",
+            "confidence": 1.0,
+            "bbox": {"x1": x1 * sx, "y1": y1 * sy, "x2": x2 * sx, "y2": y2 * sy},
+            "attributes": {
+                "text": block.text,
+                "source": "text_layer"
+            }
+        })
+    return detections
+
+
+def layer_to_words(layer: PageTextLayer, width: int, height: int) -> List[Dict]:
+    """Text-layer words scaled from PDF points to the rendered image's pixels."""
+    sx, sy = width / layer.width, height / layer.height
+    return [
+        {"text": w.text, "x1": w.x1 * sx, "y1": w.y1 * sy, "x2": w.x2 * sx, "y2": w.y2 * sy}
+        for w in layer.words
+    ]
@@ -0,0 +1,209 @@
+"""
+Per-page overhead of the two deployment modes (DEPLOYMENT_MODE).
+
+Runs --pages synthetic page PNGs (text lines and a ruled table) through the
+orchestrator's per-page calls: visual analysis, table structure and, with
+--normalize, denoise/deskew first. The VLM is stubbed out with a canned
+response, so what is left is the CPU work plus the cost of getting pages to it:
+
+    direct     the library functions called inline: the work itself, no transport
+    embedded   EmbeddedBackend: CPU steps on the local process pool, pages as bytes
+    services   ServicesBackend against the preprocessing and visual services
+               started with uvicorn on spare ports (multipart + base64 over HTTP)
+
+Reports the median ms/page for each mode, its overhead over direct and the
+throughput with --concurrency pages in flight. Run from the repository root
+with the requirements of all three services installed.
+
+Usage:
+    python scripts/benchmark_deployment.py
+    python scripts/benchmark_deployment.py --pages 50 --concurrency 4 --width 1700 --height 2200
+    python scripts/benchmark_deployment.py --normalize --pages 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import cv2
+import httpx
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from common.config import settings
+from common.deadline import Deadline
+
+PORTS = {"preprocessing_service": 18201, "visual_service": 18202}
+NO_DEADLINE = Deadline(None)
+# Canned VLM output (json-v1, 0-1000 coordinates): a title and the table drawn by make_page
+RESPONSE = ('[{"type": "title", "bbox": [60, 30, 700, 80], "text": "Invoice"},'
+            ' {"type": "table", "bbox": [60, 500, 940, 900], "text": "Item | Qty | Amount"}]')
+
+
+class StubClient:
+    """Stands in for FireworksClient: canned response, no network."""
+
+    async def analyze_image_with_usage(self, prompt, base64_image, priority=None, model=None, timeout=None):
+        return RESPONSE, {"prompt_tokens": 1000, "completion_tokens": 50}
+
+
+def make_page(rng: random.Random, width: int, height: int) -> bytes:
+    """PNG of a page with text lines and a ruled 3-column table."""
+    page = np.full((height, width, 3), 255, np.uint8)
+    scale = width / 1700
+    cv2.putText(page, "Invoice " + str(rng.randrange(10**6)), (int(100 * scale), int(120 * scale)),
+                cv2.FONT_HERSHEY_DUPLEX, 2.0 * scale, (0, 0, 0), 3)
+    for i in range(12):
+        y = int((220 + i * 50) * scale)
+        cv2.putText(page, " ".join(str(rng.randrange(10**5)) for _ in range(8)), (int(100 * scale), y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0 * scale, (0, 0, 0), 2)
+    x1, x2, y1, y2 = int(0.06 * width), int(0.94 * width), int(0.5 * height), int(0.9 * height)
+    for y in np.linspace(y1, y2, 9).astype(int):
+        cv2.line(page, (x1, y), (x2, y), (0, 0, 0), 2)
+    for x in np.linspace(x1, x2, 4).astype(int):
+        cv2.line(page, (x, y1), (x, y2), (0, 0, 0), 2)
+    return cv2.imencode(".png", page)[1].tobytes()
+
+
+class DirectBackend:
+    """The backends' page calls, run inline on the event loop: the floor both modes are measured against."""
+
+    async def normalize(self, client, contents, filename, content_type, deadline):
+        from preprocessing_service.operations import normalize_image
+        return normalize_image(contents, filename, True)
+
+    async def tables(self, client, contents, specs, words, deadline):
+        from preprocessing_service.operations import extract_tables
+        return extract_tables(contents, specs, words)["tables"]
+
+    async def detect(self, client, contents, priority, complexity, deadline, tried):
+        from visual_service.analysis import analyze_page
+        from visual_service.protocols import get_protocol
+        return await analyze_page(contents, get_protocol(settings.VLM_OUTPUT_PROTOCOL), priority=priority)
+
+
+async def process_page(backend, client, png: bytes, normalize: bool):
+    if normalize:
+        png = (await backend.normalize(client, png, "page.png", "image/png", NO_DEADLINE))["processed_image"]
+    detections = (await backend.detect(client, png, "batch", None, NO_DEADLINE, set()))["detections"]
+    specs = [{"bbox": d["bbox"], "text": d["attributes"].get("text", ""), "html": ""}
+             for d in detections if d["label"] == "table"]
+    await backend.tables(client, png, specs, None, NO_DEADLINE)
+
+
+async def run(backend, pages, normalize: bool, concurrency: int):
+    """Returns (per-page seconds, wall seconds) after two untimed warm-up pages."""
+    slots = asyncio.Semaphore(concurrency)
+    timings = []
+    async with httpx.AsyncClient() as client:
+        for png in pages[:2]:
+            await process_page(backend, client, png, normalize)
+
+        async def timed(png):
+            async with slots:
+                start = time.perf_counter()
+                await process_page(backend, client, png, normalize)
+                timings.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(png) for png in pages))
+        return timings, time.perf_counter() - started
+
+
+def serve(service: str, port: int):
+    """Child process: runs one service with the VLM stubbed out."""
+    import uvicorn
+    import visual_service.analysis
+    visual_service.analysis._client = StubClient()
+    module = __import__(f"{service}.main", fromlist=["app"])
+    uvicorn.run(module.app, port=port, log_level="warning")
+
+
+def start_services(timeout: float = 120.0):
+    procs = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", service],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy())
+        for service in PORTS
+    ]
+    started = time.perf_counter()
+    for port in PORTS.values():
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"service on port {port} not ready after {timeout}s")
+            time.sleep(0.1)
+    return procs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--width", type=int, default=1700)
+    parser.add_argument("--height", type=int, default=2200)
+    parser.add_argument("--normalize", action="store_true", help="Denoise/deskew every page first (slow)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Pages in flight")
+    parser.add_argument("--workers", type=int, default=4, help="EMBEDDED_CPU_WORKERS")
+    parser.add_argument("--modes", nargs="+", default=["direct", "embedded", "services"],
+                        choices=["direct", "embedded", "services"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", choices=list(PORTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Log output is not what is being measured, in any process
+    os.environ["LOG_LEVEL"] = settings.LOG_LEVEL = "WARNING"
+    if args.serve:
+        serve(args.serve, PORTS[args.serve])
+        return
+
+    import visual_service.analysis
+    from common.logger import configure_logger
+    from orchestrator.backends import EmbeddedBackend, ServicesBackend
+    configure_logger("benchmark")
+    visual_service.analysis._client = StubClient()
+    settings.EMBEDDED_CPU_WORKERS = args.workers
+    settings.PREPROCESSING_ENDPOINTS = f"127.0.0.1:{PORTS['preprocessing_service']}"
+    settings.VISUAL_ENDPOINTS = f"127.0.0.1:{PORTS['visual_service']}"
+
+    rng = random.Random(args.seed)
+    pages = [make_page(rng, args.width, args.height) for _ in range(args.pages)]
+    print(f"{args.pages} pages {args.width}x{args.height} ({statistics.mean(map(len, pages)) / 1024:.0f} KB PNG), "
+          f"steps: {'normalize, ' if args.normalize else ''}detect (stubbed VLM), tables; concurrency {args.concurrency}")
+    print(f"{'mode':<10} {'ms/page':>9} {'overhead':>9} {'pages/s':>8}")
+
+    floor = None
+    for mode in args.modes:
+        procs = []
+        if mode == "direct":
+            backend = DirectBackend()
+        elif mode == "embedded":
+            backend = EmbeddedBackend()
+            backend.warm_up_workers() # Otherwise the timed pages pay for starting the worker processes
+        else:
+            procs = start_services()
+            backend = ServicesBackend()
+        try:
+            timings, wall = asyncio.run(run(backend, pages, args.normalize, args.concurrency))
+        finally:
+            if mode == "embedded":
+                backend.close()
+            for proc in procs:
+                proc.terminate()
+                proc.wait()
+        per_page = statistics.median(timings) * 1000
+        if mode == "direct":
+            floor = per_page
+        overhead = f"{per_page - floor:+.1f}" if floor is not None else "-"
+        print(f"{mode:<10} {per_page:>9.1f} {overhead:>9} {len(pages) / wall:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Entity extraction throughput on synthetic invoice-like pages.
+
+Builds a dictionary of --terms entries (plus a few real ones), generates
+--pages pages of ~3,000 characters (lines of ~70) with dates, amounts, IBANs, invoice
+numbers, emails and dictionary terms mixed into filler text, and reports
+pages/sec and characters/sec of EntityExtractor on one core.
+
+Usage:
+    python scripts/benchmark_entities.py
+    python scripts/benchmark_entities.py --pages 5000 --terms 20000 --density 0.08
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from common.entities import EntityExtractor
+
+WORDS = ("the of and to in for on with by from as at this that payment total due services "
+         "delivery order customer account reference period amount net tax quantity unit price").split()
+SNIPPETS = [
+    "Invoice No: INV-{n:06d}",
+    "Date: {d:02d}.{m:02d}.2024",
+    "Due {month} {d}, 2024",
+    "Total EUR {a:,}.{c:02d}",
+    "Amount due: ${a:,}.{c:02d}",
+    "IBAN DE89 3704 0044 0532 0130 00",
+    "billing{n}@example.com",
+    "{term}",
+]
+MONTHS = ["January", "March", "May", "July", "October", "December"]
+
+
+def make_terms(count: int, rng: random.Random) -> dict:
+    vendors = {f"vendor {i} {rng.choice(WORDS)} gmbh": f"Vendor {i}" for i in range(count)}
+    vendors["ACME Corporation"] = "ACME Corporation"
+    return {"vendor": vendors, "country": ["Germany", "France", "United States", "United Kingdom"]}
+
+
+def make_page(rng: random.Random, terms: list, density: float, chars: int = 3000) -> str:
+    """Lines of ~70 characters in blocks of a few lines, like the text the pipeline assembles from blocks."""
+    lines, line, size = [], [], 0
+    while size < chars:
+        if rng.random() < density:
+            part = rng.choice(SNIPPETS).format(
+                n=rng.randrange(10**6), d=rng.randint(1, 28), m=rng.randint(1, 12), month=rng.choice(MONTHS),
+                a=rng.randrange(10**6), c=rng.randrange(100), term=rng.choice(terms))
+        else:
+            part = rng.choice(WORDS)
+        line.append(part)
+        size += len(part) + 1
+        if sum(len(p) + 1 for p in line) > 70:
+            lines.append(" ".join(line) + ("\n" if rng.random() < 0.2 else ""))
+            line = []
+    lines.append(" ".join(line))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--terms", type=int, default=10000, help="Dictionary size")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--density", type=float, default=0.03, help="Share of tokens that are entity snippets")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    dictionaries = make_terms(args.terms, rng)
+    terms = list(dictionaries["vendor"]) + dictionaries["country"]
+
+    start = time.perf_counter()
+    extractor = EntityExtractor(dictionaries)
+    build_ms = (time.perf_counter() - start) * 1000
+    pages = [make_page(rng, terms, args.density) for _ in range(args.pages)]
+    chars = sum(len(p) for p in pages)
+
+    timings, found = [], 0
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        found = sum(len(extractor.extract(page)) for page in pages)
+        timings.append(time.perf_counter() - start)
+
+    best = min(timings)
+    print(f"dictionary: {len(terms)} terms, automaton built in {build_ms:.0f} ms")
+    print(f"pages: {len(pages)} ({chars / len(pages):.0f} chars/page), entities/page: {found / len(pages):.1f}")
+    print(f"best of {args.runs}: {len(pages) / best:,.0f} pages/s, {chars / best / 1e6:.1f} M chars/s "
+          f"(mean {statistics.mean(timings) * 1000 / len(pages):.3f} ms/page)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Logging overhead per request, per service. Three modes:
+  sync    rendering + stdout writes on the caller (LOG_ASYNC=false), no rate limit
+  async   queue + background writer (LOG_ASYNC=true), no rate limit
+  limited async with the default per-event rate limit (LOG_RATE_LIMIT)
+
+Each service's request is simulated by the log calls its handlers make
+(page events, raw VLM output at DEBUG, render stats, warnings). Requests are
+separated by a short sleep standing in for the request's own I/O wait, which
+is when the background writer gets to run. Every (service, mode) pair runs
+in a fresh interpreter with stdout going to a temporary file, like a
+container log. Reported: time spent inside the log calls per request (what
+the handler pays) and the records written.
+
+Usage:
+    python scripts/benchmark_logging.py
+    python scripts/benchmark_logging.py --requests 2000 --services orchestrator visual_service
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+SERVICES = ["orchestrator", "visual_service", "preprocessing_service"]
+RAW_RESPONSE = json.dumps([{"type": "text", "bbox": [10, 20, 300, 40], "text": "Lorem ipsum dolor sit amet " * 4}] * 60)
+
+
+def simulate_request(service: str, log, request: int):
+    """The log calls one request makes in each service."""
+    if service == "orchestrator":
+        pages = 8
+        log.info(f"Job {request}: Detected PDF. converting to images...")
+        log.info(f"Job {request}: Sending {pages} pages to Visual Intelligence in parallel...")
+        for page in range(1, pages + 1):
+            log.debug(f"Page {page} base64 length: {1_400_000 + page}")
+            if page == 3:
+                try:
+                    raise TimeoutError("visual replica timed out")
+                except TimeoutError as e:
+                    log.warning(f"Visual analysis attempt 1 failed for page {page}: {repr(e)}")
+        log.info(f"Job {request}: stored", pages=pages, took_ms=1234.5)
+    elif service == "visual_service":
+        log.info("Detection request", filename=f"page_{request}.png", priority="interactive")
+        log.debug("Raw Fireworks response", response=RAW_RESPONSE)
+        log.info("VLM call", latency_ms=2345.6, prompt_tokens=1800, completion_tokens=2400, regions=60)
+    else:
+        log.info("Starting Denoising...")
+        log.info("Starting Deskewing...")
+        log.info(f"Rendered {4} pages", render=[(200, 180.5, 3_900_000)] * 4)
+
+
+def worker(service: str, mode: str, requests: int, gap_ms: float, result_path: str):
+    from common.config import settings
+    settings.ENV = "prod"
+    settings.LOG_ASYNC = mode != "sync"
+    if mode != "limited":
+        settings.LOG_RATE_LIMIT = 0
+    from common import logger as logger_module
+    log = logger_module.configure_logger(service)
+
+    for i in range(50): # Warm-up: structlog caches the bound logger on first use
+        simulate_request(service, log, i)
+    in_logging = 0.0
+    for i in range(requests):
+        started = time.perf_counter()
+        simulate_request(service, log, i)
+        in_logging += time.perf_counter() - started
+        time.sleep(gap_ms / 1000)
+    dropped = getattr(logger_module._handler, "dropped", 0)
+    logger_module.flush_logs()
+    with open(result_path, "w") as f:
+        json.dump({"caller_us": in_logging / requests * 1e6, "dropped": dropped}, f)
+
+
+def run(service: str, mode: str, requests: int, gap_ms: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        log_path = os.path.join(tmp, "stdout.log")
+        with open(log_path, "w") as out:
+            subprocess.run([sys.executable, __file__, "--worker", service, mode, str(requests), str(gap_ms), result_path],
+                           stdout=out, check=True, cwd=os.getcwd())
+        with open(result_path) as f:
+            result = json.load(f)
+        with open(log_path) as f:
+            result["lines"] = sum(1 for _ in f)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--services", nargs="+", default=SERVICES, choices=SERVICES)
+    parser.add_argument("--gap-ms", type=float, default=1.0, help="Idle time between requests")
+    parser.add_argument("--worker", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        service, mode, requests, gap_ms, result_path = args.worker
+        worker(service, mode, int(requests), float(gap_ms), result_path)
+        return
+
+    print(f"{'service':<24} {'mode':<8} {'us/req in logging':>18} {'lines written':>14} {'queue drops':>12}")
+    for service in args.services:
+        for mode in ("sync", "async", "limited"):
+            r = run(service, mode, args.requests, args.gap_ms)
+            print(f"{service:<24} {mode:<8} {r['caller_us']:>18.1f} {r['lines']:>14} {r['dropped']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Orientation detection speed and accuracy on rotated synthetic pages.
+
+Renders --pages text pages (A4 at 300 DPI by default: paragraphs, a heading,
+a table-like block of numbers, scanner noise), rotates each by 0, 90, 180 and
+270 degrees clockwise, and checks that ImageProcessor.detect_orientation
+returns the rotation that undoes it. Reports accuracy, the confidence spread
+and ms/page (detection only; decode/encode excluded).
+
+Usage:
+    python scripts/benchmark_orientation.py
+    python scripts/benchmark_orientation.py --pages 50 --width 1700 --height 2200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.getcwd(), "preprocessing_service"))
+
+from processors import ImageProcessor
+
+WORDS = ("the invoice total amount payable within thirty days of delivery please quote our reference "
+         "when paying goods remain our property until paid in full bank transfer only quantity "
+         "unit price description shipping handling applicable law jurisdiction signed by").split()
+# Rotation applied to the fixture -> rotation that makes it upright again
+ROTATE = {0: None, 90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+UNDO = {0: 0, 90: 270, 180: 180, 270: 90}
+
+
+def make_page(rng: random.Random, width: int, height: int) -> np.ndarray:
+    scale = width / 2480 # Font sizes are relative to A4 at 300 DPI
+    page = np.full((height, width), 255, np.uint8)
+    margin, y = int(200 * scale), int(260 * scale)
+    cv2.putText(page, "Invoice " + str(rng.randrange(10**6)), (margin, y), cv2.FONT_HERSHEY_DUPLEX,
+                3.0 * scale, 0, max(1, int(5 * scale)), cv2.LINE_AA)
+    y += int(160 * scale)
+    line_height = int(rng.choice([60, 70, 85]) * scale)
+    font_scale = 1.4 * scale * line_height / (70 * scale)
+    while y < height - margin:
+        if rng.random() < 0.15: # Block of numbers
+            for _ in range(rng.randint(2, 5)):
+                row = "   ".join(f"{rng.randrange(10**4)}.{rng.randrange(100):02d}" for _ in range(5))
+                cv2.putText(page, row, (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, max(1, int(3 * scale)), cv2.LINE_AA)
+                y += line_height
+        else:
+            for _ in range(rng.randint(3, 8)):
+                words, x = [], margin
+                while True:
+                    word = rng.choice(WORDS)
+                    x += int(len(word) * 30 * scale * font_scale / (1.4 * scale)) + int(30 * scale)
+                    if x > width - margin:
+                        break
+                    words.append(word)
+                text = " ".join(words)
+                cv2.putText(page, text[0].upper() + text[1:], (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale,
+                            0, max(1, int(3 * scale)), cv2.LINE_AA)
+                y += line_height
+        y += line_height
+    noise = np.random.default_rng(rng.randrange(2**32)).integers(0, 25, page.shape, dtype=np.uint8)
+    return cv2.cvtColor(cv2.subtract(page, noise), cv2.COLOR_GRAY2BGR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--width", type=int, default=2480)
+    parser.add_argument("--height", type=int, default=3508)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [make_page(rng, args.width, args.height) for _ in range(args.pages)]
+    ImageProcessor.detect_orientation(pages[0]) # Warm-up
+
+    timings, correct, confidences, misses = [], 0, [], []
+    for i, page in enumerate(pages):
+        for rotation, code in ROTATE.items():
+            fixture = page if code is None else cv2.rotate(page, code)
+            start = time.perf_counter()
+            angle, confidence = ImageProcessor.detect_orientation(fixture)
+            timings.append(time.perf_counter() - start)
+            confidences.append(confidence)
+            if angle == UNDO[rotation]:
+                correct += 1
+            else:
+                misses.append((i, rotation, angle, confidence))
+
+    total = len(timings)
+    print(f"fixtures: {args.pages} pages x 4 rotations, {args.width}x{args.height}")
+    print(f"accuracy: {correct}/{total} ({correct / total:.1%})")
+    print(f"confidence: min {min(confidences):.2f}, median {statistics.median(confidences):.2f}")
+    print(f"time: median {statistics.median(timings) * 1000:.1f} ms/page, max {max(timings) * 1000:.1f} ms")
+    for page, rotation, angle, confidence in misses[:10]:
+        print(f"  miss: page {page} rotated {rotation}, detected {angle} (confidence {confidence:.2f})")
+
+
+if __name__ == "__main__":
+    main()
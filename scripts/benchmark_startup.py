@@ -0,0 +1,80 @@
+"""
+Startup benchmark: import time, time-to-live (/health) and time-to-ready (/ready)
+for each backend service.
+
+Each service is started with uvicorn from the repository root on a spare port;
+the script polls /health and /ready until both return 200, then stops it.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --services preprocessing_service visual_service --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import requests
+
+SERVICES = {
+    "preprocessing_service": 18101,
+    "visual_service": 18102,
+    "orchestrator": 18100,
+}
+
+
+def import_time(service: str) -> float:
+    """Seconds for a fresh interpreter to import the service module."""
+    code = f"import time; t = time.perf_counter(); import {service}.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not OK after {timeout}s")
+
+
+def start_to_ready(service: str, port: int, timeout: float):
+    """Returns (time_to_live, time_to_ready) in seconds."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{service}.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy(),
+    )
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/health", started, timeout)
+        ready = wait_for(f"http://127.0.0.1:{port}/ready", started, timeout)
+        return live, ready
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", default=list(SERVICES), choices=list(SERVICES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print(f"{'service':<24} {'import_s':>9} {'live_s':>8} {'ready_s':>8}")
+    for service in args.services:
+        imports, lives, readies = [], [], []
+        for _ in range(args.runs):
+            imports.append(import_time(service))
+            live, ready = start_to_ready(service, SERVICES[service], args.timeout)
+            lives.append(live)
+            readies.append(ready)
+        print(f"{service:<24} {statistics.median(imports):>9.3f} {statistics.median(lives):>8.3f} {statistics.median(readies):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares VLM output protocols (json-v1 vs compact-v1) on real pages.
+
+Sends each image to a running Visual Service once per protocol and reports
+completion tokens, VLM latency and parse time per page.
+
+Usage:
+    python scripts/benchmark_vlm_protocols.py examples/sample_invoice.jpg examples/test.png --runs 3
+"""
+import argparse
+import mimetypes
+import os
+import statistics
+import requests
+
+VISUAL_URL = "http://localhost:8002/detect/layout"
+PROTOCOLS = ["json-v1", "compact-v1"]
+
+
+def run_once(path: str, protocol: str, url: str) -> dict:
+    content_type = mimetypes.guess_type(path)[0] or "image/png"
+    with open(path, "rb") as f:
+        files = {"file": (os.path.basename(path), f, content_type)}
+        resp = requests.post(url, params={"protocol": protocol}, files=files, timeout=300)
+    resp.raise_for_status()
+    data = resp.json()
+    metrics = data.get("metrics", {})
+    metrics["regions"] = len(data.get("detections", []))
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--url", default=VISUAL_URL)
+    args = parser.parse_args()
+
+    print(f"{'page':<28} {'protocol':<12} {'regions':>8} {'out_tok':>8} {'in_tok':>8} {'vlm_ms':>9} {'parse_ms':>9}")
+    totals = {p: {"completion_tokens": [], "latency_ms": []} for p in PROTOCOLS}
+
+    for path in args.images:
+        for protocol in PROTOCOLS:
+            runs = [run_once(path, protocol, args.url) for _ in range(args.runs)]
+            out_tok = statistics.mean(r.get("completion_tokens") or 0 for r in runs)
+            in_tok = statistics.mean(r.get("prompt_tokens") or 0 for r in runs)
+            latency = statistics.mean(r["latency_ms"] for r in runs)
+            parse_ms = statistics.mean(r["parse_ms"] for r in runs)
+            regions = statistics.mean(r["regions"] for r in runs)
+            totals[protocol]["completion_tokens"].append(out_tok)
+            totals[protocol]["latency_ms"].append(latency)
+            print(f"{os.path.basename(path)[:28]:<28} {protocol:<12} {regions:>8.1f} {out_tok:>8.0f} {in_tok:>8.0f} {latency:>9.0f} {parse_ms:>9.2f}")
+
+    print()
+    for protocol, t in totals.items():
+        print(f"{protocol:<12} mean completion tokens/page: {statistics.mean(t['completion_tokens']):.0f}, "
+              f"mean latency/page: {statistics.mean(t['latency_ms']):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
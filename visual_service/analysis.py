@@ -0,0 +1,114 @@
+"""
+Visual analysis of one page as a library call: prompt, VLM call, response
+parsing and model routing/fallback. /detect/layout wraps it in HTTP; the
+orchestrator's embedded mode (DEPLOYMENT_MODE=embedded) calls it directly
+with the page bytes.
+"""
+import asyncio
+import base64
+import io
+import time
+from typing import Optional, Tuple
+
+import structlog
+
+from common.config import settings
+from common.deadline import Deadline
+from common.rate_limiter import parse_priority
+from visual_service.protocols import get_protocol
+
+# PIL and the OpenAI SDK (via FireworksClient) are imported lazily so that
+# importing this module stays cheap.
+
+logger = structlog.get_logger(service_name="visual_service")
+
+# Output protocol of the retry on FIREWORKS_MODEL when a routed model's output does not parse
+FALLBACK_PROTOCOL = "json-v1"
+
+_client = None
+
+
+class InvalidImage(ValueError):
+    def __init__(self, message: str = "Invalid image file"):
+        super().__init__(message)
+
+
+def get_client():
+    """Creates the Fireworks client on first use."""
+    global _client
+    if _client is None:
+        from common.fireworks_client import FireworksClient
+        _client = FireworksClient()
+    return _client
+
+
+def image_size(contents: bytes) -> Tuple[int, int]:
+    """(width, height) from the image header; raises InvalidImage."""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(contents)) as image:
+            return image.size
+    except Exception as e:
+        logger.error(f"Failed to load image: {e}")
+        raise InvalidImage()
+
+
+def encode_page(contents: bytes) -> Tuple[int, int, str]:
+    """(width, height, base64) of a page image for the VLM request; raises InvalidImage."""
+    width, height = image_size(contents)
+    return width, height, base64.b64encode(contents).decode('utf-8')
+
+
+async def analyze_page(contents: bytes, vlm_protocol, priority: Optional[str] = None,
+                       complexity: Optional[str] = None, deadline: Deadline = Deadline(None)) -> dict:
+    """
+    Layout + OCR for a single page image (PNG/JPEG bytes) with a protocol
+    from visual_service.protocols.get_protocol:
+    {"detections", "metrics", "routing"}, boxes in the image's pixel space.
+    complexity selects the model via VLM_ROUTES; output of a routed model that
+    fails to parse is retried on FIREWORKS_MODEL with the JSON protocol
+    (FALLBACK_PROTOCOL). Raises InvalidImage, DeadlineExceeded or the
+    client/parser error.
+    """
+    # Off the event loop: header decode and a base64 copy of the whole page
+    width, height, base64_img = await asyncio.to_thread(encode_page, contents)
+
+    # Route by page complexity; unlisted classes (or no hint) go to the default large model
+    large_model = settings.FIREWORKS_MODEL
+    model = settings.VLM_ROUTES.get(complexity or "", large_model)
+    routing = {"complexity": complexity, "model": model, "fallback": False}
+
+    async def run_vlm(model_name: str, protocol):
+        started = time.perf_counter()
+        response_text, usage = await get_client().analyze_image_with_usage(prompt=protocol.prompt, base64_image=base64_img,
+                                                                     priority=parse_priority(priority), model=model_name,
+                                                                     timeout=deadline.remaining())
+        latency_ms = (time.perf_counter() - started) * 1000
+        logger.debug("Raw Fireworks response", response=response_text)
+
+        parse_started = time.perf_counter()
+        results = protocol.parse(response_text, width, height)
+        parse_ms = (time.perf_counter() - parse_started) * 1000
+        return results, usage, latency_ms, parse_ms
+
+    try:
+        results, usage, latency_ms, parse_ms = await run_vlm(model, vlm_protocol)
+    except (ValueError, TypeError) as e:
+        # Unparseable output (json.JSONDecodeError is a ValueError): retry on the large model,
+        # in the format the default model is prompted with and followed most reliably
+        if model == large_model:
+            raise
+        logger.warning(f"Output of {model} failed to parse ({e}), falling back to {large_model}")
+        vlm_protocol = get_protocol(FALLBACK_PROTOCOL)
+        routing.update(model=large_model, fallback=True)
+        results, usage, latency_ms, parse_ms = await run_vlm(large_model, vlm_protocol)
+
+    metrics = {
+        "protocol": vlm_protocol.version,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "latency_ms": round(latency_ms, 1),
+        "parse_ms": round(parse_ms, 2),
+    }
+    logger.info(f"Parsed {len(results)} regions.", **metrics, **routing)
+    return {"detections": results, "metrics": metrics, "routing": routing}
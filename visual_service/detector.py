@@ -1,4 +1,3 @@
-from paddleocr import LayoutDetection
 import logging
 import numpy as np
 import cv2
@@ -13,6 +12,8 @@ class ObjectDetector:
         uses its own internal config/weights management (usually PP-Structure).
         """
         try:
+            # Imported here: paddleocr takes seconds to import and is only needed once a detector is built
+            from paddleocr import LayoutDetection
             logger.info("Loading PaddleOCR LayoutDetection model...")
             # Initialize the model as per L6.ipynb
             self.model = LayoutDetection()
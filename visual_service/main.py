@@ -1,109 +1,92 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Header
+from fastapi.responses import JSONResponse
 import uvicorn
 import io
 import base64
-import json
+from typing import Optional
 from common.config import settings
+from common.deadline import Deadline, DeadlineExceeded
 from common.logger import configure_logger
-from common.fireworks_client import FireworksClient
-from PIL import Image
+from common.readiness import Readiness
+from visual_service.analysis import InvalidImage, analyze_page, get_client
+from visual_service.protocols import get_protocol
+
+# PIL and the OpenAI SDK (via FireworksClient) are imported lazily so the
+# process starts serving /health immediately; warm-up loads them.
 
 # Setup Logging
 logger = configure_logger("visual_service")
 
 app = FastAPI()
 
-# Initialize Client
-client = FireworksClient()
+readiness = Readiness("visual_service")
+
+# A blank 64x64 white PNG, used to exercise the image and VLM paths at warm-up
+WARMUP_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAAAAACPAi4CAAAALElEQVR4nO3MoQEAAAjDMOD/n+GIGUTqm97K"
+    "mvAHAAAAAAAAAAAAAAAA8B44UC0Bf7Sd28IAAAAASUVORK5CYII="
+)
+
+def warm_up_image():
+    from PIL import Image
+    Image.open(io.BytesIO(WARMUP_PNG)).load()
+
+async def warm_up_vlm():
+    """
+    One real inference so the first user request does not pay for connection setup. Uses quota.
+    Runs on the app's event loop: the shared client's connection pool is bound to it.
+    """
+    await get_client().analyze_image(prompt="Reply with OK.", base64_image=base64.b64encode(WARMUP_PNG).decode("utf-8"))
+
+@app.on_event("startup")
+async def startup_event():
+    steps = {"pillow": warm_up_image, "fireworks_client": get_client}
+    if settings.WARMUP_VLM:
+        steps["vlm_inference"] = warm_up_vlm
+    readiness.start(steps, enabled=settings.STARTUP_WARMUP)
 
 @app.get("/health")
 def health_check():
+    """Liveness: the process is up and serving requests."""
     return {"status": "healthy", "service": "visual_service", "model": settings.FIREWORKS_MODEL}
 
+@app.get("/ready")
+def ready_check():
+    """Readiness: SDKs are loaded, the client is built and (optionally) a warm-up inference ran."""
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
 @app.post("/detect/layout")
-async def detect_objects(file: UploadFile = File(...)):
+async def detect_objects(file: UploadFile = File(...), protocol: Optional[str] = None,
+                         x_priority: str = Header(None), x_page_complexity: str = Header(None),
+                         x_deadline_ms: str = Header(None)):
+    """
+    Layout + OCR for a single page image.
+    protocol overrides VLM_OUTPUT_PROTOCOL for this request (e.g. to compare protocols).
+    X-Page-Complexity (from preprocessing) selects the model via VLM_ROUTES.
+    X-Deadline-Ms (the job's remaining time) bounds the VLM call, retries included.
+    """
     logger.info(f"Received detection request for {file.filename}")
+    deadline = Deadline.from_header(x_deadline_ms)
+    if deadline.expired:
+        # The caller has already given up on this page: do not spend VLM quota on it
+        return JSONResponse({"detail": "Job deadline exceeded"}, status_code=504)
     
-    contents = await file.read()
-    
-    # Get Dimensions for de-normalization
+    # Prompt/parser pair for Qwen-VL (Unified Extraction)
     try:
-        image = Image.open(io.BytesIO(contents))
-        width, height = image.size
-    except Exception as e:
-        logger.error(f"Failed to load image: {e}")
-        return {"error": "Invalid image file"}
+        vlm_protocol = get_protocol(protocol or settings.VLM_OUTPUT_PROTOCOL)
+    except ValueError as e:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Encode to base64
-    base64_img = base64.b64encode(contents).decode('utf-8')
-    
-    # Prompt for Qwen-VL (Unified Extraction)
-    prompt = """
-    Analyze the document image, including complex layouts like DIAGRAMS, CHARTS, and FLOWCHARTS.
-    Identify ALL layout elements (Title, Text, Header, Footer, Table, Image, Diagram).
-    
-    CRITICAL: Perform OCR on ALL text content, even text inside charts, diagrams, or shapes.
-    
-    Return a valid JSON list of objects.
-    Each object must have:
-    - "type": One of [title, text, header, footer, table, image, diagram]
-    - "bbox": [xmin, ymin, xmax, ymax] (0-1000 scale)
-    - "text": The extracted text content. If it's a diagram, extract the labels within it.
-    
-    Example:
-    [
-      {"type": "title", "bbox": [10, 10, 500, 50], "text": "System Architecture"},
-      {"type": "diagram", "bbox": [10, 100, 900, 900], "text": "Flowchart logic..."},
-      {"type": "text", "bbox": [50, 150, 200, 200], "text": "Input Node"}
-    ]
-    
-    IMPORTANT: Return ONLY the JSON list. Do not include markdown formatting like ```json.
-    """
-    
-    import re
-    
+    contents = await file.read()
     try:
-        response_text = await client.analyze_image(prompt=prompt, base64_image=base64_img)
-        logger.info(f"Raw Fireworks Response: {response_text}")
-        
-        # Robust Parsing: Find the first '[' and last ']'
-        match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-            regions = json.loads(json_str)
-        else:
-             # Fallback: try cleaning markdown
-             clean_text = response_text.replace("```json", "").replace("```", "").strip()
-             regions = json.loads(clean_text)
-        
-        results = []
-        for r in regions:
-            # Validate format
-            if "bbox" not in r: continue
-            
-            box = r["bbox"]
-            if len(box) != 4: continue
-            
-            # Normalize: Model returns [xmin, ymin, xmax, ymax] (0-1000)
-            xmin, ymin, xmax, ymax = box
-            
-            x1 = (xmin / 1000) * width
-            y1 = (ymin / 1000) * height
-            x2 = (xmax / 1000) * width
-            y2 = (ymax / 1000) * height
-            
-            results.append({
-                "label": r.get("type", "text"),
-                "confidence": 1.0, 
-                "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
-                "attributes": {
-                    "text": r.get("text", "")
-                }
-            })
-            
-        logger.info(f"Parsed {len(results)} regions.")
-        return {"detections": results}
-        
+        return await analyze_page(contents, vlm_protocol, priority=x_priority, complexity=x_page_complexity,
+                                  deadline=deadline)
+    except InvalidImage as e:
+        return {"error": str(e)}
+    except DeadlineExceeded as e:
+        logger.warning(f"Detection abandoned: {e}")
+        return JSONResponse({"detail": str(e)}, status_code=504)
     except Exception as e:
         logger.error(f"Detection failed: {e}", exc_info=True)
         from fastapi import HTTPException
@@ -0,0 +1,139 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+# Versioned (prompt, parser) pairs for the VLM layout output.
+# A protocol changes as a unit: never edit a prompt without bumping its version.
+
+LAYOUT_TYPES = ["title", "text", "header", "footer", "table", "image", "diagram"]
+
+
+def to_detection(region_type: str, box, text: str, width: int, height: int) -> Optional[Dict]:
+    """Converts a 0-1000 scaled [xmin, ymin, xmax, ymax] box into a pixel-space detection."""
+    if box is None or len(box) != 4:
+        return None
+
+    # Normalize: Model returns [xmin, ymin, xmax, ymax] (0-1000)
+    xmin, ymin, xmax, ymax = box
+
+    return {
+        "label": region_type or "text",
+        "confidence": 1.0,
+        "bbox": {
+            "x1": (xmin / 1000) * width,
+            "y1": (ymin / 1000) * height,
+            "x2": (xmax / 1000) * width,
+            "y2": (ymax / 1000) * height,
+        },
+        "attributes": {
+            "text": text or ""
+        }
+    }
+
+
+class JsonProtocol:
+    """Original protocol: a JSON list of {"type", "bbox", "text"} objects."""
+
+    version = "json-v1"
+
+    prompt = """
+    Analyze the document image, including complex layouts like DIAGRAMS, CHARTS, and FLOWCHARTS.
+    Identify ALL layout elements (Title, Text, Header, Footer, Table, Image, Diagram).
+
+    CRITICAL: Perform OCR on ALL text content, even text inside charts, diagrams, or shapes.
+
+    Return a valid JSON list of objects.
+    Each object must have:
+    - "type": One of [title, text, header, footer, table, image, diagram]
+    - "bbox": [xmin, ymin, xmax, ymax] (0-1000 scale)
+    - "text": The extracted text content. If it's a diagram, extract the labels within it.
+
+    Example:
+    [
+      {"type": "title", "bbox": [10, 10, 500, 50], "text": "System Architecture"},
+      {"type": "diagram", "bbox": [10, 100, 900, 900], "text": "Flowchart logic..."},
+      {"type": "text", "bbox": [50, 150, 200, 200], "text": "Input Node"}
+    ]
+
+    IMPORTANT: Return ONLY the JSON list. Do not include markdown formatting like ```json.
+    """
+
+    def parse(self, response_text: str, width: int, height: int) -> List[Dict]:
+        # Robust Parsing: Find the first '[' and last ']'
+        match = re.search(r'\[.*\]', response_text, re.DOTALL)
+        if match:
+            regions = json.loads(match.group(0))
+        else:
+            # Fallback: try cleaning markdown
+            clean_text = response_text.replace("```json", "").replace("```", "").strip()
+            regions = json.loads(clean_text)
+
+        results = []
+        for r in regions:
+            # Validate format
+            if "bbox" not in r: continue
+            detection = to_detection(r.get("type", "text"), r["bbox"], r.get("text", ""), width, height)
+            if detection:
+                if r.get("html"):
+                    # Some models add the table as HTML unprompted: it carries the cell structure
+                    detection["attributes"]["html"] = r["html"]
+                results.append(detection)
+        return results
+
+
+class CompactProtocol:
+    """
+    Line protocol: one region per line as CODE|x1,y1,x2,y2|text.
+    Roughly halves output tokens on dense pages (no keys, quotes or brackets).
+    """
+
+    version = "compact-v1"
+
+    CODES = {"T": "title", "X": "text", "H": "header", "F": "footer", "B": "table", "I": "image", "D": "diagram"}
+
+    prompt = """
+    Analyze the document image, including complex layouts like DIAGRAMS, CHARTS, and FLOWCHARTS.
+    Identify ALL layout elements and perform OCR on ALL text content, even text inside charts, diagrams, or shapes.
+
+    Output one line per element, in reading order, formatted exactly as:
+    CODE|x1,y1,x2,y2|text
+
+    CODE: T=title, X=text, H=header, F=footer, B=table, I=image, D=diagram
+    x1,y1,x2,y2: integer box on a 0-1000 scale
+    text: extracted text on a single line (write line breaks as \\n). For diagrams, the labels within it.
+
+    Example:
+    T|10,10,500,50|System Architecture
+    D|10,100,900,900|Flowchart logic...
+    X|50,150,200,200|Input Node
+
+    IMPORTANT: Output ONLY these lines. No JSON, no markdown, no commentary.
+    """
+
+    _line = re.compile(r'^\s*([A-Za-z]+)\s*\|\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*,\s*([-\d.]+)\s*(?:\|(.*))?$')
+
+    def parse(self, response_text: str, width: int, height: int) -> List[Dict]:
+        results = []
+        for line in response_text.splitlines():
+            m = self._line.match(line)
+            if not m:
+                continue  # Blank lines, code fences or chatter
+            code = m.group(1)
+            region_type = self.CODES.get(code.upper(), code.lower() if code.lower() in LAYOUT_TYPES else "text")
+            box = [float(m.group(i)) for i in range(2, 6)]
+            text = (m.group(6) or "").strip().replace("\\n", "\n")
+            results.append(to_detection(region_type, box, text, width, height))
+
+        if not results and response_text.strip():
+            raise ValueError("No regions could be parsed from compact VLM response")
+        return results
+
+
+PROTOCOLS = {p.version: p for p in (JsonProtocol(), CompactProtocol())}
+
+
+def get_protocol(version: str):
+    """Returns the protocol for a version string, e.g. 'json-v1' or 'compact-v1'."""
+    if version not in PROTOCOLS:
+        raise ValueError(f"Unknown VLM output protocol '{version}'. Available: {sorted(PROTOCOLS)}")
+    return PROTOCOLS[version]
@@ -0,0 +1,84 @@
+import asyncio
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from common.config import settings
+from visual_service import analysis
+from visual_service.protocols import get_protocol
+
+SMALL_MODEL = "small-vl"
+
+JSON_RESPONSE = json.dumps([{"type": "title", "bbox": [0, 0, 500, 100], "text": "Invoice"}])
+COMPACT_RESPONSE = "T|0,0,500,100|Invoice"
+
+
+class StubClient:
+    """Canned answers per model in place of FireworksClient; records each call's model and prompt."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    async def analyze_image_with_usage(self, prompt, base64_image, priority=None, model=None, timeout=None):
+        self.calls.append((model, prompt))
+        return self.responses[model], {"prompt_tokens": 100, "completion_tokens": 10}
+
+
+def page() -> bytes:
+    buffered = io.BytesIO()
+    Image.new("RGB", (200, 400), "white").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "VLM_ROUTES", {"simple": SMALL_MODEL})
+
+    def install(responses):
+        stub = StubClient(responses)
+        monkeypatch.setattr(analysis, "_client", stub)
+        return stub
+
+    return install
+
+
+def test_simple_pages_route_to_the_small_model(client):
+    stub = client({SMALL_MODEL: COMPACT_RESPONSE, settings.FIREWORKS_MODEL: COMPACT_RESPONSE})
+    result = asyncio.run(analysis.analyze_page(page(), get_protocol("compact-v1"), complexity="simple"))
+    assert result["routing"] == {"complexity": "simple", "model": SMALL_MODEL, "fallback": False}
+    assert [model for model, _ in stub.calls] == [SMALL_MODEL]
+    assert result["detections"][0]["attributes"]["text"] == "Invoice"
+    assert result["metrics"]["protocol"] == "compact-v1"
+
+    # Unlisted classes and pages without a hint go to the large model
+    for complexity in ("complex", None):
+        result = asyncio.run(analysis.analyze_page(page(), get_protocol("compact-v1"), complexity=complexity))
+        assert result["routing"]["model"] == settings.FIREWORKS_MODEL
+
+
+def test_unparseable_output_falls_back_to_the_large_model_with_json(client):
+    stub = client({SMALL_MODEL: "I cannot read this page, sorry.", settings.FIREWORKS_MODEL: JSON_RESPONSE})
+    result = asyncio.run(analysis.analyze_page(page(), get_protocol("compact-v1"), complexity="simple"))
+    assert [model for model, _ in stub.calls] == [SMALL_MODEL, settings.FIREWORKS_MODEL]
+    assert stub.calls[0][1] == get_protocol("compact-v1").prompt
+    assert stub.calls[1][1] == get_protocol(analysis.FALLBACK_PROTOCOL).prompt == get_protocol("json-v1").prompt
+    assert result["routing"] == {"complexity": "simple", "model": settings.FIREWORKS_MODEL, "fallback": True}
+    assert result["metrics"]["protocol"] == "json-v1"
+    assert result["detections"][0]["bbox"] == {"x1": 0.0, "y1": 0.0, "x2": 100.0, "y2": 40.0}
+
+
+def test_large_model_parse_errors_are_raised(client):
+    stub = client({settings.FIREWORKS_MODEL: "not json"})
+    with pytest.raises(ValueError):
+        asyncio.run(analysis.analyze_page(page(), get_protocol("json-v1"), complexity="complex"))
+    assert len(stub.calls) == 1
+
+
+def test_invalid_image_is_rejected_before_the_vlm_call(client):
+    stub = client({})
+    with pytest.raises(analysis.InvalidImage):
+        asyncio.run(analysis.analyze_page(b"not an image", get_protocol("json-v1")))
+    assert stub.calls == []
@@ -0,0 +1,31 @@
+import pytest
+from protocols import get_protocol, JsonProtocol, CompactProtocol
+
+def test_json_protocol_parse():
+    text = '```json\n[{"type": "title", "bbox": [0, 0, 500, 100], "text": "Invoice"}, {"type": "text", "bbox": [1, 2]}]\n```'
+    regions = JsonProtocol().parse(text, 200, 400)
+    assert len(regions) == 1
+    assert regions[0]["label"] == "title"
+    assert regions[0]["bbox"] == {"x1": 0.0, "y1": 0.0, "x2": 100.0, "y2": 40.0}
+    assert regions[0]["attributes"]["text"] == "Invoice"
+
+def test_compact_protocol_parse():
+    text = "T|0,0,500,100|Invoice\n\nB|100,200,900,800|Qty | Price\\n1 | 9.99\nX|10,10,20,20\nnot a region"
+    regions = CompactProtocol().parse(text, 200, 400)
+    assert [r["label"] for r in regions] == ["title", "table", "text"]
+    assert regions[0]["bbox"] == {"x1": 0.0, "y1": 0.0, "x2": 100.0, "y2": 40.0}
+    assert regions[1]["attributes"]["text"] == "Qty | Price\n1 | 9.99"
+    assert regions[2]["attributes"]["text"] == ""
+
+def test_compact_protocol_rejects_unparseable_output():
+    with pytest.raises(ValueError):
+        CompactProtocol().parse("Sorry, I cannot read this page.", 200, 400)
+
+def test_protocols_produce_same_detections():
+    json_text = '[{"type": "header", "bbox": [10, 20, 30, 40], "text": "ACME"}]'
+    compact_text = "H|10,20,30,40|ACME"
+    assert JsonProtocol().parse(json_text, 1000, 1000) == CompactProtocol().parse(compact_text, 1000, 1000)
+
+def test_unknown_protocol():
+    with pytest.raises(ValueError):
+        get_protocol("yaml-v9")